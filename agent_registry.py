@@ -0,0 +1,57 @@
+"""
+Lazy registry of the specialist agents.
+
+An agent's module (and everything it pulls in: the fact-check retriever,
+the search backend, the summarizers) is imported the first time the agent
+is needed, not when the controller, the API server or the UI is imported.
+"""
+import importlib
+import threading
+import time
+
+import logfire
+
+from intent_router import FACT_CHECK, SUMMARIZE, TRENDING
+
+
+# intent -> (module, attribute, agent name)
+AGENT_SPECS = {
+    TRENDING: ("trending_news_web", "trending_news_agent", "Trending News Agent"),
+    FACT_CHECK: ("rag_fact_check", "fact_check_agent", "Fact Check Specialist"),
+    SUMMARIZE: ("summarizer_agent", "article_summarizer_agent", "Article Summarizer"),
+}
+
+_agents = {}
+_load_seconds = {}
+_lock = threading.Lock()
+
+
+def get_agent(intent: str):
+    """Return the specialist agent for an intent, importing its module on first use."""
+    agent = _agents.get(intent)
+    if agent is not None:
+        return agent
+    with _lock:
+        if intent not in _agents:
+            module_name, attribute, _ = AGENT_SPECS[intent]
+            with logfire.span("load agent {module_name}", module_name=module_name):
+                start = time.perf_counter()
+                _agents[intent] = getattr(importlib.import_module(module_name), attribute)
+                _load_seconds[intent] = time.perf_counter() - start
+        return _agents[intent]
+
+
+def specialist_agents() -> list:
+    """All specialist agents, loading any that aren't yet."""
+    return [get_agent(intent) for intent in AGENT_SPECS]
+
+
+def is_agent(agent, intent: str) -> bool:
+    """True if `agent` is the (already loaded) specialist for `intent`; never triggers a load."""
+    return agent is not None and _agents.get(intent) is agent
+
+
+def stats() -> dict:
+    """Which agents are loaded and how long each took to import."""
+    return {intent: round(_load_seconds[intent], 3) if intent in _load_seconds else None
+            for intent in AGENT_SPECS}
@@ -0,0 +1,145 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+
+from config import get_bool, get_float, get_int, get_json
+from fact_check_service import get_retriever
+
+
+# --- Configuration ---
+
+ANSWER_CACHE_ENABLED = get_bool("ANSWER_CACHE_ENABLED", False)
+ANSWER_CACHE_SIMILARITY = get_float("ANSWER_CACHE_SIMILARITY", 0.92)
+ANSWER_CACHE_MAX_ENTRIES = get_int("ANSWER_CACHE_MAX_ENTRIES", 1000)
+
+# Seconds an answer stays valid, per agent that produced it. Trending news goes
+# stale quickly, fact checks don't. A TTL of 0 means "never cache".
+# Article summaries are never cached (controller_run skips long inputs and the summarizer).
+DEFAULT_TTL_SECONDS = 600
+AGENT_TTL_SECONDS = {
+    "Trending News Agent": 300,
+    "Fact Check Specialist": 24 * 3600,
+}
+AGENT_TTL_SECONDS.update(get_json("ANSWER_CACHE_TTLS", {}))
+
+
+@dataclass
+class CacheEntry:
+    query: str
+    vector: np.ndarray
+    output: Any
+    agent_name: str
+    expires_at: float
+
+
+class SemanticAnswerCache:
+    """
+    Embedding-keyed cache of final agent outputs.
+
+    A new query is a hit when its cosine similarity to a stored query is at least
+    `similarity`, so "did apple buy openai" and "apple acquired openai?" share an
+    answer. Entries expire after their agent's TTL and the least recently used
+    entry is evicted once `max_entries` is reached.
+    """
+
+    def __init__(self, embedding_function=None, similarity: float = ANSWER_CACHE_SIMILARITY,
+                 max_entries: int = ANSWER_CACHE_MAX_ENTRIES, agent_ttls: dict = None,
+                 default_ttl: float = DEFAULT_TTL_SECONDS):
+        self._embedding_function = embedding_function
+        self.similarity = similarity
+        self.max_entries = max_entries
+        self.agent_ttls = dict(AGENT_TTL_SECONDS if agent_ttls is None else agent_ttls)
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[int, CacheEntry]" = OrderedDict()
+        self._next_key = 0
+        self._lock = threading.Lock()
+
+    def _embed(self, text: str) -> np.ndarray:
+        # Reuse the fact checker's already-loaded model unless one was supplied.
+        embedding_function = self._embedding_function or get_retriever().embedding_function
+        vector = np.asarray(embedding_function([text])[0], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _ttl_for(self, agent_name: str) -> float:
+        return self.agent_ttls.get(agent_name, self.default_ttl)
+
+    def _drop_expired(self, now: float) -> None:
+        for key in [key for key, entry in self._entries.items() if entry.expires_at <= now]:
+            del self._entries[key]
+
+    def get(self, query: str):
+        """Return (output, agent_name) for a similar cached query, or None."""
+        vector = self._embed(query)
+        with self._lock:
+            self._drop_expired(time.monotonic())
+            if self._entries:
+                keys = list(self._entries)
+                matrix = np.stack([self._entries[key].vector for key in keys])
+                scores = matrix @ vector
+                best = int(np.argmax(scores))
+                if scores[best] >= self.similarity:
+                    key = keys[best]
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    entry = self._entries[key]
+                    return entry.output, entry.agent_name
+            self.misses += 1
+            return None
+
+    def put(self, query: str, output: Any, agent_name: str) -> None:
+        """Store an agent's final output for a query."""
+        ttl = self._ttl_for(agent_name)
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        vector = self._embed(query)
+        with self._lock:
+            self._entries[self._next_key] = CacheEntry(
+                query=query,
+                vector=vector,
+                output=output,
+                agent_name=agent_name,
+                expires_at=time.monotonic() + ttl,
+            )
+            self._next_key += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+_answer_cache = None
+_answer_cache_lock = threading.Lock()
+
+
+def get_answer_cache():
+    """Return the process-wide answer cache, or None when ANSWER_CACHE_ENABLED is off."""
+    global _answer_cache
+    if not ANSWER_CACHE_ENABLED:
+        return None
+    if _answer_cache is None:
+        with _answer_cache_lock:
+            if _answer_cache is None:
+                _answer_cache = SemanticAnswerCache()
+    return _answer_cache
@@ -0,0 +1,233 @@
+"""
+Headless HTTP API for NewsSense.
+
+    POST /route       {"query": "..."}         -> routed through the conversation agent
+                      (with "session_id", earlier turns of that session are remembered)
+    POST /fact-check  {"claim": "..."}         -> FactCheckOutput
+    POST /trending    {"topic": "..."}         -> TrendingNews
+    POST /summarize   {"article_text": "..."}  -> SummarizeOutput
+
+Requests beyond API_MAX_IN_FLIGHT wait up to API_QUEUE_TIMEOUT_SECONDS for a
+slot and then get a 503; each endpoint has its own timeout (504 when exceeded).
+On shutdown the server stops accepting work and lets in-flight requests finish.
+
+Run with:
+    python api_server.py
+    uvicorn api_server:app --host 0.0.0.0 --port 8000 --workers 4
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Optional, Union
+
+from agents import Runner
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
+import logfire
+from pydantic import BaseModel, Field
+import uvicorn
+
+from agent_registry import get_agent
+from config import get_float, get_int, get_str
+from controller_run import UserContext, record_summary_spend, run_conversation
+from extractive_summarizer import condense_article, extractive_only, extractive_summary
+from intent_router import FACT_CHECK, SUMMARIZE, TRENDING
+from metrics import metrics, request_scope
+from runtime import warm_up_fact_check
+from schemas import FactCheckOutput, SummarizeOutput, TrendingNews
+from tool_runtime import run_blocking
+from trending_ingest import get_trending_feeds, start_worker
+
+
+# --- Configuration ---
+
+API_HOST = get_str("API_HOST", "0.0.0.0")
+API_PORT = get_int("API_PORT", 8000)
+API_MAX_IN_FLIGHT = get_int("API_MAX_IN_FLIGHT", 64)
+API_QUEUE_TIMEOUT_SECONDS = get_float("API_QUEUE_TIMEOUT_SECONDS", 2)
+API_SHUTDOWN_GRACE_SECONDS = get_float("API_SHUTDOWN_GRACE_SECONDS", 30)
+
+ENDPOINT_TIMEOUT_SECONDS = {
+    "route": get_float("API_ROUTE_TIMEOUT_SECONDS", 90),
+    "fact_check": get_float("API_FACT_CHECK_TIMEOUT_SECONDS", 30),
+    "trending": get_float("API_TRENDING_TIMEOUT_SECONDS", 60),
+    "summarize": get_float("API_SUMMARIZE_TIMEOUT_SECONDS", 90),
+}
+
+
+# --- Request / response schemas ---
+
+class RouteRequest(BaseModel):
+    query: str = Field(..., min_length=1, description="The user's question or pasted article.")
+    session_id: Optional[str] = Field(None, description="Keeps a conversation: earlier turns with the same id are "
+                                                        "remembered, so follow-up questions work.")
+
+class FactCheckRequest(BaseModel):
+    claim: str = Field(..., min_length=1, description="The claim to verify.")
+
+class TrendingRequest(BaseModel):
+    topic: str = Field(..., min_length=1, description="The topic to find trending news for.")
+
+class SummarizeRequest(BaseModel):
+    article_text: str = Field(..., min_length=1, description="The full text of the news article to be summarized.")
+
+class RouteResponse(BaseModel):
+    kind: str = Field(description="Which specialist answered: trending, fact_check, summary or text.")
+    output: Union[TrendingNews, FactCheckOutput, SummarizeOutput, str]
+
+
+# --- Admission control ---
+
+class AdmissionControl:
+    """Bounds in-flight requests and tracks them so shutdown can drain."""
+
+    def __init__(self, max_in_flight: int):
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.draining = False
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._idle: Optional[asyncio.Event] = None
+
+    def start(self) -> None:
+        # Created inside the server's event loop.
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    @asynccontextmanager
+    async def slot(self):
+        if self.draining:
+            raise HTTPException(status_code=503, detail="Server is shutting down.")
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=API_QUEUE_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=503, detail="Server is busy, try again later.")
+        self.in_flight += 1
+        self._idle.clear()
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            if self.in_flight == 0:
+                self._idle.set()
+            self._semaphore.release()
+
+    async def drain(self, timeout: float) -> None:
+        self.draining = True
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logfire.warn("Shutdown grace period ended with {count} requests in flight", count=self.in_flight)
+
+
+admission = AdmissionControl(API_MAX_IN_FLIGHT)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    admission.start()
+    warm_up_fact_check()
+    start_worker()
+    yield
+    await admission.drain(API_SHUTDOWN_GRACE_SECONDS)
+
+
+app = FastAPI(title="NewsSense API", lifespan=lifespan)
+
+
+async def _run_limited(endpoint: str, call):
+    """
+    Run an agent call inside an admission slot and the endpoint's timeout. `call`
+    takes no arguments and returns the coroutine, so a rejected request never creates one.
+    """
+    async with admission.slot():
+        try:
+            with request_scope(f"api {endpoint}"):
+                return await asyncio.wait_for(call(), timeout=ENDPOINT_TIMEOUT_SECONDS[endpoint])
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail=f"{endpoint} timed out.")
+
+
+async def _run_agent(agent, input_text: str):
+    result = await Runner.run(agent, input_text)
+    record_summary_spend(result)
+    return result.final_output
+
+
+async def _summarize(article_text: str):
+    # Long articles are condensed locally, so the agent never reads or echoes the full text.
+    return await _run_agent(get_agent(SUMMARIZE), await condense_article(article_text))
+
+
+def _output_kind(output) -> str:
+    if isinstance(output, TrendingNews):
+        return "trending"
+    if isinstance(output, FactCheckOutput):
+        return "fact_check"
+    if isinstance(output, SummarizeOutput):
+        return "summary"
+    return "text"
+
+
+# --- Endpoints ---
+
+@app.post("/route", response_model=RouteResponse)
+async def route(request: RouteRequest):
+    context = UserContext(user_id=request.session_id) if request.session_id else None
+    output = await _run_limited("route", lambda: run_conversation(request.query, context=context))
+    kind = _output_kind(output)
+    return RouteResponse(kind=kind, output=output if kind != "text" else str(output))
+
+
+@app.post("/fact-check", response_model=FactCheckOutput)
+async def fact_check(request: FactCheckRequest):
+    return await _run_limited("fact_check", lambda: _run_agent(get_agent(FACT_CHECK), request.claim))
+
+
+@app.post("/trending", response_model=TrendingNews)
+async def trending(request: TrendingRequest):
+    feeds = get_trending_feeds()
+    if feeds is not None:
+        feed = await run_blocking(feeds.lookup, request.topic)
+        if feed is not None:
+            return feed
+    return await _run_limited("trending", lambda: _run_agent(get_agent(TRENDING), request.topic))
+
+
+@app.post("/summarize", response_model=SummarizeOutput)
+async def summarize(request: SummarizeRequest):
+    if extractive_only():
+        summary_text = await _run_limited("summarize", lambda: run_blocking(extractive_summary, request.article_text))
+        return SummarizeOutput(summary_text=summary_text)
+    return await _run_limited("summarize", lambda: _summarize(request.article_text))
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_prometheus():
+    """Per-stage latency histograms and token counters in the Prometheus text format."""
+    return metrics.prometheus_text()
+
+
+@app.get("/metrics.json")
+async def metrics_json():
+    return metrics.snapshot()
+
+
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+async def readyz():
+    if admission.draining:
+        raise HTTPException(status_code=503, detail="draining")
+    return {"status": "ready", "in_flight": admission.in_flight, "max_in_flight": admission.max_in_flight}
+
+
+if __name__ == "__main__":
+    uvicorn.run(
+        app,
+        host=API_HOST,
+        port=API_PORT,
+        timeout_graceful_shutdown=int(API_SHUTDOWN_GRACE_SECONDS),
+    )
@@ -0,0 +1,182 @@
+import asyncio
+import re
+import threading
+import time
+from collections import deque
+
+import logfire
+
+from config import get_int, get_str
+from metrics import record_tokens, timed
+from runtime import get_openai_client
+
+
+# --- Configuration ---
+
+MODEL_NAME = get_str("MODEL_NAME")
+SUMMARY_MODEL_NAME = get_str("SUMMARY_MODEL_NAME", MODEL_NAME)
+# Articles up to this many (estimated) tokens are passed to the agent unchanged.
+SUMMARY_CHUNK_TOKENS = get_int("SUMMARY_CHUNK_TOKENS", 3000)
+SUMMARY_MAX_PARALLEL = get_int("SUMMARY_MAX_PARALLEL", 8)
+SUMMARY_BULLETS_PER_CHUNK = get_int("SUMMARY_BULLETS_PER_CHUNK", 5)
+SUMMARY_MAX_BULLETS = get_int("SUMMARY_MAX_BULLETS", 8)
+# Upper bound on merge levels, so a model that ignores the bullet limit can't loop forever.
+MAX_REDUCE_LEVELS = 4
+# LLM tokens summarization may spend per rolling hour; 0 means unlimited.
+SUMMARY_TOKEN_BUDGET_PER_HOUR = get_int("SUMMARY_TOKEN_BUDGET_PER_HOUR", 0)
+
+MAP_PROMPT = """You summarize one part of a longer news article.
+Write at most {bullets} bullet points, one per line, each starting with "- ".
+Keep names, numbers and dates exactly as written. No introduction or conclusion."""
+
+REDUCE_PROMPT = """You merge partial summaries of one news article into a single summary.
+Write at most {bullets} bullet points, one per line, each starting with "- ".
+Remove duplicates, keep the most important facts and keep names, numbers and dates exactly as written."""
+
+
+class TokenBudget:
+    """Tokens spent over a rolling window, compared against a limit."""
+
+    def __init__(self, limit: int, window_seconds: float = 3600):
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self._spend = deque()
+        self._lock = threading.Lock()
+
+    def _trim(self, now: float) -> None:
+        while self._spend and self._spend[0][0] <= now - self.window_seconds:
+            self._spend.popleft()
+
+    def spend(self, tokens: int) -> None:
+        if tokens:
+            with self._lock:
+                self._spend.append((time.monotonic(), tokens))
+
+    def used(self) -> int:
+        with self._lock:
+            self._trim(time.monotonic())
+            return sum(tokens for _, tokens in self._spend)
+
+    @property
+    def exhausted(self) -> bool:
+        return self.limit > 0 and self.used() >= self.limit
+
+
+summary_budget = TokenBudget(SUMMARY_TOKEN_BUDGET_PER_HOUR)
+
+
+# --- 1. Splitting ---
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])[\"')\]]*\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token for English text)."""
+    return max(1, len(text) // 4)
+
+
+def split_sentences(text: str) -> list[str]:
+    return [sentence.strip() for sentence in _SENTENCE_END.split(text) if sentence.strip()]
+
+
+def _split_oversized(text: str, max_tokens: int) -> list[str]:
+    """Split a single sentence that is over budget on word boundaries."""
+    return _pack(text.split(), " ", max_tokens)
+
+
+def _pack(parts: list[str], separator: str, max_tokens: int) -> list[str]:
+    """Greedily join parts so each joined string stays within max_tokens where possible."""
+    packed = []
+    current = []
+    length = 0
+    for part in parts:
+        joined_length = length + len(separator) + len(part) if current else len(part)
+        # Same ~4 characters per token rule as estimate_tokens, without re-joining.
+        if current and joined_length // 4 > max_tokens:
+            packed.append(separator.join(current))
+            current, joined_length = [], len(part)
+        current.append(part)
+        length = joined_length
+    if current:
+        packed.append(separator.join(current))
+    return packed
+
+
+def chunk_text(text: str, max_tokens: int = SUMMARY_CHUNK_TOKENS) -> list[str]:
+    """
+    Split text into chunks of at most ~max_tokens, breaking on paragraph
+    boundaries where possible, then sentences, then words.
+    """
+    pieces = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = " ".join(paragraph.split())
+        if not paragraph:
+            continue
+        if estimate_tokens(paragraph) <= max_tokens:
+            pieces.append(paragraph)
+            continue
+        for sentence in split_sentences(paragraph):
+            if estimate_tokens(sentence) <= max_tokens:
+                pieces.append(sentence)
+            else:
+                pieces.extend(_split_oversized(sentence, max_tokens))
+
+    return _pack(pieces, "\n\n", max_tokens)
+
+
+# --- 2. Map-reduce ---
+
+def _bullets(text: str) -> list[str]:
+    lines = [line.strip().lstrip("-*•").strip() for line in text.splitlines()]
+    return [line for line in lines if line]
+
+
+async def _complete(system_prompt: str, text: str, semaphore: asyncio.Semaphore) -> str:
+    async with semaphore:
+        with timed("llm", "Chunk Summarizer"):
+            response = await get_openai_client().chat.completions.create(
+                model=SUMMARY_MODEL_NAME,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": text},
+                ],
+                temperature=0,
+            )
+    if response.usage is not None:
+        summary_budget.spend(response.usage.total_tokens)
+        record_tokens("Chunk Summarizer", response.usage.prompt_tokens, response.usage.completion_tokens)
+    return response.choices[0].message.content or ""
+
+
+@logfire.instrument("map_reduce_summarize")
+async def map_reduce_summarize(article_text: str, max_tokens: int = SUMMARY_CHUNK_TOKENS,
+                               max_parallel: int = SUMMARY_MAX_PARALLEL) -> str:
+    """
+    Summarize an arbitrarily long article into "- " bullet points.
+
+    The article is split into chunks under `max_tokens`, the chunks are
+    summarized concurrently (at most `max_parallel` LLM calls at a time), and the
+    partial summaries are merged, level by level, until they fit in one call.
+    """
+    semaphore = asyncio.Semaphore(max_parallel)
+    chunks = chunk_text(article_text, max_tokens)
+    logfire.info("Summarizing {count} chunks", count=len(chunks))
+
+    map_prompt = MAP_PROMPT.format(bullets=SUMMARY_BULLETS_PER_CHUNK)
+    partials = await asyncio.gather(*(_complete(map_prompt, chunk, semaphore) for chunk in chunks))
+    bullets = [bullet for partial in partials for bullet in _bullets(partial)]
+
+    # A single chunk's bullets are already the summary.
+    reduce_levels = MAX_REDUCE_LEVELS if len(chunks) > 1 else 0
+    reduce_prompt = REDUCE_PROMPT.format(bullets=SUMMARY_MAX_BULLETS)
+    for _ in range(reduce_levels):
+        if not bullets:
+            break
+        merged_input = "\n".join(f"- {bullet}" for bullet in bullets)
+        groups = chunk_text(merged_input.replace("\n", "\n\n"), max_tokens)
+        merged = await asyncio.gather(*(_complete(reduce_prompt, group, semaphore) for group in groups))
+        bullets = [bullet for partial in merged for bullet in _bullets(partial)]
+        if len(groups) == 1:
+            break
+
+    return "\n".join(f"- {bullet}" for bullet in bullets[:SUMMARY_MAX_BULLETS])
@@ -0,0 +1,51 @@
+"""
+Shared configuration loader.
+
+The .env file is read once per process, the first time this module is
+imported; every other module reads its settings through the helpers below
+instead of calling load_dotenv() itself.
+"""
+import json
+import os
+
+from dotenv import load_dotenv
+
+
+# --- Configuration ---
+
+# Load environment variables (once per process)
+load_dotenv()
+
+_TRUE = {"1", "true", "yes", "on"}
+
+
+def get_str(name: str, default: str = None) -> str:
+    return os.getenv(name, default)
+
+
+def get_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return default if value is None or value.strip() == "" else int(value)
+
+
+def get_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return default if value is None or value.strip() == "" else float(value)
+
+
+def get_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    return default if value is None or value.strip() == "" else value.strip().lower() in _TRUE
+
+
+def get_json(name: str, default):
+    value = os.getenv(name)
+    return default if value is None or value.strip() == "" else json.loads(value)
+
+
+# Settings shared by the agents.
+BASE_URL = get_str("BASE_URL")
+API_KEY = get_str("API_KEY")
+MODEL_NAME = get_str("MODEL_NAME")
+LOGFIRE_TOKEN = get_str("LOGFIRE_TOKEN")
+TAVILY_API_KEY = get_str("TAVILY_API_KEY")
@@ -1,40 +1,32 @@
 import asyncio
 from dataclasses import dataclass
 from datetime import datetime
-import os
 import json
-from agents import Agent, OpenAIChatCompletionsModel, Runner, set_tracing_disabled
-from dotenv import load_dotenv
-from openai import AsyncOpenAI, OpenAI
+import re
+import threading
+import time
+from agents import Agent, OpenAIChatCompletionsModel, Runner
 from pydantic import BaseModel, Field
 import logfire
 
-from trending_news_web import trending_news_agent
-from rag_fact_check import fact_check_agent
-from summarizer_agent import article_summarizer_agent
+from agent_registry import AGENT_SPECS, get_agent, is_agent, specialist_agents
+from config import API_KEY, BASE_URL, MODEL_NAME
+from schemas import SummarizeOutput
+from runtime import configure_observability, get_openai_client
+from answer_cache import get_answer_cache
+from chunked_summarizer import summary_budget
+from extractive_summarizer import condense_article, extractive_only, extractive_summary
+from intent_router import FACT_CHECK, LONG_TEXT_WORDS, SUMMARIZE, TRENDING, get_intent_router
+from metrics import request_scope, timed
+from session_store import Turn, get_session_store, is_follow_up
+from tool_runtime import run_blocking
+from trending_ingest import get_trending_feeds
 
 
-# --- Configuration ---
+# --- Configuration (loaded once in config.py) ---
 
-# Load environment variables
-load_dotenv()
-
-BASE_URL = os.getenv("BASE_URL") 
-API_KEY = os.getenv("API_KEY") 
-MODEL_NAME = os.getenv("MODEL_NAME") 
-LOGFIRE_TOKEN = os.getenv("LOGFIRE_TOKEN") 
-
-
-
-# Set up Logfire for observability
-# You can get a free Logfire account to view detailed logs.
-# For this example, we'll log to the console.
-logfire.configure(
-    send_to_logfire=True, # Set to True to send to the Logfire service
-    token=LOGFIRE_TOKEN,  # Your Logfire token    
-)
-
-logfire.instrument_openai_agents()
+# Set up Logfire for observability (once per process, see runtime.py)
+configure_observability()
 
 # Initialize the OpenAI client
 if not BASE_URL or not API_KEY or not MODEL_NAME:
@@ -43,41 +35,303 @@ if not BASE_URL or not API_KEY or not MODEL_NAME:
     )
     
 
-client = AsyncOpenAI(base_url=BASE_URL, api_key=API_KEY)
-set_tracing_disabled(disabled=False)
+# Shared by all agents so they reuse one HTTP connection pool
+client = get_openai_client()
+
+
+CONVERSATION_AGENT_NAME = "News Sense Agent"
+_conversation_agent = None
+_conversation_lock = threading.Lock()
+
+
+def _build_conversation_agent() -> Agent:
+    return Agent(
+        name=CONVERSATION_AGENT_NAME,
+        handoff_description="Conversational agent. Provides news sense and connects to appropriate agent.",
+        instructions="""
+        You are a news sense assistant. Your role is to identify the right specialist agent to hand off to.
+        You can hand off to specialist agents for specific tasks like Fact Checker, News Summarizer or Trending News Specialist.
+
+        When a user asks a question, analyze the query and determine which specialist agent is best suited to handle it.
+        If the query is about trending news, hand off to the Trending News Specialist.
+        If the query is about fact-checking,user confused about news, hand off to the Fact Checker.
+        If the query is about summarizing an article, hand off to the News Summarizer.
+        if the query is look like a rumor or misinformation, hand off to the Fact Checker.
+        if the query is about a specific topic, hand off to the Trending News Specialist.
+        if the query is look like partnering with a company or aquisition of a company, hand off to the Fact Checker.
+        Example queries:
+        - "What are the latest trends in AI?" - hand off to Trending News Specialist
+        - "Is the claim that AI will replace jobs true?" - hand off to Fact Checker
+        - "Can you summarize the latest article on climate change. A long text will be supplied by user?" - hand off to News Summarizer
+
+        Don't try to answer the user's question directly. Instead, analyze the query and determine which specialist agent is best suited to handle it.
+        """,
+        model=OpenAIChatCompletionsModel(
+            openai_client=client,
+            model=MODEL_NAME
+        ),
+
+        handoffs=specialist_agents(),
+    )
+
+
+def get_conversation_agent() -> Agent:
+    """The controller agent; building it loads every specialist it can hand off to."""
+    global _conversation_agent
+    if _conversation_agent is None:
+        with _conversation_lock:
+            if _conversation_agent is None:
+                _conversation_agent = _build_conversation_agent()
+    return _conversation_agent
+
+
+def __getattr__(name: str):
+    # `from controller_run import conversation_agent` still works; it builds the agent on first access.
+    if name == "conversation_agent":
+        return get_conversation_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def select_agent(input_text: str, follow_up: bool = False):
+    """
+    Pick the agent to run. With FAST_ROUTER_ENABLED=1 an obvious intent goes
+    straight to its specialist, saving the controller's LLM round-trip.
+    A follow-up to an earlier answer always goes to the controller, which sees the history.
+    """
+    router = get_intent_router()
+    if router is None or follow_up:
+        return get_conversation_agent()
+    decision = router.route(input_text)
+    if router.is_confident(decision):
+        logfire.info("Fast router: {intent} ({confidence:.2f}, {method})",
+                     intent=decision.intent, confidence=decision.confidence, method=decision.method)
+        # Only this specialist's module is loaded; the controller agent is never built.
+        return get_agent(decision.intent)
+    return get_conversation_agent()
+
+
+def _cacheable(input_text: str) -> bool:
+    # The cache key is an embedding of the first few hundred tokens, so two pasted
+    # articles with the same lede would share an answer: only questions are cached.
+    return len(input_text.split()) <= LONG_TEXT_WORDS
+
+
+async def _cached_answer(input_text: str):
+    """Return a cached final output for the query, or None."""
+    cache = get_answer_cache()
+    if cache is None or not _cacheable(input_text):
+        return None
+    # Embedding the query is blocking work, so keep it off the event loop.
+    cached = await run_blocking(cache.get, input_text)
+    if cached is None:
+        return None
+    output, agent_name = cached
+    logfire.info("Answer cache hit for {agent_name}", agent_name=agent_name)
+    return output
+
+
+def record_summary_spend(result) -> None:
+    """Count a summarizer run's tokens against SUMMARY_TOKEN_BUDGET_PER_HOUR."""
+    if is_agent(result.last_agent, SUMMARIZE):
+        summary_budget.spend(sum(response.usage.total_tokens for response in result.raw_responses))
+
+
+async def _remember_answer(input_text: str, result, cacheable: bool = True) -> None:
+    cache = get_answer_cache()
+    cacheable = cacheable and _cacheable(input_text) and not is_agent(result.last_agent, SUMMARIZE)
+    if cache is not None and cacheable:
+        await run_blocking(cache.put, input_text, result.final_output, result.last_agent.name)
+    record_summary_spend(result)
+
+
+async def _feed_answer(input_text: str):
+    """Answer a query about a configured trending topic from its precomputed feed."""
+    feeds = get_trending_feeds()
+    if feeds is None:
+        return None
+    feed = await run_blocking(feeds.lookup, input_text)
+    if feed is not None:
+        logfire.info("Trending feed hit for {topic}", topic=feed.topic)
+    return feed
+
+
+async def _extractive_answer(input_text: str):
+    """
+    When summarization is extractive-only (SUMMARY_MODE=extractive or over the
+    token budget), answer a pasted article locally without any LLM call.
+    """
+    if len(input_text.split()) <= LONG_TEXT_WORDS or not extractive_only():
+        return None
+    summary_text = await run_blocking(extractive_summary, input_text)
+    return SummarizeOutput(summary_text=summary_text)
+
+
+async def _local_answer(input_text: str):
+    """An answer that needs no agent run, as (output, where it came from), or (None, None)."""
+    cached = await _cached_answer(input_text)
+    if cached is not None:
+        return cached, "answer_cache"
+
+    feed = await _feed_answer(input_text)
+    if feed is not None:
+        return feed, "trending_feed"
+
+    extractive = await _extractive_answer(input_text)
+    if extractive is not None:
+        return extractive, "extractive"
+    return None, None
+
+
+async def _select_agent(input_text: str, follow_up: bool = False):
+    with timed("route", "select_agent"):
+        return await run_blocking(select_agent, input_text, follow_up)
+
+
+def _session_id(context):
+    return getattr(context, "user_id", None)
+
+
+async def _load_history(context) -> list:
+    """The user's conversation so far as agent input items ([] without a session)."""
+    session_id = _session_id(context)
+    if not session_id:
+        return []
+    return await run_blocking(get_session_store().history, session_id)
+
+
+async def _remember_turn(context, input_text: str, output, asked_at: float) -> None:
+    session_id = _session_id(context)
+    if session_id:
+        await run_blocking(get_session_store().add_turn, session_id, Turn.from_output(input_text, output, asked_at))
+
+
+async def _agent_input(agent, input_text: str, history: list):
+    """
+    The agent's input. A long article routed to the summarizer is condensed locally
+    first, so the model only reads the reduced text; every other agent gets the
+    user's text as written (a fact check must see every claim). When the controller
+    hands off to the summarizer instead, its summarize_news tool does the condensing.
+    """
+    text = await condense_article(input_text) if is_agent(agent, SUMMARIZE) else input_text
+    return history + [{"role": "user", "content": text}] if history else text
+
+
+async def run_conversation(input_text: str, context=None):
+    """
+    Run the conversation agent and return its final output.
+
+    When the semantic answer cache is enabled (ANSWER_CACHE_ENABLED=1), a query
+    similar enough to an earlier one is answered from the cache without any LLM call.
+    With a `context.user_id` the turn is kept in the session store and the agent
+    also gets the conversation so far, so follow-ups ("summarize the second one") work.
+    """
+    asked_at = time.time()
+    with request_scope() as scope:
+        history = await _load_history(context)
+        # A follow-up only makes sense with its history: no cached or precomputed answers.
+        follow_up = bool(history) and is_follow_up(input_text)
+        output = None
+        if not follow_up:
+            output, source = await _local_answer(input_text)
+            if output is not None:
+                scope.name = source
+        if output is None:
+            agent = await _select_agent(input_text, follow_up)
+            result = await Runner.run(agent, await _agent_input(agent, input_text, history), context=context)
+            scope.name = result.last_agent.name
+            await _remember_answer(input_text, result, cacheable=not follow_up)
+            output = result.final_output
+
+        await _remember_turn(context, input_text, output, asked_at)
+        return output
+
+
+# Friendly names for progress messages while streaming.
+AGENT_LABELS = {
+    CONVERSATION_AGENT_NAME: "News Sense",
+    AGENT_SPECS[TRENDING][2]: "Trending News Specialist",
+    AGENT_SPECS[FACT_CHECK][2]: "Fact Checker",
+    AGENT_SPECS[SUMMARIZE][2]: "News Summarizer",
+}
+
+
+@dataclass
+class ConversationEvent:
+    """A progress update from stream_conversation.
+
+    kind is "status" (routing/tool progress), "token" (a piece of model output;
+    raw JSON for structured outputs, see preview_text) or "final" (the run
+    finished; `output` holds the final output).
+    """
+    kind: str
+    text: str = ""
+    output: object = None
+
+
+# Fields of the structured outputs (schemas.py) worth showing while they stream in.
+PREVIEW_FIELDS = ("topic", "headline", "verdict", "summary", "summary_text")
+_PREVIEW_VALUE = re.compile(r'"(%s)"\s*:\s*"((?:[^"\\]|\\.)*)' % "|".join(PREVIEW_FIELDS))
 
 
+def preview_text(partial_output: str) -> str:
+    """
+    The readable part of a partly streamed answer. Structured outputs stream as
+    JSON, so only the text fields are pulled out, one per line, as far as they
+    have arrived; a plain text answer is returned as is.
+    """
+    if not partial_output.lstrip().startswith("{"):
+        return partial_output
+    lines = []
+    for match in _PREVIEW_VALUE.finditer(partial_output):
+        # Drop an escape sequence cut off mid-way, then decode the JSON string.
+        value = re.sub(r"\\(u[0-9a-fA-F]{0,3})?$", "", match.group(2))
+        try:
+            lines.append(json.loads(f'"{value}"'))
+        except json.JSONDecodeError:
+            lines.append(value)
+    return "\n".join(line for line in lines if line)
 
 
-conversation_agent = Agent(
-    name="News Sense Agent",
-    handoff_description="Conversational agent. Provides news sense and connects to appropriate agent.",
-    instructions="""
-    You are a news sense assistant. Your role is to identify the right specialist agent to hand off to.
-    You can hand off to specialist agents for specific tasks like Fact Checker, News Summarizer or Trending News Specialist.
+async def stream_conversation(input_text: str, context=None):
+    """
+    Streaming variant of run_conversation.
 
-    When a user asks a question, analyze the query and determine which specialist agent is best suited to handle it.
-    If the query is about trending news, hand off to the Trending News Specialist.
-    If the query is about fact-checking,user confused about news, hand off to the Fact Checker.
-    If the query is about summarizing an article, hand off to the News Summarizer.
-    if the query is look like a rumor or misinformation, hand off to the Fact Checker.
-    if the query is about a specific topic, hand off to the Trending News Specialist.
-    if the query is look like partnering with a company or aquisition of a company, hand off to the Fact Checker.
-    Example queries:
-    - "What are the latest trends in AI?" - hand off to Trending News Specialist
-    - "Is the claim that AI will replace jobs true?" - hand off to Fact Checker
-    - "Can you summarize the latest article on climate change. A long text will be supplied by user?" - hand off to News Summarizer
+    Yields ConversationEvent objects as the run progresses: handoffs, tool calls
+    and output tokens, followed by one "final" event with the agent's final output.
+    """
+    asked_at = time.time()
+    with request_scope() as scope:
+        history = await _load_history(context)
+        follow_up = bool(history) and is_follow_up(input_text)
+        if not follow_up:
+            output, source = await _local_answer(input_text)
+            if output is not None:
+                scope.name = source
+                await _remember_turn(context, input_text, output, asked_at)
+                yield ConversationEvent("final", output=output)
+                return
 
-    Don't try to answer the user's question directly. Instead, analyze the query and determine which specialist agent is best suited to handle it.
-    """,
-    model=OpenAIChatCompletionsModel(
-        openai_client=client,
-        model=MODEL_NAME
-    ),
+        agent = await _select_agent(input_text, follow_up)
+        result = Runner.run_streamed(agent, await _agent_input(agent, input_text, history), context=context)
 
-    handoffs=[trending_news_agent, fact_check_agent, article_summarizer_agent],
-)
+        async for event in result.stream_events():
+            if event.type == "raw_response_event":
+                if getattr(event.data, "type", None) == "response.output_text.delta":
+                    yield ConversationEvent("token", text=event.data.delta)
+            elif event.type == "agent_updated_stream_event":
+                label = AGENT_LABELS.get(event.new_agent.name, event.new_agent.name)
+                if event.new_agent.name == CONVERSATION_AGENT_NAME:
+                    yield ConversationEvent("status", text="Understanding your question…")
+                else:
+                    yield ConversationEvent("status", text=f"Routing to {label}…")
+            elif event.type == "run_item_stream_event" and event.name == "tool_called":
+                tool_name = getattr(event.item.raw_item, "name", "tool")
+                yield ConversationEvent("status", text=f"Running {tool_name}…")
+        scope.name = result.current_agent.name
 
+        await _remember_answer(input_text, result, cacheable=not follow_up)
+        await _remember_turn(context, input_text, result.final_output, asked_at)
+        yield ConversationEvent("final", output=result.final_output)
 
 
 async def main():
@@ -85,20 +339,20 @@ async def main():
     input_text = "I want to become a Data Scientist. What skills do I need?"
     print("\n" + "="*50)
     print(f"QUERY: {input_text}")
-    result = await Runner.run(conversation_agent, input_text)
-    #print(f"RESULT: {result}")
+    final_output = await run_conversation(input_text)
+    #print(f"RESULT: {final_output}")
 
-    if hasattr(result.final_output, "headlines"):  
+    if hasattr(final_output, "headlines"):  
         #print("********Trending News************")
-        for item in result.final_output.headlines:
+        for item in final_output.headlines:
             print(f"  Rank #{item.rank}: {item.headline}")
             print(f"  Source: {item.source}\n")
-    elif hasattr(result.final_output, "result"): 
+    elif hasattr(final_output, "result"): 
         #print("*******Fact check*********")                
-        print(f"{result.final_output.result}")
-    elif hasattr(result.final_output, "summary_text"):  
+        print(f"{final_output.result}")
+    elif hasattr(final_output, "summary_text"):  
         #print("**********Summarize Article***********")
-        print(f"Summary: {result.final_output.summary_text}")        
+        print(f"Summary: {final_output.summary_text}")        
     else:
         print("Sorry, I can't assist with that.")
 
@@ -0,0 +1,306 @@
+"""
+Embedding backends for the fact-check knowledge base and everything that shares it.
+
+The backend is chosen by EMBEDDING_MODEL:
+
+    all-MiniLM-L6-v2              sentence-transformers (PyTorch), the original backend
+    onnx:all-MiniLM-L6-v2         ONNX Runtime, float32
+    onnx-int8:all-MiniLM-L6-v2    ONNX Runtime, dynamically quantized to int8 (CPU hosts)
+    onnx-int8:/path/to/model_dir  any exported model dir with model.onnx and tokenizer.json
+
+All backends return L2-normalised float32 vectors, so the ONNX MiniLM vectors are
+interchangeable with the ones already stored by the sentence-transformers backend.
+"""
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import logfire
+import numpy as np
+
+from config import get_float, get_int, get_str
+
+
+# --- Configuration ---
+
+EMBEDDING_MODEL = get_str("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+# ONNX Runtime intra-op threads per inference; 0 lets ONNX Runtime decide.
+EMBEDDING_THREADS = get_int("EMBEDDING_THREADS", 0)
+# Concurrent small requests are merged into one forward pass of up to this many texts...
+EMBEDDING_MAX_BATCH = get_int("EMBEDDING_MAX_BATCH", 64)
+# ...waiting at most this long for company; 0 disables micro-batching.
+EMBEDDING_BATCH_WAIT_MS = get_float("EMBEDDING_BATCH_WAIT_MS", 2)
+EMBEDDING_MAX_TOKENS = 256
+# Where downloaded ONNX exports (and their int8 versions) are kept.
+EMBEDDING_MODEL_CACHE = os.path.expanduser(get_str("EMBEDDING_MODEL_CACHE", "~/.cache/newssense/onnx"))
+
+# Hugging Face repos that publish an ONNX export (onnx/model.onnx) and tokenizer.json.
+ONNX_EXPORTS = {
+    "all-MiniLM-L6-v2": "sentence-transformers/all-MiniLM-L6-v2",
+}
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+class EmbeddingBackend:
+    """Base class: turn a list of texts into a list of normalised float32 vectors."""
+
+    model_name = ""
+
+    def name(self) -> str:
+        return self.model_name
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        raise NotImplementedError
+
+    def __call__(self, input: list[str]) -> list[np.ndarray]:
+        if not input:
+            return []
+        return list(self.embed(list(input)))
+
+
+# --- 1. sentence-transformers (PyTorch) ---
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    def __init__(self, model_name: str):
+        # Imported here because torch alone takes seconds to import.
+        from chromadb.utils import embedding_functions
+
+        self.model_name = model_name
+        self._function = embedding_functions.SentenceTransformerEmbeddingFunction(model_name=model_name)
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        return _normalize(np.asarray(self._function(texts), dtype=np.float32))
+
+
+# --- 2. ONNX Runtime ---
+
+def _onnx_model_dir(model: str) -> str:
+    """A directory with model.onnx and tokenizer.json, downloading a known export if needed."""
+    if os.path.isdir(model):
+        return model
+    repo_id = ONNX_EXPORTS.get(model)
+    if repo_id is None:
+        raise ValueError(f"No ONNX export known for '{model}'; pass a directory with model.onnx and tokenizer.json")
+    model_dir = os.path.join(EMBEDDING_MODEL_CACHE, model)
+    model_path = os.path.join(model_dir, "model.onnx")
+    if os.path.exists(model_path) and os.path.exists(os.path.join(model_dir, "tokenizer.json")):
+        return model_dir
+
+    from huggingface_hub import hf_hub_download
+
+    print(f"⬇️  Downloading the ONNX export of {model} from {repo_id}")
+    try:
+        hf_hub_download(repo_id, "tokenizer.json", local_dir=model_dir)
+        downloaded = hf_hub_download(repo_id, "onnx/model.onnx", local_dir=model_dir)
+    except Exception as e:
+        raise RuntimeError(f"Could not download the ONNX export of {model} from {repo_id}: {e}. "
+                           f"Set EMBEDDING_MODEL=onnx:/path/to/model_dir to use a local copy.") from e
+    os.replace(downloaded, model_path)
+    return model_dir
+
+
+def _quantized_model_path(model_dir: str) -> str:
+    """Return the int8 model, quantizing (weights only, dynamic) on first use."""
+    source = os.path.join(model_dir, "model.onnx")
+    target = os.path.join(model_dir, "model.int8.onnx")
+    if os.path.exists(target):
+        return target
+    try:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+    except ImportError as e:
+        logfire.warn("int8 quantization needs the onnx package ({error}); using float32", error=str(e))
+        return source
+    print(f"🗜️  Quantizing {source} to int8 (one-off)")
+    tmp_target = target + ".tmp"
+    quantize_dynamic(source, tmp_target, weight_type=QuantType.QInt8)
+    os.replace(tmp_target, target)
+    return target
+
+
+class OnnxBackend(EmbeddingBackend):
+    """
+    Mean-pooled transformer embeddings on ONNX Runtime.
+
+    Batches are padded to their longest text rather than to the maximum length,
+    and texts are sorted by length first, so short claims cost only their own tokens.
+    """
+
+    def __init__(self, model: str, quantize: bool = True, threads: int = EMBEDDING_THREADS,
+                 max_batch: int = EMBEDDING_MAX_BATCH):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.model_name = f"{'onnx-int8' if quantize else 'onnx'}:{model}"
+        self.max_batch = max_batch
+        model_dir = _onnx_model_dir(model)
+        model_path = _quantized_model_path(model_dir) if quantize else os.path.join(model_dir, "model.onnx")
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=EMBEDDING_MAX_TOKENS)
+        self.tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.inter_op_num_threads = 1
+        if threads > 0:
+            options.intra_op_num_threads = threads
+        options.log_severity_level = 3
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        self._input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    def _forward(self, texts: list[str]) -> np.ndarray:
+        encoded = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encoded], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encoded], dtype=np.int64)
+        inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            inputs["token_type_ids"] = np.zeros_like(input_ids)
+        hidden = self.session.run(None, inputs)[0]
+
+        mask = attention_mask[..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return _normalize(pooled.astype(np.float32))
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors = np.empty((len(texts), 0), dtype=np.float32)
+        for start in range(0, len(order), self.max_batch):
+            batch = order[start:start + self.max_batch]
+            output = self._forward([texts[i] for i in batch])
+            if vectors.shape[1] == 0:
+                vectors = np.empty((len(texts), output.shape[1]), dtype=np.float32)
+            vectors[batch] = output
+        return vectors
+
+
+# --- 3. Micro-batching ---
+
+class MicroBatcher(EmbeddingBackend):
+    """
+    Merges small embedding requests from concurrent callers into shared forward passes.
+
+    A caller's texts are queued; a single worker thread waits up to `wait_ms` for
+    more requests (or until `max_batch` texts are pending), embeds them together and
+    hands each caller its own rows. Requests already at `max_batch` skip the queue.
+    """
+
+    def __init__(self, backend: EmbeddingBackend, max_batch: int = EMBEDDING_MAX_BATCH,
+                 wait_ms: float = EMBEDDING_BATCH_WAIT_MS):
+        self.backend = backend
+        self.model_name = backend.model_name
+        self.max_batch = max_batch
+        self.wait_seconds = wait_ms / 1000
+        self.batches = 0
+        self.requests = 0
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._worker.start()
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        if len(texts) >= self.max_batch:
+            return self.backend.embed(texts)
+        future = Future()
+        self._queue.put((texts, future))
+        return future.result()
+
+    def _run(self) -> None:
+        while True:
+            pending = [self._queue.get()]
+            size = len(pending[0][0])
+            deadline = time.perf_counter() + self.wait_seconds
+            while size < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                pending.append(request)
+                size += len(request[0])
+            self._embed_pending(pending)
+
+    def _embed_pending(self, pending: list) -> None:
+        texts = [text for request_texts, _ in pending for text in request_texts]
+        try:
+            vectors = self.backend.embed(texts)
+        except Exception as e:
+            for _, future in pending:
+                future.set_exception(e)
+            return
+        self.batches += 1
+        self.requests += len(pending)
+        offset = 0
+        for request_texts, future in pending:
+            future.set_result(vectors[offset:offset + len(request_texts)])
+            offset += len(request_texts)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "requests_per_batch": round(self.requests / self.batches, 2) if self.batches else None,
+        }
+
+
+# --- 4. Selection ---
+
+def create_embedding_backend(spec: str = EMBEDDING_MODEL, micro_batching: bool = True,
+                             cache: bool = True) -> EmbeddingBackend:
+    """
+    Build the backend described by an EMBEDDING_MODEL value, behind the
+    micro-batcher and the persistent embedding cache (when enabled).
+    """
+    with logfire.span("create_embedding_backend {spec}", spec=spec):
+        start = time.perf_counter()
+        backend_name, _, model = spec.partition(":")
+        if not model:
+            backend = SentenceTransformerBackend(spec)
+        elif backend_name == "onnx":
+            backend = OnnxBackend(model, quantize=False)
+        elif backend_name == "onnx-int8":
+            backend = OnnxBackend(model, quantize=True)
+        else:
+            raise ValueError(f"Unknown embedding backend '{backend_name}' in EMBEDDING_MODEL={spec}")
+        print(f"🧮 Embedding backend {backend.model_name} ready in {time.perf_counter() - start:.2f}s")
+
+    if micro_batching and EMBEDDING_BATCH_WAIT_MS > 0:
+        backend = MicroBatcher(backend)
+    if cache:
+        from embedding_cache import EMBEDDING_CACHE_ENABLED, CachedEmbeddingBackend, EmbeddingCache
+
+        if EMBEDDING_CACHE_ENABLED:
+            # Cache hits never reach the batcher or the model.
+            backend = CachedEmbeddingBackend(backend, EmbeddingCache())
+    return backend
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Measure embedding throughput of one or more backends.")
+    parser.add_argument("specs", nargs="*", default=[EMBEDDING_MODEL], help="EMBEDDING_MODEL values to compare.")
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=32)
+    args = parser.parse_args()
+
+    sample = [f"Claim {i}: the company reported revenue of {i * 7 % 997} million dollars in Q{i % 4 + 1}."
+              for i in range(args.texts)]
+    results = {}
+    for spec in args.specs:
+        backend = create_embedding_backend(spec, micro_batching=False, cache=False)
+        backend(sample[:args.batch])  # warm up
+        start = time.perf_counter()
+        for i in range(0, len(sample), args.batch):
+            backend(sample[i:i + args.batch])
+        elapsed = time.perf_counter() - start
+        results[spec] = {"texts_per_second": round(len(sample) / elapsed, 1)}
+    print(json.dumps(results, indent=2))
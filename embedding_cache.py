@@ -0,0 +1,187 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import logfire
+import numpy as np
+
+from config import get_bool, get_float, get_int, get_str
+from embedding_backends import EmbeddingBackend
+from fact_check_service import CHROMA_PATH
+
+
+# --- Configuration ---
+
+EMBEDDING_CACHE_ENABLED = get_bool("EMBEDDING_CACHE_ENABLED", True)
+# Shared by every process using the same knowledge base (API workers, Streamlit, ingestion).
+EMBEDDING_CACHE_PATH = get_str("EMBEDDING_CACHE_PATH", os.path.join(CHROMA_PATH, "embedding_cache.sqlite3"))
+EMBEDDING_CACHE_MAX_ENTRIES = get_int("EMBEDDING_CACHE_MAX_ENTRIES", 500000)
+# Hits refresh an entry's last-use time (for eviction) at most this often, in one batched write.
+EMBEDDING_CACHE_TOUCH_SECONDS = get_float("EMBEDDING_CACHE_TOUCH_SECONDS", 600)
+
+# SQLite's default limit on bound parameters is 999.
+_LOOKUP_BATCH = 900
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+
+def cache_key(model_name: str, text: str) -> bytes:
+    return hashlib.sha256(f"{model_name}\0{normalize_text(text)}".encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """
+    Disk-backed embedding store keyed by (model name, normalized text hash).
+
+    Vectors are float32 blobs in SQLite (WAL mode, so several processes can
+    share one file). When the table grows past `max_entries` the least
+    recently used tenth is evicted; last-use times are accurate to `touch_seconds`.
+    """
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES,
+                 touch_seconds: float = EMBEDDING_CACHE_TOUCH_SECONDS):
+        self.path = path
+        self.max_entries = max_entries
+        self.touch_seconds = touch_seconds
+        self._touched: dict[bytes, float] = {}
+        self._flushed_at = time.time()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key BLOB PRIMARY KEY, model TEXT NOT NULL, vector BLOB NOT NULL, last_used REAL NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._db.commit()
+        self._entries = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def get_many(self, keys: list[bytes]) -> dict[bytes, np.ndarray]:
+        """
+        Look up vectors. This is a read: hits whose last use is older than
+        `touch_seconds` are only queued, and written together once per interval.
+        """
+        found = {}
+        now = time.time()
+        with self._lock:
+            for i in range(0, len(keys), _LOOKUP_BATCH):
+                batch = keys[i:i + _LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._db.execute(
+                    f"SELECT key, vector, last_used FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, vector, last_used in rows:
+                    found[key] = np.frombuffer(vector, dtype=np.float32)
+                    if last_used < now - self.touch_seconds:
+                        self._touched[key] = now
+            self.hits += len(found)
+            self.misses += len(set(keys)) - len(found)
+            if self._touched and now - self._flushed_at >= self.touch_seconds:
+                self._flush_touches(now)
+        return found
+
+    def _flush_touches(self, now: float) -> None:
+        # Called with the lock held.
+        if self._touched:
+            self._db.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?",
+                                 [(used, key) for key, used in self._touched.items()])
+            self._db.commit()
+            self._touched.clear()
+        self._flushed_at = now
+
+    def flush(self) -> None:
+        """Write queued last-use times now."""
+        with self._lock:
+            self._flush_touches(time.time())
+
+    def put_many(self, model_name: str, items: list[tuple[bytes, np.ndarray]]) -> None:
+        now = time.time()
+        rows = [(key, model_name, np.asarray(vector, dtype=np.float32).tobytes(), now) for key, vector in items]
+        with self._lock:
+            # Insert new keys and count them; keys another process already stored are only refreshed.
+            changes_before = self._db.total_changes
+            self._db.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, model, vector, last_used) VALUES (?, ?, ?, ?)", rows
+            )
+            inserted = self._db.total_changes - changes_before
+            if inserted < len(rows):
+                self._db.executemany("UPDATE embeddings SET model = ?, vector = ?, last_used = ? WHERE key = ?",
+                                     [(model, vector, used, key) for key, model, vector, used in rows])
+            self._db.commit()
+            self._entries += inserted
+            if self._entries > self.max_entries:
+                self._evict()
+
+    def _evict(self) -> None:
+        # Called with the lock held. Recount first: other processes share the file.
+        self._flush_touches(time.time())
+        self._entries = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = self._entries - int(self.max_entries * 0.9)
+        if excess <= 0:
+            return
+        self._db.execute(
+            "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+            (excess,),
+        )
+        self._db.commit()
+        self._entries -= excess
+        self.evictions += excess
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._entries,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "evictions": self.evictions,
+        }
+
+
+class CachedEmbeddingBackend(EmbeddingBackend):
+    """Serves repeated texts from the EmbeddingCache and only sends the rest to the model."""
+
+    def __init__(self, backend: EmbeddingBackend, cache: EmbeddingCache):
+        self.backend = backend
+        self.cache = cache
+        self.model_name = backend.model_name
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        keys = [cache_key(self.model_name, text) for text in texts]
+        try:
+            cached = self.cache.get_many(keys)
+        except sqlite3.Error as e:
+            logfire.warn("Embedding cache lookup failed: {error}", error=str(e))
+            return self.backend.embed(texts)
+
+        # Embed each missing text once, even if it repeats within the batch.
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+        if missing:
+            vectors = self.backend.embed(list(missing.values()))
+            computed = dict(zip(missing, vectors))
+            cached.update(computed)
+            try:
+                self.cache.put_many(self.model_name, list(computed.items()))
+            except sqlite3.Error as e:
+                logfire.warn("Embedding cache write failed: {error}", error=str(e))
+        return np.stack([cached[key] for key in keys])
+
+    def stats(self) -> dict:
+        stats = {"cache": self.cache.stats()}
+        if hasattr(self.backend, "stats"):
+            stats["backend"] = self.backend.stats()
+        return stats
@@ -0,0 +1,120 @@
+import threading
+
+import numpy as np
+
+from chunked_summarizer import (SUMMARY_CHUNK_TOKENS, _split_oversized, estimate_tokens, map_reduce_summarize,
+                                split_sentences, summary_budget)
+from config import get_int, get_str
+from embedding_backends import EMBEDDING_MODEL, create_embedding_backend
+from metrics import timed
+from tool_runtime import run_blocking, tool_limit
+
+
+# --- Configuration ---
+
+# "auto" uses the LLM on an extracted excerpt; "extractive" never calls the LLM.
+SUMMARY_MODE = get_str("SUMMARY_MODE", "auto")
+# Long articles are cut down to their most salient sentences within this many tokens; 0 disables.
+SUMMARY_EXTRACT_TOKENS = get_int("SUMMARY_EXTRACT_TOKENS", 1500)
+SUMMARY_EXTRACTIVE_BULLETS = get_int("SUMMARY_EXTRACTIVE_BULLETS", 6)
+
+# Above this many sentences the O(n²) similarity graph is replaced by centroid scoring.
+MAX_GRAPH_SENTENCES = 2000
+DAMPING = 0.85
+
+
+def extractive_only() -> bool:
+    """True when summaries must be produced without any LLM call."""
+    return SUMMARY_MODE == "extractive" or summary_budget.exhausted
+
+
+_embedding_function = None
+_embedding_lock = threading.Lock()
+
+
+def _get_embedding_function():
+    """The summarizer's own embedding backend, so summarizing never opens the fact-check store."""
+    global _embedding_function
+    if _embedding_function is None:
+        with _embedding_lock:
+            if _embedding_function is None:
+                _embedding_function = create_embedding_backend(EMBEDDING_MODEL)
+    return _embedding_function
+
+
+def _embed(sentences: list[str]) -> np.ndarray:
+    vectors = np.asarray(_get_embedding_function()(sentences), dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def textrank_scores(vectors: np.ndarray, iterations: int = 50, tolerance: float = 1e-6) -> np.ndarray:
+    """PageRank over the cosine-similarity graph of sentence vectors."""
+    n = len(vectors)
+    if n > MAX_GRAPH_SENTENCES:
+        # Degree centrality against the document centroid is linear in n.
+        centroid = vectors.mean(axis=0)
+        return vectors @ centroid
+
+    similarity = np.clip(vectors @ vectors.T, 0, None)
+    np.fill_diagonal(similarity, 0)
+    row_sums = similarity.sum(axis=1, keepdims=True)
+    transition = np.divide(similarity, row_sums, out=np.full_like(similarity, 1 / n), where=row_sums > 0)
+
+    scores = np.full(n, 1 / n, dtype=np.float32)
+    for _ in range(iterations):
+        updated = (1 - DAMPING) / n + DAMPING * (transition.T @ scores)
+        if np.abs(updated - scores).sum() < tolerance:
+            return updated
+        scores = updated
+    return scores
+
+
+def extract_key_sentences(text: str, max_tokens: int = SUMMARY_EXTRACT_TOKENS,
+                          max_sentences: int = None) -> list[str]:
+    """
+    Return the most salient sentences of `text`, in their original order,
+    within a token budget (and optionally a sentence count).
+    """
+    sentences = split_sentences(" ".join(text.split()))
+    if len(sentences) <= 1:
+        # Nothing to rank (e.g. text without sentence punctuation), but still keep to the budget.
+        return _split_oversized(sentences[0], max_tokens)[:1] if sentences else []
+
+    scores = textrank_scores(_embed(sentences))
+    chosen = []
+    used_tokens = 0
+    for index in np.argsort(-scores):
+        sentence_tokens = estimate_tokens(sentences[index])
+        if used_tokens + sentence_tokens > max_tokens:
+            continue
+        chosen.append(int(index))
+        used_tokens += sentence_tokens
+        if max_sentences is not None and len(chosen) >= max_sentences:
+            break
+    return [sentences[index] for index in sorted(chosen)]
+
+
+def extractive_summary(text: str, bullets: int = SUMMARY_EXTRACTIVE_BULLETS) -> str:
+    """A summary made only of the article's own key sentences, as "- " bullet points."""
+    sentences = extract_key_sentences(text, max_sentences=bullets)
+    return "\n".join(f"- {sentence}" for sentence in sentences)
+
+
+async def condense_article(article_text: str) -> str:
+    """
+    Cut an article over SUMMARY_CHUNK_TOKENS down before any agent sees it, so the
+    model never reads (or echoes back) the full text: its key sentences first, then
+    chunked map-reduce if those are still too long. Shorter text is returned unchanged.
+    """
+    if estimate_tokens(article_text) <= SUMMARY_CHUNK_TOKENS:
+        return article_text
+    async with tool_limit("summarize"):
+        if SUMMARY_EXTRACT_TOKENS > 0:
+            with timed("summarize", "extract"):
+                sentences = await run_blocking(extract_key_sentences, article_text, SUMMARY_EXTRACT_TOKENS)
+            article_text = " ".join(sentences)
+        if estimate_tokens(article_text) <= SUMMARY_CHUNK_TOKENS:
+            return "Key sentences extracted from a long article:\n" + article_text
+        with timed("summarize", "map_reduce"):
+            return "Bullet points summarizing a long article, chunk by chunk:\n" + await map_reduce_summarize(article_text)
@@ -0,0 +1,240 @@
+import json
+import threading
+import time
+from collections import deque
+
+import logfire
+
+from config import get_int, get_str
+
+
+# --- Configuration ---
+
+CHROMA_PATH = get_str("CHROMA_PATH", "./chroma_db")
+COLLECTION_NAME = get_str("FACT_CHECK_COLLECTION", "knowledge_base")
+# Backend and model, e.g. "all-MiniLM-L6-v2" or "onnx-int8:all-MiniLM-L6-v2" (see embedding_backends.py).
+EMBEDDING_MODEL_NAME = get_str("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+
+# HNSW index parameters. Search ef, batch and sync sizes are applied to existing
+# collections when they load; construction ef and M only when a collection is
+# created or rebuilt (python index_admin.py rebuild). Defaults are ChromaDB's.
+HNSW_CONSTRUCTION_EF = get_int("HNSW_CONSTRUCTION_EF", 100)
+HNSW_SEARCH_EF = get_int("HNSW_SEARCH_EF", 100)
+HNSW_M = get_int("HNSW_M", 16)
+HNSW_BATCH_SIZE = get_int("HNSW_BATCH_SIZE", 100)
+HNSW_SYNC_THRESHOLD = get_int("HNSW_SYNC_THRESHOLD", 1000)
+
+# Settings that can change on an existing index.
+TUNABLE_HNSW_SETTINGS = ("ef_search", "batch_size", "sync_threshold")
+
+
+def hnsw_configuration(**overrides) -> dict:
+    """The HNSW configuration for a fact-check collection, with optional overrides (None is ignored)."""
+    configuration = {
+        "space": "cosine",  # Use cosine similarity
+        "ef_construction": HNSW_CONSTRUCTION_EF,
+        "ef_search": HNSW_SEARCH_EF,
+        "max_neighbors": HNSW_M,
+        "batch_size": HNSW_BATCH_SIZE,
+        "sync_threshold": HNSW_SYNC_THRESHOLD,
+    }
+    configuration.update({key: value for key, value in overrides.items() if value is not None})
+    return configuration
+
+
+def hnsw_settings(collection) -> dict:
+    """A collection's stored HNSW settings (read raw: `.configuration` would build its embedding function)."""
+    return dict((collection.configuration_json or {}).get("hnsw") or {})
+
+
+def apply_hnsw_configuration(collection, configuration: dict) -> None:
+    """
+    Bring an existing collection's tunable HNSW settings in line with `configuration`
+    (before its index is first loaded, so they take effect) and warn when it was
+    built with different construction parameters.
+    """
+    current = hnsw_settings(collection)
+    # Only settings the collection reports back can be compared (and so kept in step).
+    changes = {key: configuration[key] for key in TUNABLE_HNSW_SETTINGS
+               if key in current and current[key] != configuration[key]}
+    if changes:
+        collection.modify(configuration={"hnsw": changes})
+    built_with = {key: current[key] for key in ("ef_construction", "max_neighbors")
+                  if key in current and current[key] != configuration[key]}
+    if built_with:
+        logfire.warn("Collection {name} was built with {built_with}; run `python index_admin.py rebuild` "
+                     "to apply HNSW_CONSTRUCTION_EF / HNSW_M", name=collection.name, built_with=built_with)
+
+
+class LatencyTracker:
+    """Keeps a rolling window of latencies and reports percentiles in milliseconds."""
+
+    def __init__(self, window: int = 1024):
+        self._samples = deque(maxlen=window)
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+            self._count += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            samples = sorted(self._samples)
+            count = self._count
+        if not samples:
+            return {"count": count, "p50_ms": None, "p95_ms": None, "p99_ms": None}
+
+        def percentile(q: float) -> float:
+            index = min(len(samples) - 1, int(round(q * (len(samples) - 1))))
+            return round(samples[index] * 1000, 3)
+
+        return {
+            "count": count,
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+        }
+
+
+class FactCheckRetriever:
+    """
+    Long-lived handle on the fact-check knowledge base.
+
+    The ChromaDB client, the embedding model and the collection are created once
+    and shared by every caller in the process. Loading is guarded by a lock so
+    concurrent agent runs never load the model twice.
+    """
+
+    def __init__(self, path: str = CHROMA_PATH, collection_name: str = COLLECTION_NAME,
+                 model_name: str = EMBEDDING_MODEL_NAME, embedding_function=None):
+        self.path = path
+        self.collection_name = collection_name
+        self.model_name = model_name
+        self.load_seconds = None
+        self.query_latency = LatencyTracker()
+        self._client = None
+        # An explicit embedding function (e.g. an offline stub for benchmarks) replaces the model.
+        self._embedding_function = embedding_function
+        self._collection = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._collection is not None
+
+    @property
+    def embedding_function(self):
+        """The shared embedding function, loading it on first access."""
+        if self._embedding_function is None:
+            self.load()
+        return self._embedding_function
+
+    @property
+    def collection(self):
+        """The ChromaDB collection, loading it on first access."""
+        if self._collection is None:
+            self.load()
+        return self._collection
+
+    def load(self) -> None:
+        """Create the client, embedding function and collection exactly once."""
+        if self._collection is not None:
+            return
+        with self._lock:
+            if self._collection is not None:
+                return
+            with logfire.span("fact_check_retriever.load"):
+                start = time.perf_counter()
+
+                # Imported here so that processes which never fact-check don't pay for them.
+                import chromadb
+                from embedding_backends import create_embedding_backend
+
+                self._client = chromadb.PersistentClient(path=self.path)
+                if self._embedding_function is None:
+                    self._embedding_function = create_embedding_backend(self.model_name)
+                # The knowledge base is populated offline by ingest_knowledge_base.py,
+                # never from the request path. Vectors always come from our own backend,
+                # so the collection carries no embedding function of its own.
+                configuration = hnsw_configuration()
+                collection = self._client.get_or_create_collection(
+                    name=self.collection_name,
+                    embedding_function=None,
+                    configuration={"hnsw": configuration},
+                )
+                # get_or_create ignores the configuration of a collection that already exists.
+                apply_hnsw_configuration(collection, configuration)
+                self._collection = collection
+                self.load_seconds = time.perf_counter() - start
+            logfire.info("Fact-check knowledge base {collection} loaded in {seconds:.2f}s",
+                         collection=self.collection_name, seconds=self.load_seconds)
+
+    def warm_up(self, background: bool = False):
+        """
+        Load the collection and run one throwaway query so the first real request
+        doesn't pay for model initialisation. With background=True the work runs
+        on a daemon thread and the thread is returned.
+        """
+        if background:
+            thread = threading.Thread(target=self.warm_up, name="fact-check-warmup", daemon=True)
+            thread.start()
+            return thread
+        try:
+            self.query("warm up")
+        except Exception as e:
+            logfire.warn("Fact-check warm-up failed: {error}", error=str(e))
+        return None
+
+    def query(self, claim: str, n_results: int = 1) -> dict:
+        """Return the nearest knowledge base entries for a claim."""
+        return self.query_batch([claim], n_results=n_results)
+
+    def query_batch(self, claims: list[str], n_results: int = 1) -> dict:
+        """
+        Return the nearest knowledge base entries for several claims at once.
+
+        All claims are embedded in a single forward pass and sent to ChromaDB as
+        one query; the result lists are indexed in the same order as `claims`.
+        """
+        collection = self.collection
+        start = time.perf_counter()
+        try:
+            embeddings = self.embedding_function(claims)
+            return collection.query(query_embeddings=embeddings, n_results=n_results)
+        finally:
+            self.query_latency.record(time.perf_counter() - start)
+
+    def stats(self) -> dict:
+        """Load time, query latency percentiles and embedding cache/batching stats for this process."""
+        stats = {
+            "loaded": self.is_loaded,
+            "load_seconds": None if self.load_seconds is None else round(self.load_seconds, 3),
+            "query_latency": self.query_latency.snapshot(),
+        }
+        if hasattr(self._embedding_function, "stats"):
+            stats["embedding"] = self._embedding_function.stats()
+        return stats
+
+
+_retriever = None
+_retriever_lock = threading.Lock()
+
+
+def get_retriever() -> FactCheckRetriever:
+    """Return the process-wide FactCheckRetriever."""
+    global _retriever
+    if _retriever is None:
+        with _retriever_lock:
+            if _retriever is None:
+                _retriever = FactCheckRetriever()
+    return _retriever
+
+
+if __name__ == "__main__":
+    retriever = get_retriever()
+    retriever.warm_up()
+    for claim in ["I heard Apple bought OpenAI, is that true?", "Is Google launching a new smartphone?"]:
+        print(f"{claim} -> {retriever.query(claim)['distances']}")
+    print(json.dumps(retriever.stats(), indent=2))
@@ -0,0 +1,372 @@
+import hashlib
+import math
+import os
+import pickle
+import re
+import threading
+import time
+from array import array
+
+import logfire
+import numpy as np
+
+from config import get_bool, get_int, get_json
+from fact_check_service import FactCheckRetriever, get_retriever
+
+
+# --- Configuration ---
+
+# Off by default: the vector-only 0.6 match rule stays until hybrid retrieval is opted into.
+FACT_CHECK_HYBRID = get_bool("FACT_CHECK_HYBRID", False)
+FACT_CHECK_TOP_K = get_int("FACT_CHECK_TOP_K", 5)
+FACT_CHECK_RERANK = get_bool("FACT_CHECK_RERANK", True)
+RRF_K = 60
+
+# Match thresholds per collection. A candidate matches when its cosine distance
+# is under max_distance (the same 0.6 as rag_fact_check.MATCH_THRESHOLD), or when
+# it contains at least min_keyword_coverage of the claim's terms (names, tickers,
+# numbers) and is under relaxed_max_distance. The relaxed rule is off by default
+# (relaxed_max_distance == max_distance); raise it per collection in
+# FACT_CHECK_THRESHOLDS only after measuring false matches on real claims.
+DEFAULT_THRESHOLDS = {
+    "max_distance": 0.6,
+    "relaxed_max_distance": 0.6,
+    "min_keyword_coverage": 0.8,
+}
+COLLECTION_THRESHOLDS = get_json("FACT_CHECK_THRESHOLDS", {})
+
+
+def thresholds_for(collection_name: str) -> dict:
+    return {**DEFAULT_THRESHOLDS, **COLLECTION_THRESHOLDS.get(collection_name, {})}
+
+
+def passes_thresholds(candidate: dict, thresholds: dict) -> bool:
+    if candidate["distance"] < thresholds["max_distance"]:
+        return True
+    return (candidate["coverage"] >= thresholds["min_keyword_coverage"]
+            and candidate["distance"] < thresholds["relaxed_max_distance"])
+
+
+# --- 1. BM25 inverted index ---
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "did", "do", "does", "for", "from", "has", "have",
+    "heard", "i", "in", "is", "it", "its", "of", "on", "or", "that", "the", "this", "to", "true", "was",
+    "were", "will", "with", "what", "who", "really",
+}
+_TOKEN = re.compile(r"[a-z0-9]+(?:[.'][a-z0-9]+)*")
+
+
+def tokenize(text: str) -> list[str]:
+    return [token for token in _TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    In-process BM25 index over the documents of one ChromaDB collection.
+
+    Postings are compact int arrays so a million short claims fit in memory.
+    Re-adding an id tombstones its old row; build() from the collection compacts.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.ids: list[str] = []
+        self.source_count = 0
+        # content_fingerprint() of the ChromaDB directory when the index was last in step.
+        self.fingerprint = None
+        self._rows: dict[str, int] = {}
+        self._doc_lengths = array("f")
+        self._alive = bytearray()
+        self._postings: dict[str, tuple[array, array]] = {}
+        self._total_length = 0.0
+        self._live = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return self._live
+
+    def add(self, ids: list[str], documents: list[str]) -> None:
+        with self._lock:
+            for record_id, document in zip(ids, documents):
+                old_row = self._rows.get(record_id)
+                if old_row is not None and self._alive[old_row]:
+                    self._alive[old_row] = 0
+                    self._total_length -= self._doc_lengths[old_row]
+                    self._live -= 1
+
+                row = len(self.ids)
+                tokens = tokenize(document)
+                self.ids.append(record_id)
+                self._rows[record_id] = row
+                self._doc_lengths.append(len(tokens))
+                self._alive.append(1)
+                self._total_length += len(tokens)
+                self._live += 1
+
+                counts = {}
+                for token in tokens:
+                    counts[token] = counts.get(token, 0) + 1
+                for token, count in counts.items():
+                    rows, tfs = self._postings.setdefault(token, (array("i"), array("i")))
+                    rows.append(row)
+                    tfs.append(count)
+
+    def search(self, query: str, k: int) -> list[tuple[str, float, float]]:
+        """Return up to k (id, bm25 score, fraction of query terms matched), best first."""
+        terms = set(tokenize(query))
+        with self._lock:
+            if not terms or not self._live:
+                return []
+            n = len(self.ids)
+            scores = np.zeros(n, dtype=np.float32)
+            matched = np.zeros(n, dtype=np.int16)
+            doc_lengths = np.frombuffer(self._doc_lengths, dtype=np.float32, count=n)
+            average_length = self._total_length / self._live or 1.0
+
+            for term in terms:
+                postings = self._postings.get(term)
+                if postings is None:
+                    continue
+                rows = np.frombuffer(postings[0], dtype=np.int32)
+                tfs = np.frombuffer(postings[1], dtype=np.int32).astype(np.float32)
+                idf = math.log(1 + (self._live - len(rows) + 0.5) / (len(rows) + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * doc_lengths[rows] / average_length)
+                scores[rows] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+                matched[rows] += 1
+
+            scores *= np.frombuffer(self._alive, dtype=np.uint8, count=n)
+            k = min(k, n)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [
+                (self.ids[row], float(scores[row]), float(matched[row]) / len(terms))
+                for row in top if scores[row] > 0
+            ]
+
+    def coverage(self, query: str, document: str) -> float:
+        terms = set(tokenize(query))
+        return len(terms & set(tokenize(document))) / len(terms) if terms else 0.0
+
+    # --- persistence ---
+
+    def save(self, path: str) -> None:
+        with self._lock:
+            state = {
+                "k1": self.k1, "b": self.b, "ids": self.ids, "source_count": self.source_count,
+                "fingerprint": self.fingerprint,
+                "doc_lengths": self._doc_lengths, "alive": self._alive, "postings": self._postings,
+            }
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+        index = cls(k1=state["k1"], b=state["b"])
+        index.ids = state["ids"]
+        index.source_count = state["source_count"]
+        index.fingerprint = state.get("fingerprint")
+        index._doc_lengths = state["doc_lengths"]
+        index._alive = state["alive"]
+        index._postings = state["postings"]
+        index._rows = {record_id: row for row, record_id in enumerate(index.ids) if index._alive[row]}
+        index._live = len(index._rows)
+        index._total_length = float(sum(length for length, alive in zip(index._doc_lengths, index._alive) if alive))
+        return index
+
+    @classmethod
+    def build(cls, collection, page_size: int = 5000) -> "BM25Index":
+        """Build the index from every document in a ChromaDB collection."""
+        index = cls()
+        offset = 0
+        while True:
+            page = collection.get(limit=page_size, offset=offset, include=["documents"])
+            if not page["ids"]:
+                break
+            index.add(page["ids"], page["documents"])
+            offset += len(page["ids"])
+        index.source_count = offset
+        return index
+
+
+# Written by ingest_knowledge_base.py next to the collections it loads.
+INGEST_CHECKPOINT_FILE = "ingest_checkpoint.json"
+
+
+def bm25_index_path(retriever: FactCheckRetriever) -> str:
+    """The BM25 index lives next to the ChromaDB files of its collection."""
+    return os.path.join(retriever.path, f"bm25_{retriever.collection_name}.pkl")
+
+
+def content_fingerprint(path: str) -> str:
+    """
+    A hash of the ingest checkpoint in a ChromaDB directory. Ingestion saves the
+    checkpoint after every chunk it upserts, so the hash changes whenever documents
+    do, even when updates leave the record count as it was.
+    """
+    checkpoint_path = os.path.join(path, INGEST_CHECKPOINT_FILE)
+    if not os.path.exists(checkpoint_path):
+        return ""
+    with open(checkpoint_path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def load_or_build_index(retriever: FactCheckRetriever) -> BM25Index:
+    """Load the saved index, rebuilding it when missing or out of step with the collection."""
+    path = bm25_index_path(retriever)
+    count = retriever.collection.count()
+    fingerprint = content_fingerprint(retriever.path)
+    if os.path.exists(path):
+        index = BM25Index.load(path)
+        if index.source_count == count and index.fingerprint == fingerprint:
+            return index
+    index = BM25Index.build(retriever.collection)
+    index.fingerprint = fingerprint
+    index.save(path)
+    return index
+
+
+# --- 2. Fusion and reranking ---
+
+def reciprocal_rank_fusion(rankings: list[list[str]], k: int = RRF_K) -> dict[str, float]:
+    scores = {}
+    for ranking in rankings:
+        for rank, record_id in enumerate(ranking):
+            scores[record_id] = scores.get(record_id, 0.0) + 1.0 / (k + rank + 1)
+    return scores
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def rerank_score(distance: float, coverage: float) -> float:
+    """Lightweight rerank: cosine similarity, nudged by how many of the claim's terms appear."""
+    return 0.7 * (1 - distance) + 0.3 * coverage
+
+
+class HybridRetriever:
+    """
+    BM25 + vector retrieval for the fact checker.
+
+    For each claim the vector top-k and the BM25 top-k are fused with
+    reciprocal rank fusion, optionally reranked, and the best candidate that
+    passes the collection's thresholds is returned.
+    """
+
+    def __init__(self, retriever: FactCheckRetriever, top_k: int = FACT_CHECK_TOP_K,
+                 rerank: bool = FACT_CHECK_RERANK, thresholds: dict = None):
+        self.retriever = retriever
+        self.top_k = top_k
+        self.rerank = rerank
+        self.thresholds = thresholds or thresholds_for(retriever.collection_name)
+        self._index = None
+        self._lock = threading.Lock()
+
+    @property
+    def index(self) -> BM25Index:
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = load_or_build_index(self.retriever)
+        return self._index
+
+    def candidates_batch(self, claims: list[str], embeddings=None, where: dict = None) -> list[list[dict]]:
+        """
+        Ranked candidates per claim: dicts with id, document, metadata, distance, coverage, score.
+        Pass `embeddings` when the claims are already embedded; `where` (a ChromaDB
+        metadata filter) applies to vector and keyword candidates alike.
+        """
+        start = time.perf_counter()
+        try:
+            collection = self.retriever.collection
+            if embeddings is None:
+                embeddings = self.retriever.embedding_function(claims)
+            embeddings = np.asarray(embeddings, dtype=np.float32)
+            vector_results = collection.query(query_embeddings=embeddings.tolist(), n_results=self.top_k,
+                                              where=where)
+
+            fused_per_claim = []
+            candidate_ids = set()
+            for i, claim in enumerate(claims):
+                keyword_hits = self.index.search(claim, self.top_k)
+                fused = reciprocal_rank_fusion([vector_results["ids"][i], [hit[0] for hit in keyword_hits]])
+                fused_per_claim.append(fused)
+                candidate_ids.update(fused)
+            if not candidate_ids:
+                return [[] for _ in claims]
+
+            # One round-trip for every candidate's stored vector, document and metadata.
+            stored = collection.get(ids=list(candidate_ids), where=where,
+                                    include=["embeddings", "documents", "metadatas"])
+            vectors = _normalize(np.asarray(stored["embeddings"], dtype=np.float32))
+            queries = _normalize(embeddings)
+            position = {record_id: j for j, record_id in enumerate(stored["ids"])}
+
+            ranked = []
+            for i, claim in enumerate(claims):
+                candidates = []
+                for record_id, fused_score in fused_per_claim[i].items():
+                    j = position.get(record_id)
+                    if j is None:
+                        continue
+                    document = stored["documents"][j]
+                    distance = float(1 - vectors[j] @ queries[i])
+                    coverage = self.index.coverage(claim, document)
+                    candidates.append({
+                        "id": record_id,
+                        "document": document,
+                        "metadata": stored["metadatas"][j],
+                        "distance": distance,
+                        "coverage": coverage,
+                        "score": rerank_score(distance, coverage) if self.rerank else fused_score,
+                    })
+                candidates.sort(key=lambda candidate: candidate["score"], reverse=True)
+                ranked.append(candidates)
+            return ranked
+        finally:
+            self.retriever.query_latency.record(time.perf_counter() - start)
+
+    def is_match(self, candidate: dict) -> bool:
+        return passes_thresholds(candidate, self.thresholds)
+
+    def best_matches(self, claims: list[str]) -> list:
+        """The metadata of the best matching knowledge base entry per claim, or None."""
+        matches = []
+        for candidates in self.candidates_batch(claims):
+            match = next((candidate for candidate in candidates if self.is_match(candidate)), None)
+            matches.append(None if match is None else match["metadata"])
+        return matches
+
+    def warm_up(self, background: bool = False):
+        """Warm up the vector retriever, then load (or build) the BM25 index."""
+        if background:
+            thread = threading.Thread(target=self.warm_up, name="hybrid-warmup", daemon=True)
+            thread.start()
+            return thread
+        self.retriever.warm_up()
+        try:
+            self.index.search("warm up", 1)
+        except Exception as e:
+            logfire.warn("BM25 index warm-up failed: {error}", error=str(e))
+        return None
+
+
+_hybrid_retriever = None
+_hybrid_lock = threading.Lock()
+
+
+def get_hybrid_retriever() -> HybridRetriever:
+    """Return the process-wide HybridRetriever over the shared FactCheckRetriever."""
+    global _hybrid_retriever
+    if _hybrid_retriever is None:
+        with _hybrid_lock:
+            if _hybrid_retriever is None:
+                _hybrid_retriever = HybridRetriever(get_retriever())
+    return _hybrid_retriever
@@ -0,0 +1,324 @@
+"""
+Maintenance of the fact-check HNSW indexes (the knowledge base collection, or
+every shard of it when it is sharded).
+
+    stats     records, HNSW settings, on-disk size and estimated memory per collection
+    warm      load every index into memory and report load time and resident memory growth
+    rebuild   copy a collection into a fresh index, e.g. with new HNSW_M / HNSW_CONSTRUCTION_EF
+    compact   rebuild with the current settings, dropping deleted entries, and rebuild its BM25 index
+    sweep     recall@k against latency for several search_ef values, on the collection's own vectors
+
+Rebuild and compact swap the new index in under the old name; restart the API
+and UI afterwards so they open it. Stored vectors are reused, nothing is re-embedded.
+
+Usage:
+    python index_admin.py stats
+    python index_admin.py rebuild --m 32 --construction-ef 200
+    python index_admin.py sweep --ef 10 20 50 100 200 --queries 500 -k 5 --output sweep.json
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import time
+
+import numpy as np
+
+from fact_check_service import (CHROMA_PATH, COLLECTION_NAME, FactCheckRetriever, hnsw_configuration,
+                                hnsw_settings)
+from hybrid_retrieval import BM25Index, bm25_index_path, content_fingerprint
+from sharded_retrieval import load_manifest
+
+
+HNSW_SEGMENT_TYPE = "urn:chroma:segment/vector/hnsw-local-persisted"
+
+
+# --- 1. Collections and their files ---
+
+def fact_check_collections(path: str, collection_name: str) -> list[str]:
+    """The collection itself, or its shards when it has a shard manifest."""
+    manifest = load_manifest(path, collection_name)
+    return sorted(manifest["shards"]) if manifest else [collection_name]
+
+
+def open_client(path: str):
+    import chromadb
+
+    return chromadb.PersistentClient(path=path)
+
+
+def segment_dir(path: str, collection_name: str):
+    """The directory of a collection's persisted HNSW segment, or None before its first flush."""
+    with sqlite3.connect(f"file:{os.path.join(path, 'chroma.sqlite3')}?mode=ro", uri=True) as db:
+        row = db.execute(
+            "SELECT s.id FROM segments s JOIN collections c ON s.collection = c.id WHERE c.name = ? AND s.type = ?",
+            (collection_name, HNSW_SEGMENT_TYPE),
+        ).fetchone()
+    directory = os.path.join(path, row[0]) if row else None
+    return directory if directory and os.path.isdir(directory) else None
+
+
+def directory_bytes(directory) -> int:
+    if not directory:
+        return 0
+    return sum(entry.stat().st_size for entry in os.scandir(directory) if entry.is_file())
+
+
+def estimated_index_bytes(count: int, dimensions: int, m: int) -> int:
+    """hnswlib memory: per element the vector, 2*M level-0 links and a label; upper levels add ~1/M of that."""
+    level0 = dimensions * 4 + (2 * m * 4 + 4) + 8
+    upper = (m * 4 + 4) / max(m - 1, 1)
+    return int(count * (level0 + upper))
+
+
+def rss_bytes() -> int:
+    """Resident memory of this process (Linux /proc; peak RSS elsewhere)."""
+    try:
+        with open("/proc/self/status", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _mb(size: int) -> float:
+    return round(size / 1024 / 1024, 1)
+
+
+# --- 2. Stats and warm-up ---
+
+def collection_stats(client, path: str, name: str) -> dict:
+    collection = client.get_collection(name)
+    settings = hnsw_settings(collection)
+    count = collection.count()
+    sample = collection.get(limit=1, include=["embeddings"])
+    dimensions = len(sample["embeddings"][0]) if len(sample["ids"]) else 0
+    bm25_path = bm25_index_path(FactCheckRetriever(path=path, collection_name=name))
+    return {
+        "collection": name,
+        "records": count,
+        "dimensions": dimensions,
+        "hnsw": settings,
+        "index_disk_mb": _mb(directory_bytes(segment_dir(path, name))),
+        "index_memory_mb_estimated": _mb(estimated_index_bytes(count, dimensions, settings.get("max_neighbors", 16))),
+        "bm25_disk_mb": _mb(os.path.getsize(bm25_path)) if os.path.exists(bm25_path) else None,
+    }
+
+
+def warm(client, names: list[str]) -> list[dict]:
+    """Open each index with one query (using a stored vector, so no model is needed) and measure it."""
+    results = []
+    for name in names:
+        collection = client.get_collection(name)
+        sample = collection.get(limit=1, include=["embeddings"])
+        if not len(sample["ids"]):
+            continue
+        before = rss_bytes()
+        start = time.perf_counter()
+        collection.query(query_embeddings=[list(sample["embeddings"][0])], n_results=1)
+        results.append({"collection": name, "load_seconds": round(time.perf_counter() - start, 3),
+                        "rss_growth_mb": _mb(rss_bytes() - before), "rss_mb": _mb(rss_bytes())})
+    return results
+
+
+# --- 3. Rebuild and compaction ---
+
+def rebuild(client, path: str, name: str, configuration: dict, page_size: int = 2000) -> dict:
+    """Copy `name` into a new collection built with `configuration`, then swap it in under the same name."""
+    start = time.perf_counter()
+    old = client.get_collection(name)
+    temporary = f"{name[:50]}-rebuild"
+    if temporary in [collection.name for collection in client.list_collections()]:
+        client.delete_collection(temporary)
+    metadata = {key: value for key, value in (old.metadata or {}).items() if not key.startswith("hnsw:")}
+    new = client.create_collection(temporary, configuration={"hnsw": configuration}, metadata=metadata or None,
+                                   embedding_function=None)
+    offset = 0
+    while True:
+        page = old.get(limit=page_size, offset=offset, include=["embeddings", "documents", "metadatas"])
+        if not len(page["ids"]):
+            break
+        new.add(ids=page["ids"], embeddings=page["embeddings"], documents=page["documents"],
+                metadatas=page["metadatas"])
+        offset += len(page["ids"])
+        print(f"   {name}: {offset} records copied")
+    if new.count() != old.count():
+        raise RuntimeError(f"Rebuild of {name} copied {new.count()} of {old.count()} records; kept the old index")
+    before_mb = _mb(directory_bytes(segment_dir(path, name)))
+    client.delete_collection(name)
+    # If this fails, the records are safe in the temporary collection and can be renamed by hand.
+    new.modify(name=name)
+    return {"collection": name, "records": offset, "seconds": round(time.perf_counter() - start, 2),
+            "index_disk_mb_before": before_mb, "hnsw": configuration}
+
+
+def rebuild_keyword_index(client, path: str, name: str):
+    """Rebuild a collection's BM25 index (if it has one) from its documents, dropping replaced rows."""
+    index_path = bm25_index_path(FactCheckRetriever(path=path, collection_name=name))
+    if not os.path.exists(index_path):
+        return None
+    index = BM25Index.build(client.get_collection(name))
+    index.fingerprint = content_fingerprint(path)
+    index.save(index_path)
+    return len(index)
+
+
+# --- 4. search_ef sweep ---
+
+def exact_neighbours(collection, queries: np.ndarray, k: int, page_size: int = 5000) -> list[set[str]]:
+    """Brute-force cosine top-k over every stored vector, a page at a time."""
+    queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+    best_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+    best_ids = np.full((len(queries), k), "", dtype=object)
+    offset = 0
+    while True:
+        page = collection.get(limit=page_size, offset=offset, include=["embeddings"])
+        if not len(page["ids"]):
+            break
+        vectors = np.asarray(page["embeddings"], dtype=np.float32)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        scores = np.concatenate([best_scores, queries @ vectors.T], axis=1)
+        ids = np.concatenate([best_ids, np.broadcast_to(np.asarray(page["ids"], dtype=object),
+                                                        (len(queries), len(page["ids"])))], axis=1)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        best_scores = np.take_along_axis(scores, top, axis=1)
+        best_ids = np.take_along_axis(ids, top, axis=1)
+        offset += len(page["ids"])
+    return [set(row) - {""} for row in best_ids]
+
+
+def sample_queries(collection, count: int, seed: int, page_size: int = 5000) -> np.ndarray:
+    """Stored vectors of `count` random records, used as queries."""
+    total = collection.count()
+    wanted = sorted(random.Random(seed).sample(range(total), min(count, total)))
+    queries, offset, i = [], 0, 0
+    while i < len(wanted):
+        page = collection.get(limit=page_size, offset=offset, include=["embeddings"])
+        while i < len(wanted) and wanted[i] < offset + len(page["ids"]):
+            queries.append(page["embeddings"][wanted[i] - offset])
+            i += 1
+        offset += len(page["ids"])
+    return np.asarray(queries, dtype=np.float32)
+
+
+def sweep(path: str, name: str, ef_values: list[int], k: int, query_count: int, queries_path: str = None,
+          seed: int = 7) -> list[dict]:
+    """
+    Recall@k (against exact search) and per-query latency for each search_ef.
+    The index is reopened for every value, since a loaded index keeps its ef.
+    """
+    from chromadb.api.client import SharedSystemClient
+
+    collection = open_client(path).get_collection(name)
+    if queries_path:
+        with open(queries_path, encoding="utf-8") as f:
+            claims = [json.loads(line)["claim"] for line in f if line.strip()][:query_count]
+        queries = np.asarray(FactCheckRetriever(path=path, collection_name=name).embedding_function(claims),
+                             dtype=np.float32)
+    else:
+        queries = sample_queries(collection, query_count, seed)
+    print(f"🎯 Exact top-{k} for {len(queries)} queries over {collection.count()} records")
+    truth = exact_neighbours(collection, queries, k)
+    original_ef = hnsw_settings(collection).get("ef_search", 100)
+
+    results = []
+    try:
+        for ef in ef_values:
+            collection.modify(configuration={"hnsw": {"ef_search": ef}})
+            SharedSystemClient.clear_system_cache()
+            collection = open_client(path).get_collection(name)
+            collection.query(query_embeddings=queries[:1].tolist(), n_results=k)  # load the index
+            latencies, recalls = [], []
+            for query, expected in zip(queries, truth):
+                start = time.perf_counter()
+                found = collection.query(query_embeddings=[query.tolist()], n_results=k, include=[])["ids"][0]
+                latencies.append(time.perf_counter() - start)
+                recalls.append(len(expected & set(found)) / max(len(expected), 1))
+            results.append({
+                "search_ef": ef,
+                f"recall_at_{k}": round(float(np.mean(recalls)), 4),
+                "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 3),
+                "p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 3),
+            })
+    finally:
+        collection.modify(configuration={"hnsw": {"ef_search": original_ef}})
+        SharedSystemClient.clear_system_cache()
+    return results
+
+
+def print_sweep(results: list[dict], k: int, target_recall: float) -> None:
+    """A text chart of recall and p95 latency per search_ef, and the smallest ef meeting the target."""
+    slowest = max(result["p95_ms"] for result in results) or 1
+    print(f"\n{'search_ef':>9}  {'recall@' + str(k):>9}  {'p50 ms':>8}  {'p95 ms':>8}  recall | p95 latency")
+    for result in results:
+        recall = result[f"recall_at_{k}"]
+        print(f"{result['search_ef']:>9}  {recall:>9.3f}  {result['p50_ms']:>8.3f}  {result['p95_ms']:>8.3f}  "
+              f"{'█' * round(recall * 20):<20} | {'▒' * round(result['p95_ms'] / slowest * 20)}")
+    good = [result for result in results if result[f"recall_at_{k}"] >= target_recall]
+    if good:
+        print(f"\n✅ HNSW_SEARCH_EF={good[0]['search_ef']} is the smallest tested value with recall@{k} >= {target_recall}")
+    else:
+        print(f"\n⚠️  No tested search_ef reaches recall@{k} >= {target_recall}; try larger values or a rebuild with a larger HNSW_M")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect, warm, rebuild and tune the fact-check HNSW indexes.")
+    parser.add_argument("command", choices=["stats", "warm", "rebuild", "compact", "sweep"])
+    parser.add_argument("--chroma-path", default=CHROMA_PATH)
+    parser.add_argument("--collection", default=COLLECTION_NAME,
+                        help="Knowledge base collection (all of its shards when sharded).")
+    parser.add_argument("--shard", help="Only this shard collection.")
+    parser.add_argument("--m", type=int, help="rebuild: HNSW M (default HNSW_M).")
+    parser.add_argument("--construction-ef", type=int, help="rebuild: construction ef (default HNSW_CONSTRUCTION_EF).")
+    parser.add_argument("--ef", type=int, nargs="+", default=[10, 20, 50, 100, 200], help="sweep: search_ef values.")
+    parser.add_argument("-k", type=int, default=5, help="sweep: neighbours per query (recall@k).")
+    parser.add_argument("--queries", type=int, default=300, help="sweep: number of queries.")
+    parser.add_argument("--queries-file", help="sweep: JSONL of real claims to use as queries (embedded with EMBEDDING_MODEL).")
+    parser.add_argument("--target-recall", type=float, default=0.95, help="sweep: recall to recommend a search_ef for.")
+    parser.add_argument("--output", help="Write the results as JSON to this file.")
+    args = parser.parse_args()
+
+    names = [args.shard] if args.shard else fact_check_collections(args.chroma_path, args.collection)
+    if args.command == "sweep":
+        report = {}
+        for name in names:
+            print(f"📈 Sweeping search_ef on {name}")
+            report[name] = sweep(args.chroma_path, name, sorted(args.ef), args.k, args.queries, args.queries_file)
+            print_sweep(report[name], args.k, args.target_recall)
+    else:
+        client = open_client(args.chroma_path)
+        if args.command == "stats":
+            report = [collection_stats(client, args.chroma_path, name) for name in names]
+        elif args.command == "warm":
+            report = warm(client, names)
+        else:
+            report = []
+            for name in names:
+                current = hnsw_settings(client.get_collection(name))
+                if args.command == "compact":
+                    # Same build parameters as now: only the layout changes.
+                    configuration = hnsw_configuration(ef_construction=current.get("ef_construction"),
+                                                       max_neighbors=current.get("max_neighbors"))
+                else:
+                    configuration = hnsw_configuration(ef_construction=args.construction_ef, max_neighbors=args.m)
+                print(f"🔧 Rebuilding {name} with {configuration}")
+                result = rebuild(client, args.chroma_path, name, configuration)
+                result["bm25_records"] = rebuild_keyword_index(client, args.chroma_path, name)
+                result.update(collection_stats(client, args.chroma_path, name))
+                report.append(result)
+            print("♻️  Restart the API server and UI so they open the rebuilt index.")
+        print(json.dumps(report, indent=2))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
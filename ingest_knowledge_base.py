@@ -0,0 +1,346 @@
+"""
+Offline bulk ingestion for the fact-check knowledge base.
+
+Streams verified claims from JSONL, CSV or Parquet files, embeds them in large
+batches and upserts them into the `knowledge_base` collection chunk by chunk.
+Progress is checkpointed after every chunk so an interrupted run resumes where
+it stopped, and records whose content hash is unchanged are skipped. The
+BM25 keyword index used by hybrid retrieval is updated alongside.
+
+Each record needs a `claim` plus `verdict`, `summary` and `sources`. An `id`
+is optional; other scalar fields (topic, region, date, ...) are kept as metadata,
+and a `date` also yields an integer `year`.
+
+With --shard-by (or FACT_CHECK_SHARD_BY) records are split into one collection
+per value of those fields and a shard manifest is written for the fact
+checker (see sharded_retrieval.py).
+
+Usage:
+    python ingest_knowledge_base.py data/knowledge_base_seed.jsonl
+    python ingest_knowledge_base.py claims.parquet --chunk-size 2048 --embed-batch 512
+    python ingest_knowledge_base.py claims.parquet --shard-by topic,year
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import time
+from typing import Iterator
+
+from fact_check_service import CHROMA_PATH, COLLECTION_NAME, FactCheckRetriever
+from hybrid_retrieval import (INGEST_CHECKPOINT_FILE, BM25Index, bm25_index_path, content_fingerprint,
+                              load_or_build_index)
+from sharded_retrieval import (FACT_CHECK_SHARD_BY, describe_shard, load_manifest, manifest_path, record_year,
+                               save_manifest, shard_name, shard_values)
+
+
+RESERVED_FIELDS = {"id", "claim", "verdict", "summary", "sources"}
+
+
+# --- 1. Streaming readers ---
+# Each reader yields (row_number, record) one row at a time so memory stays flat.
+
+def read_jsonl(path: str) -> Iterator[tuple[int, dict]]:
+    with open(path, encoding="utf-8") as f:
+        row = 0
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            yield row, json.loads(line)
+            row += 1
+
+
+def read_csv(path: str) -> Iterator[tuple[int, dict]]:
+    with open(path, encoding="utf-8", newline="") as f:
+        for row, record in enumerate(csv.DictReader(f)):
+            yield row, record
+
+
+def read_parquet(path: str, batch_size: int = 4096) -> Iterator[tuple[int, dict]]:
+    import pyarrow.parquet as pq
+
+    row = 0
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+        for record in batch.to_pylist():
+            yield row, record
+            row += 1
+
+
+READERS = {
+    ".jsonl": read_jsonl,
+    ".ndjson": read_jsonl,
+    ".csv": read_csv,
+    ".parquet": read_parquet,
+}
+
+
+def iter_records(path: str) -> Iterator[tuple[int, dict]]:
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in READERS:
+        raise ValueError(f"Unsupported file type '{extension}'. Use one of: {', '.join(READERS)}")
+    return READERS[extension](path)
+
+
+# --- 2. Record preparation ---
+
+def parse_sources(value) -> list[str]:
+    """Sources may arrive as a list, a JSON list string or a ';'-separated string (CSV)."""
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return [str(source) for source in value]
+    value = str(value).strip()
+    if value.startswith("["):
+        return [str(source) for source in json.loads(value)]
+    return [source.strip() for source in value.split(";") if source.strip()]
+
+
+def prepare_record(record: dict) -> tuple[str, str, dict]:
+    """Turn a raw record into (id, document, metadata) for ChromaDB."""
+    claim = str(record.get("claim") or "").strip()
+    if not claim:
+        raise ValueError("record has no 'claim'")
+
+    metadata = {
+        "verdict": str(record.get("verdict") or ""),
+        "summary": str(record.get("summary") or ""),
+        # Metadata values must be strings, ints, floats, or bools.
+        "sources": json.dumps(parse_sources(record.get("sources"))),
+    }
+    for key, value in record.items():
+        if key not in RESERVED_FIELDS and isinstance(value, (str, int, float, bool)):
+            metadata[key] = value
+    # An integer year lets the fact checker filter by the years a claim mentions.
+    year = record_year(metadata)
+    if year is not None:
+        metadata["year"] = year
+
+    content = json.dumps({"claim": claim, **metadata}, sort_keys=True, ensure_ascii=False)
+    metadata["content_hash"] = hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    record_id = record.get("id")
+    if record_id is None or str(record_id).strip() == "":
+        record_id = "claim_" + hashlib.sha1(claim.lower().encode("utf-8")).hexdigest()[:16]
+    return str(record_id), claim, metadata
+
+
+# --- 3. Checkpointing ---
+
+def _file_signature(path: str) -> dict:
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def load_checkpoint(checkpoint_path: str) -> dict:
+    if not os.path.exists(checkpoint_path):
+        return {}
+    with open(checkpoint_path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_checkpoint(checkpoint_path: str, checkpoint: dict) -> None:
+    # Write to a temporary file and rename, so a crash never leaves a torn checkpoint.
+    tmp_path = checkpoint_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(tmp_path, checkpoint_path)
+
+
+# --- 4. Ingestion ---
+
+class IngestStats:
+    def __init__(self):
+        self.read = 0
+        self.upserted = 0
+        self.unchanged = 0
+        self.invalid = 0
+        self.start = time.perf_counter()
+
+    @property
+    def rows_per_second(self) -> float:
+        elapsed = time.perf_counter() - self.start
+        return self.read / elapsed if elapsed > 0 else 0.0
+
+    def __str__(self) -> str:
+        return (f"read={self.read} upserted={self.upserted} unchanged={self.unchanged} "
+                f"invalid={self.invalid} rows/sec={self.rows_per_second:,.0f}")
+
+
+def upsert_chunk(collection, embedding_function, chunk: list[tuple[str, str, dict]],
+                 embed_batch: int, stats: IngestStats, keyword_index: BM25Index = None) -> None:
+    """
+    Upsert one chunk, skipping records whose content hash is already stored.
+    Changed records are also added to `keyword_index` when one is given.
+    """
+    # Duplicate ids inside a chunk would make the upsert fail; the last one wins.
+    chunk = list({record_id: (record_id, document, metadata) for record_id, document, metadata in chunk}.values())
+    existing = collection.get(ids=[record_id for record_id, _, _ in chunk], include=["metadatas"])
+    stored_hashes = {
+        record_id: (metadata or {}).get("content_hash")
+        for record_id, metadata in zip(existing["ids"], existing["metadatas"])
+    }
+    changed = [item for item in chunk if stored_hashes.get(item[0]) != item[2]["content_hash"]]
+    stats.unchanged += len(chunk) - len(changed)
+
+    for i in range(0, len(changed), embed_batch):
+        batch = changed[i:i + embed_batch]
+        documents = [document for _, document, _ in batch]
+        collection.upsert(
+            ids=[record_id for record_id, _, _ in batch],
+            documents=documents,
+            metadatas=[metadata for _, _, metadata in batch],
+            embeddings=embedding_function(documents),
+        )
+        if keyword_index is not None:
+            keyword_index.add([record_id for record_id, _, _ in batch], documents)
+        stats.upserted += len(batch)
+
+
+class ShardWriter:
+    """
+    Routes records to one collection (and BM25 index) per shard key and, when
+    finished, writes the shard manifest the fact checker routes claims with.
+    """
+
+    def __init__(self, path: str, collection_name: str, shard_by: list[str], embedding_function):
+        self.path = path
+        self.collection_name = collection_name
+        self.shard_by = shard_by
+        self.embedding_function = embedding_function
+        previous = load_manifest(path, collection_name)
+        if previous is not None and previous["shard_by"] != shard_by:
+            raise ValueError(f"'{collection_name}' is sharded by {previous['shard_by']}, not {shard_by}; "
+                             f"use another --collection or remove {manifest_path(path, collection_name)}")
+        self.values = {name: shard["values"] for name, shard in (previous or {}).get("shards", {}).items()}
+        self._shards: dict[str, tuple[FactCheckRetriever, BM25Index]] = {}
+
+    def _shard(self, name: str) -> tuple[FactCheckRetriever, BM25Index]:
+        if name not in self._shards:
+            retriever = FactCheckRetriever(path=self.path, collection_name=name,
+                                           embedding_function=self.embedding_function)
+            self._shards[name] = (retriever, load_or_build_index(retriever))
+        return self._shards[name]
+
+    def write(self, chunk: list[tuple[str, str, dict]], embed_batch: int, stats: IngestStats) -> None:
+        groups = {}
+        for item in chunk:
+            values = shard_values(item[2], self.shard_by)
+            name = shard_name(self.collection_name, values)
+            self.values[name] = values
+            groups.setdefault(name, []).append(item)
+        for name, items in groups.items():
+            retriever, keyword_index = self._shard(name)
+            upsert_chunk(retriever.collection, self.embedding_function, items, embed_batch, stats, keyword_index)
+
+    def finish(self) -> dict:
+        """Save the BM25 indexes and the manifest (counts and centroids of every shard)."""
+        shards = {}
+        for name, values in sorted(self.values.items()):
+            retriever, keyword_index = self._shard(name)
+            keyword_index.source_count = retriever.collection.count()
+            keyword_index.fingerprint = content_fingerprint(self.path)
+            keyword_index.save(bm25_index_path(retriever))
+            shards[name] = {"values": values, **describe_shard(retriever.collection)}
+        manifest = {"collection": self.collection_name, "shard_by": self.shard_by,
+                    "updated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), "shards": shards}
+        save_manifest(manifest, self.path, self.collection_name)
+        return manifest
+
+
+def ingest_file(path: str, collection, embedding_function, checkpoint_path: str,
+                chunk_size: int, embed_batch: int, resume: bool, stats: IngestStats,
+                keyword_index: BM25Index = None, shards: ShardWriter = None) -> None:
+    checkpoint = load_checkpoint(checkpoint_path)
+    key = os.path.abspath(path)
+    if shards is not None:
+        # Sharded and unsharded loads of the same file are checkpointed separately.
+        key += f" -> {shards.collection_name} by {','.join(shards.shard_by)}"
+    signature = _file_signature(path)
+
+    start_row = 0
+    entry = checkpoint.get(key)
+    if resume and entry and entry.get("signature") == signature:
+        start_row = entry.get("rows_done", 0)
+        if start_row:
+            print(f"↩️  Resuming {path} from row {start_row}")
+
+    def commit(chunk, rows_done):
+        if chunk and shards is not None:
+            shards.write(chunk, embed_batch, stats)
+        elif chunk:
+            upsert_chunk(collection, embedding_function, chunk, embed_batch, stats, keyword_index)
+        checkpoint[key] = {"signature": signature, "rows_done": rows_done}
+        save_checkpoint(checkpoint_path, checkpoint)
+        print(f"   {path}: {rows_done} rows done | {stats}")
+
+    chunk = []
+    rows_done = committed = start_row
+    for row, record in iter_records(path):
+        if row < start_row:
+            continue
+        stats.read += 1
+        rows_done = row + 1
+        try:
+            chunk.append(prepare_record(record))
+        except (ValueError, TypeError) as e:
+            stats.invalid += 1
+            print(f"⚠️  Skipping row {row} of {path}: {e}")
+        if len(chunk) >= chunk_size:
+            commit(chunk, rows_done)
+            chunk = []
+            committed = rows_done
+    if rows_done > committed:
+        commit(chunk, rows_done)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-load verified claims into the fact-check knowledge base.")
+    parser.add_argument("paths", nargs="+", help="JSONL, CSV or Parquet files to ingest.")
+    parser.add_argument("--chroma-path", default=CHROMA_PATH)
+    parser.add_argument("--collection", default=COLLECTION_NAME)
+    parser.add_argument("--chunk-size", type=int, default=1024, help="Records per upsert and checkpoint.")
+    parser.add_argument("--embed-batch", type=int, default=256, help="Documents per embedding call.")
+    parser.add_argument("--no-resume", action="store_true", help="Ignore the checkpoint and start from the beginning.")
+    parser.add_argument("--shard-by", default=",".join(FACT_CHECK_SHARD_BY),
+                        help="Comma-separated metadata fields to shard by, e.g. topic or topic,year.")
+    args = parser.parse_args()
+    shard_by = [field.strip() for field in args.shard_by.split(",") if field.strip()]
+
+    retriever = FactCheckRetriever(path=args.chroma_path, collection_name=args.collection)
+    checkpoint_path = os.path.join(args.chroma_path, INGEST_CHECKPOINT_FILE)
+    if shard_by:
+        shards = ShardWriter(args.chroma_path, args.collection, shard_by, retriever.embedding_function)
+        stats = IngestStats()
+        print(f"📥 Ingesting {len(args.paths)} file(s) into '{args.collection}' shards by {', '.join(shard_by)}")
+        try:
+            for path in args.paths:
+                ingest_file(path, None, retriever.embedding_function, checkpoint_path,
+                            args.chunk_size, args.embed_batch, not args.no_resume, stats, shards=shards)
+        finally:
+            manifest = shards.finish()
+        sizes = ", ".join(f"{name}={shard['count']}" for name, shard in manifest["shards"].items())
+        print(f"✅ Ingestion finished: {stats} | shards: {sizes}")
+        return
+
+    collection = retriever.collection
+
+    # The fact checker's BM25 index is kept in step with the collection as records land.
+    keyword_index = load_or_build_index(retriever)
+
+    stats = IngestStats()
+    print(f"📥 Ingesting {len(args.paths)} file(s) into '{args.collection}' ({collection.count()} records now)")
+    try:
+        for path in args.paths:
+            ingest_file(path, collection, retriever.embedding_function, checkpoint_path,
+                        args.chunk_size, args.embed_batch, not args.no_resume, stats, keyword_index)
+    finally:
+        keyword_index.source_count = collection.count()
+        keyword_index.fingerprint = content_fingerprint(args.chroma_path)
+        keyword_index.save(bm25_index_path(retriever))
+    print(f"✅ Ingestion finished: {stats} | collection size={collection.count()}")
+
+
+if __name__ == "__main__":
+    main()
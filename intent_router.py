@@ -0,0 +1,189 @@
+import re
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from config import get_bool, get_float
+from fact_check_service import get_retriever
+
+
+# --- Configuration ---
+
+FAST_ROUTER_ENABLED = get_bool("FAST_ROUTER_ENABLED", False)
+ROUTER_CONFIDENCE_THRESHOLD = get_float("ROUTER_CONFIDENCE_THRESHOLD", 0.8)
+
+TRENDING = "trending"
+FACT_CHECK = "fact_check"
+SUMMARIZE = "summarize"
+
+# Pasted text longer than this is treated as an article to summarize.
+LONG_TEXT_WORDS = 150
+# Below this cosine similarity to every centroid the query is off-topic for all intents.
+MIN_CENTROID_SIMILARITY = 0.35
+
+
+# --- 1. Keyword rules ---
+# These mirror the routing rules in the conversation agent's instructions.
+
+KEYWORD_RULES = [
+    (SUMMARIZE, 0.9, re.compile(r"\b(summari[sz]e|summary|tl;?dr|sum up|key points)\b", re.I)),
+    (FACT_CHECK, 0.9, re.compile(
+        r"\b(is (it|that|this) true|true that|really true|fact[- ]?check|rumou?r|hoax|fake news|misinformation"
+        r"|debunk|acquir(e|ed|es|ing)|acquisition|bought|partner(ing|ed|ship)?( with)?|merg(e|er|ing))\b", re.I)),
+    (TRENDING, 0.85, re.compile(
+        r"\b(trending|latest|headlines|breaking|what'?s (new|happening)|top (news|stories)|news (on|about)"
+        r"|today'?s news|this week)\b", re.I)),
+]
+
+
+# --- 2. Nearest-centroid embedding classifier ---
+# A handful of examples per intent; their mean embedding is the intent's centroid.
+
+INTENT_EXAMPLES = {
+    TRENDING: [
+        "What are the latest trends in AI?",
+        "What's trending in tech today?",
+        "Show me the top news about climate change",
+        "Latest headlines on politics in Bangladesh",
+        "What is happening in the stock market this week?",
+        "Any news on electric vehicles?",
+    ],
+    FACT_CHECK: [
+        "Is the claim that AI will replace jobs true?",
+        "Did Apple acquire OpenAI?",
+        "Is OpenAI partnering with Apple?",
+        "I heard Google bought Twitter, is that real?",
+        "Is it true that the election was cancelled?",
+        "Is this rumor about Tesla going bankrupt correct?",
+    ],
+    SUMMARIZE: [
+        "Can you summarize this article for me?",
+        "Give me the key points of this text",
+        "Summarize the following news story",
+        "TL;DR of this article please",
+        "Make bullet points from this article",
+        "Condense this long report into a short overview",
+    ],
+}
+
+
+@dataclass
+class RouteDecision:
+    intent: Optional[str]
+    confidence: float
+    method: str
+
+
+class IntentRouter:
+    """
+    Local pre-router that picks the specialist agent without an LLM call.
+
+    Keyword rules and a nearest-centroid classifier over sentence embeddings
+    vote on the intent. When the combined confidence reaches the threshold the
+    caller can dispatch straight to the specialist; otherwise it should fall
+    back to the LLM controller.
+    """
+
+    def __init__(self, embedding_function=None, threshold: float = ROUTER_CONFIDENCE_THRESHOLD,
+                 temperature: float = 0.05):
+        self._embedding_function = embedding_function
+        self.threshold = threshold
+        self.temperature = temperature
+        self._intents = list(INTENT_EXAMPLES)
+        self._centroids = None
+        self._lock = threading.Lock()
+        self.counts = {"bypassed": 0, "fallback": 0}
+        self.bypassed_by_intent = {intent: 0 for intent in self._intents}
+
+    def _embed(self, texts: list[str]) -> np.ndarray:
+        embedding_function = self._embedding_function or get_retriever().embedding_function
+        vectors = np.asarray(embedding_function(texts), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def _get_centroids(self) -> np.ndarray:
+        if self._centroids is None:
+            with self._lock:
+                if self._centroids is None:
+                    centroids = np.stack([
+                        self._embed(INTENT_EXAMPLES[intent]).mean(axis=0) for intent in self._intents
+                    ])
+                    norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+                    self._centroids = centroids / np.where(norms == 0, 1, norms)
+        return self._centroids
+
+    def classify_keywords(self, query: str) -> tuple[Optional[str], float]:
+        for intent, confidence, pattern in KEYWORD_RULES:
+            if pattern.search(query):
+                return intent, confidence
+        return None, 0.0
+
+    def classify_embedding(self, query: str) -> tuple[str, float]:
+        """Nearest centroid, with a softmax over cosine similarities as the confidence."""
+        scores = self._get_centroids() @ self._embed([query])[0]
+        weights = np.exp((scores - scores.max()) / self.temperature)
+        probabilities = weights / weights.sum()
+        best = int(np.argmax(probabilities))
+        if scores[best] < MIN_CENTROID_SIMILARITY:
+            return self._intents[best], 0.0
+        return self._intents[best], float(probabilities[best])
+
+    def route(self, query: str) -> RouteDecision:
+        if len(query.split()) > LONG_TEXT_WORDS:
+            decision = RouteDecision(SUMMARIZE, 0.95, "length")
+        else:
+            decision = self._classify(query)
+
+        with self._lock:
+            if self.is_confident(decision):
+                self.counts["bypassed"] += 1
+                self.bypassed_by_intent[decision.intent] += 1
+            else:
+                self.counts["fallback"] += 1
+        return decision
+
+    def _classify(self, query: str) -> RouteDecision:
+        keyword_intent, keyword_confidence = self.classify_keywords(query)
+        embedding_intent, embedding_confidence = self.classify_embedding(query)
+
+        if keyword_intent is None:
+            return RouteDecision(embedding_intent, embedding_confidence, "embedding")
+        if keyword_intent == embedding_intent:
+            # Both agree: treat them as independent votes.
+            confidence = 1 - (1 - keyword_confidence) * (1 - embedding_confidence)
+            return RouteDecision(keyword_intent, confidence, "keyword+embedding")
+        # They disagree: discount the keyword vote by how sure the classifier is of the other intent.
+        return RouteDecision(keyword_intent, keyword_confidence * (1 - embedding_confidence), "keyword")
+
+    def is_confident(self, decision: RouteDecision) -> bool:
+        return decision.intent is not None and decision.confidence >= self.threshold
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.counts["bypassed"] + self.counts["fallback"]
+            return {
+                "threshold": self.threshold,
+                "requests": total,
+                "bypassed": self.counts["bypassed"],
+                "fallback": self.counts["fallback"],
+                "bypass_rate": round(self.counts["bypassed"] / total, 4) if total else None,
+                "bypassed_by_intent": dict(self.bypassed_by_intent),
+            }
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_intent_router():
+    """Return the process-wide router, or None when FAST_ROUTER_ENABLED is off."""
+    global _router
+    if not FAST_ROUTER_ENABLED:
+        return None
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = IntentRouter()
+    return _router
@@ -0,0 +1,367 @@
+"""
+End-to-end load test of the conversation agent against local stub servers.
+
+Starts the stub OpenAI and Tavily servers (stub_servers.py) in a child
+process, points BASE_URL and TAVILY_BASE_URL at them and drives
+controller_run.run_conversation at one or more target request rates with a
+mix of trending, fact-check and summarize queries. Arrivals are open-loop
+(Poisson), so a slow system shows up as growing latency and errors rather than
+as a lower offered rate.
+
+Each step reports throughput, latency percentiles (overall and per query kind),
+error rates, event-loop lag and the per-stage breakdown from metrics.py.
+Steps run from the lowest rate up and stop at the first one that breaks
+--max-error-rate or --max-p95-ms: that rate is the scaling limit.
+
+Fact-check queries use the real knowledge base and EMBEDDING_MODEL. Caches
+that would hide the work (answer cache, trending feeds, search cache) are off
+unless they are set in the environment.
+
+Usage:
+    python load_test.py --rps 2 5 10 20 --duration 30
+    python load_test.py --rps 10 --mix trending=1 --ttft-ms 800 --output load.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+from stub_servers import StubSettings, add_settings_arguments, settings_from_args, settings_to_argv
+
+
+TRENDING_TOPICS = ["AI", "technology", "climate", "elections", "markets", "space", "sports", "health"]
+TRENDING_TEMPLATES = ["What's trending in {topic} today?", "Latest news about {topic}",
+                      "Top {topic} headlines this week", "What is trending in {topic} right now?"]
+FACT_CHECK_CLAIMS = ["is openai partnering with apple?", "did apple acquire openai?",
+                     "Is it true that the moon landing was staged?", "Did the central bank cut rates to zero?"]
+ARTICLE_SENTENCES = [
+    "Officials confirmed the new policy will take effect next month after a lengthy review.",
+    "Analysts said the decision could reshape the industry for years to come.",
+    "The company reported quarterly revenue well above expectations.",
+    "Critics argued the plan does little to address long-standing concerns.",
+    "Researchers published data showing a steady rise over the past decade.",
+    "Regulators in several countries are expected to respond in the coming weeks.",
+    "Investors reacted cautiously, with shares trading flat in early sessions.",
+    "The announcement follows months of negotiations between the two sides.",
+]
+# Article lengths in words: short, long enough for the router, and long enough for map-reduce.
+ARTICLE_WORDS = [120, 600, 4000]
+DEFAULT_MIX = {"trending": 0.4, "fact_check": 0.4, "summarize": 0.2}
+
+
+# --- 1. Workload ---
+
+def load_claims(path: str = "data/knowledge_base_seed.jsonl") -> list[str]:
+    """Claims from the seed knowledge base (so some queries match), plus a few that don't."""
+    claims = []
+    if Path(path).exists():
+        with open(path, encoding="utf-8") as f:
+            claims = [json.loads(line)["claim"] for line in f if line.strip()]
+    return claims + FACT_CHECK_CLAIMS
+
+
+def make_article(rng: random.Random, words: int) -> str:
+    sentences = []
+    while sum(len(s.split()) for s in sentences) < words:
+        sentences.append(rng.choice(ARTICLE_SENTENCES))
+    return " ".join(sentences)
+
+
+class Workload:
+    """Draws (kind, query) pairs with the given mix, reproducibly for a seed."""
+
+    def __init__(self, mix: dict[str, float], seed: int = 7):
+        self.kinds = list(mix)
+        self.weights = [mix[kind] for kind in self.kinds]
+        self.rng = random.Random(seed)
+        self.claims = load_claims()
+
+    def next(self) -> tuple[str, str]:
+        kind = self.rng.choices(self.kinds, self.weights)[0]
+        if kind == "trending":
+            topic = self.rng.choice(TRENDING_TOPICS)
+            return kind, self.rng.choice(TRENDING_TEMPLATES).format(topic=topic)
+        if kind == "fact_check":
+            return kind, self.rng.choice(self.claims)
+        return kind, "Summarize this article: " + make_article(self.rng, self.rng.choice(ARTICLE_WORDS))
+
+
+def parse_mix(value: str) -> dict[str, float]:
+    mix = {}
+    for part in value.split(","):
+        kind, _, weight = part.partition("=")
+        if kind.strip() not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"Unknown query kind '{kind}' (use {', '.join(DEFAULT_MIX)})")
+        mix[kind.strip()] = float(weight or 1)
+    return mix
+
+
+# --- 2. Measurement ---
+
+@dataclass
+class Outcome:
+    kind: str
+    seconds: float
+    error: str = None
+    message: str = None
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes up a task that sleeps `interval` seconds."""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.samples: list[float] = []
+
+    async def run(self) -> None:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - start - self.interval))
+
+
+def _percentile(samples: list[float], q: float) -> float:
+    return round(float(np.percentile(samples, q * 100)) * 1000, 1) if samples else None
+
+
+def latency_summary(samples: list[float]) -> dict:
+    return {
+        "p50_ms": _percentile(samples, 0.50),
+        "p90_ms": _percentile(samples, 0.90),
+        "p95_ms": _percentile(samples, 0.95),
+        "p99_ms": _percentile(samples, 0.99),
+        "max_ms": round(max(samples) * 1000, 1) if samples else None,
+    }
+
+
+def summarize_step(rps: float, duration: float, elapsed: float, outcomes: list[Outcome],
+                   lag: list[float], snapshot: dict) -> dict:
+    ok = [o for o in outcomes if o.error is None]
+    errors, error_examples = {}, {}
+    for outcome in outcomes:
+        if outcome.error is not None:
+            errors[outcome.error] = errors.get(outcome.error, 0) + 1
+            error_examples.setdefault(outcome.error, outcome.message)
+    by_kind = {}
+    for kind in sorted({o.kind for o in outcomes}):
+        of_kind = [o for o in outcomes if o.kind == kind]
+        kind_ok = [o.seconds for o in of_kind if o.error is None]
+        by_kind[kind] = {"requests": len(of_kind),
+                         "error_rate": round(1 - len(kind_ok) / len(of_kind), 4),
+                         **latency_summary(kind_ok)}
+    return {
+        "target_rps": rps,
+        "duration_s": duration,
+        "requests": len(outcomes),
+        "completed": len(ok),
+        "throughput_rps": round(len(ok) / elapsed, 2) if elapsed else 0.0,
+        "error_rate": round(1 - len(ok) / len(outcomes), 4) if outcomes else 0.0,
+        "errors": errors,
+        "error_examples": error_examples,
+        "latency": latency_summary([o.seconds for o in ok]),
+        "by_kind": by_kind,
+        "loop_lag": latency_summary(lag),
+        "stages": snapshot["stages"],
+        "tokens": snapshot["tokens"],
+    }
+
+
+# --- 3. Driving load ---
+
+async def run_step(run_conversation, workload: Workload, rps: float, duration: float,
+                   timeout: float, max_in_flight: int, seed: int) -> dict:
+    """Offer `rps` requests per second for `duration` seconds and wait for all of them to finish."""
+    from metrics import metrics
+
+    metrics.reset()
+    arrivals = random.Random(seed)
+    outcomes: list[Outcome] = []
+    in_flight = 0
+
+    async def one(kind: str, query: str) -> None:
+        nonlocal in_flight
+        in_flight += 1
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(run_conversation(query), timeout)
+            outcomes.append(Outcome(kind, time.perf_counter() - start))
+        except asyncio.TimeoutError:
+            outcomes.append(Outcome(kind, time.perf_counter() - start, "Timeout", f"no answer within {timeout:g}s"))
+        except Exception as e:
+            outcomes.append(Outcome(kind, time.perf_counter() - start, type(e).__name__, str(e) or repr(e)))
+        finally:
+            in_flight -= 1
+
+    monitor = LoopLagMonitor()
+    monitor_task = asyncio.create_task(monitor.run())
+    tasks = []
+    start = time.perf_counter()
+    offset = arrivals.expovariate(rps)
+    while offset < duration:
+        delay = start + offset - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        kind, query = workload.next()
+        if in_flight >= max_in_flight:
+            # Shed on the client side rather than let the backlog grow without bound.
+            outcomes.append(Outcome(kind, 0.0, "Shed", f"{max_in_flight} requests already in flight"))
+        else:
+            tasks.append(asyncio.create_task(one(kind, query)))
+        offset += arrivals.expovariate(rps)
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+    monitor_task.cancel()
+    return summarize_step(rps, duration, elapsed, outcomes, monitor.samples, metrics.snapshot())
+
+
+def print_step(step: dict) -> None:
+    latency, lag = step["latency"], step["loop_lag"]
+    print(f"🚦 {step['target_rps']:g} rps offered: {step['throughput_rps']:g} rps served, "
+          f"p50 {latency['p50_ms']}ms, p95 {latency['p95_ms']}ms, p99 {latency['p99_ms']}ms, "
+          f"errors {step['error_rate']:.1%}, loop lag p95 {lag['p95_ms']}ms (max {lag['max_ms']}ms)")
+    for kind, stats in step["by_kind"].items():
+        print(f"   {kind:<10} {stats['requests']:>5} requests  p50 {stats['p50_ms']}ms  "
+              f"p95 {stats['p95_ms']}ms  errors {stats['error_rate']:.1%}")
+    for error, count in step["errors"].items():
+        print(f"   ❌ {error} x{count}, first: {step['error_examples'][error][:300]}")
+
+
+def over_limit(step: dict, max_error_rate: float, max_p95_ms: float) -> str:
+    if step["error_rate"] > max_error_rate:
+        return f"error rate {step['error_rate']:.1%} above {max_error_rate:.1%}"
+    p95 = step["latency"]["p95_ms"]
+    if max_p95_ms and (p95 is None or p95 > max_p95_ms):
+        return f"p95 {p95}ms above {max_p95_ms:g}ms"
+    return None
+
+
+def check_embedding_model() -> None:
+    """Stop before measuring when the fact checker's embedding model can't be loaded."""
+    from fact_check_service import EMBEDDING_MODEL_NAME, get_retriever
+
+    try:
+        vectors = get_retriever().embedding_function(["load test"])
+    except Exception as e:
+        # Otherwise every fact check fails fast and the run reports a meaningless capacity.
+        raise SystemExit(f"❌ Embedding model {EMBEDDING_MODEL_NAME!r} could not be loaded: {e}")
+    print(f"🧮 Embedding model {EMBEDDING_MODEL_NAME} ready ({len(vectors[0])} dimensions)")
+
+
+async def run_load_test(args) -> list[dict]:
+    # Imported only now: the environment must point at the stubs before config.py reads it.
+    from controller_run import run_conversation
+
+    if "fact_check" in args.mix or "summarize" in args.mix:
+        check_embedding_model()
+    workload = Workload(args.mix, args.seed)
+    if args.warmup:
+        print(f"🔥 Warming up with {args.warmup} requests")
+        for _ in range(args.warmup):
+            await asyncio.wait_for(run_conversation(workload.next()[1]), args.timeout)
+
+    steps = []
+    for i, rps in enumerate(sorted(args.rps)):
+        step = await run_step(run_conversation, workload, rps, args.duration, args.timeout,
+                              args.max_in_flight, args.seed + i)
+        print_step(step)
+        steps.append(step)
+        reason = over_limit(step, args.max_error_rate, args.max_p95_ms)
+        if reason:
+            print(f"🧱 Saturated at {rps:g} rps: {reason}")
+            break
+    return steps
+
+
+# --- 4. Stub servers ---
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_stub_servers(settings: StubSettings, timeout: float = 20) -> tuple[subprocess.Popen, str, str]:
+    """Run stub_servers.py in a child process (so it doesn't share our event loop) and wait until it answers."""
+    llm_port, search_port = _free_port(), _free_port()
+    process = subprocess.Popen(
+        [sys.executable, str(Path(__file__).with_name("stub_servers.py")),
+         "--llm-port", str(llm_port), "--search-port", str(search_port), *settings_to_argv(settings)],
+        stdout=subprocess.DEVNULL,
+    )
+    llm_url, search_url = f"http://127.0.0.1:{llm_port}/v1", f"http://127.0.0.1:{search_port}"
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            httpx.get(f"{llm_url}/models", timeout=1).raise_for_status()
+            httpx.post(f"{search_url}/search", json={"query": "ping", "max_results": 1}, timeout=5).raise_for_status()
+            return process, llm_url, search_url
+        except httpx.HTTPError:
+            if process.poll() is not None or time.monotonic() > deadline:
+                process.kill()
+                raise RuntimeError("Stub servers did not start")
+            time.sleep(0.2)
+
+
+def configure_environment(llm_url: str, search_url: str) -> None:
+    os.environ.update({
+        "BASE_URL": llm_url,
+        "API_KEY": "stub",
+        "MODEL_NAME": "stub-model",
+        "TAVILY_BASE_URL": search_url,
+        "TAVILY_API_KEY": "stub",
+        "LOGFIRE_SEND_TO_LOGFIRE": "0",
+        "TRENDING_WORKER_IN_PROCESS": "0",
+    })
+    for name, value in {"LOGFIRE_CONSOLE": "false", "ANSWER_CACHE_ENABLED": "0", "TRENDING_FEEDS_ENABLED": "0",
+                        "SEARCH_CACHE_TTL_SECONDS": "0", "METRICS_SAMPLE_RATE": "1.0"}.items():
+        os.environ.setdefault(name, value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test NewsSense end to end against stub LLM and search servers.")
+    parser.add_argument("--rps", type=float, nargs="+", default=[1, 2, 5],
+                        help="Target request rates, run lowest first.")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of load per rate.")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help="Query mix, e.g. trending=0.4,fact_check=0.4,summarize=0.2.")
+    parser.add_argument("--timeout", type=float, default=60, help="Per-request timeout in seconds.")
+    parser.add_argument("--max-in-flight", type=int, default=500,
+                        help="Requests beyond this many in flight are shed (counted as errors).")
+    parser.add_argument("--max-error-rate", type=float, default=0.05, help="Stop once a rate exceeds this.")
+    parser.add_argument("--max-p95-ms", type=float, help="Stop once p95 latency exceeds this.")
+    parser.add_argument("--warmup", type=int, default=3, help="Sequential requests before measuring.")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Write the results as JSON to this file.")
+    add_settings_arguments(parser)
+    args = parser.parse_args()
+
+    settings = settings_from_args(args)
+    process, llm_url, search_url = start_stub_servers(settings)
+    print(f"🤖 Stub servers up: LLM {llm_url}, search {search_url}")
+    try:
+        configure_environment(llm_url, search_url)
+        steps = asyncio.run(run_load_test(args))
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+    report = {"created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+              "stubs": vars(settings), "mix": args.mix, "steps": steps}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
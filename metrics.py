@@ -0,0 +1,283 @@
+"""
+Local latency and token metrics for every stage of a request.
+
+Stages recorded (label `stage`, with `name` the agent, tool or component):
+
+    request     a whole run_conversation / API call, named after how it was answered
+    route       the fast intent router's decision
+    agent       one agent's part of a run (its LLM turns plus its tool calls)
+    llm         one model call, named after the agent that made it
+    tool        one tool call (fact_check_claim, search_tavily, summarize_news, ...)
+    handoff     controller -> specialist handoffs (count only)
+    retrieval, search, summarize   work inside the tools
+
+Agent, LLM, tool and handoff timings and token usage come from the agents SDK's
+tracing spans (MetricsTraceProcessor); the rest are timed with `timed()`.
+Nothing leaves the process: read it with `snapshot()` (JSON) or
+`prometheus_text()`, e.g. from the API server's /metrics endpoint.
+
+With METRICS_SAMPLE_RATE below 1 only that fraction of requests is recorded
+(every stage of a sampled request, so breakdowns stay consistent).
+"""
+import contextvars
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from agents.tracing import TracingProcessor
+from agents.tracing.span_data import AgentSpanData, FunctionSpanData, GenerationSpanData, HandoffSpanData
+
+from config import get_bool, get_float
+
+
+# --- Configuration ---
+
+METRICS_ENABLED = get_bool("METRICS_ENABLED", True)
+METRICS_SAMPLE_RATE = get_float("METRICS_SAMPLE_RATE", 1.0)
+
+# Histogram bucket upper bounds, in seconds.
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# Name recorded for requests that raised or were cancelled.
+ERROR_NAME = "error"
+
+# None outside a request: stages are then sampled one by one.
+_sampled = contextvars.ContextVar("metrics_sampled", default=None)
+_scope = contextvars.ContextVar("metrics_request_scope", default=None)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram; quantiles are interpolated within a bucket and kept within min..max."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q: float):
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = BUCKETS[i - 1] if i > 0 else 0.0
+                upper = BUCKETS[i] if i < len(BUCKETS) else BUCKETS[-1] * 2
+                value = lower + (upper - lower) * (rank - seen) / count
+                return min(max(value, self.min), self.max)
+            seen += count
+        return self.max
+
+
+class Metrics:
+    """Thread-safe registry of stage histograms and per-agent token counters."""
+
+    def __init__(self, sample_rate: float = METRICS_SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        self.started = time.time()
+        self._histograms: dict[tuple[str, str], Histogram] = {}
+        self._tokens: dict[str, dict[str, int]] = {}
+        self._handoffs: dict[tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def sampled(self) -> bool:
+        flag = _sampled.get()
+        return flag if flag is not None else random.random() < self.sample_rate
+
+    def observe(self, stage: str, name: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self._histograms.get((stage, name))
+            if histogram is None:
+                histogram = self._histograms[(stage, name)] = Histogram()
+            histogram.observe(seconds)
+
+    def add_tokens(self, agent: str, prompt: int, completion: int) -> None:
+        with self._lock:
+            tokens = self._tokens.setdefault(agent, {"prompt": 0, "completion": 0, "calls": 0})
+            tokens["prompt"] += prompt
+            tokens["completion"] += completion
+            tokens["calls"] += 1
+
+    def add_handoff(self, from_agent: str, to_agent: str) -> None:
+        with self._lock:
+            key = (from_agent or "unknown", to_agent or "unknown")
+            self._handoffs[key] = self._handoffs.get(key, 0) + 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._tokens.clear()
+            self._handoffs.clear()
+            self.started = time.time()
+
+    def snapshot(self) -> dict:
+        """All stages with count, mean and p50/p95/p99 in milliseconds, plus token totals."""
+        with self._lock:
+            stages = {}
+            for (stage, name), histogram in sorted(self._histograms.items()):
+                stages.setdefault(stage, {})[name] = {
+                    "count": histogram.count,
+                    "mean_ms": round(histogram.sum / histogram.count * 1000, 2),
+                    "p50_ms": round(histogram.quantile(0.5) * 1000, 2),
+                    "p95_ms": round(histogram.quantile(0.95) * 1000, 2),
+                    "p99_ms": round(histogram.quantile(0.99) * 1000, 2),
+                }
+            return {
+                "since": self.started,
+                "sample_rate": self.sample_rate,
+                "stages": stages,
+                "tokens": {agent: dict(tokens) for agent, tokens in sorted(self._tokens.items())},
+                "handoffs": [{"from": a, "to": b, "count": n} for (a, b), n in sorted(self._handoffs.items())],
+            }
+
+    def prometheus_text(self) -> str:
+        """The same data in the Prometheus text exposition format."""
+        lines = [
+            "# HELP newssense_stage_seconds Latency of each request stage (sampled).",
+            "# TYPE newssense_stage_seconds histogram",
+        ]
+        with self._lock:
+            for (stage, name), histogram in sorted(self._histograms.items()):
+                labels = f'stage="{stage}",name="{_escape(name)}"'
+                cumulative = 0
+                for bound, count in zip(BUCKETS, histogram.counts):
+                    cumulative += count
+                    lines.append(f'newssense_stage_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'newssense_stage_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f"newssense_stage_seconds_sum{{{labels}}} {histogram.sum:.6f}")
+                lines.append(f"newssense_stage_seconds_count{{{labels}}} {histogram.count}")
+            lines += ["# HELP newssense_tokens_total LLM tokens used per agent (sampled).",
+                      "# TYPE newssense_tokens_total counter"]
+            for agent, tokens in sorted(self._tokens.items()):
+                for kind in ("prompt", "completion"):
+                    lines.append(f'newssense_tokens_total{{agent="{_escape(agent)}",kind="{kind}"}} {tokens[kind]}')
+            lines += ["# HELP newssense_handoffs_total Agent handoffs (sampled).",
+                      "# TYPE newssense_handoffs_total counter"]
+            for (from_agent, to_agent), count in sorted(self._handoffs.items()):
+                lines.append(f'newssense_handoffs_total{{from="{_escape(from_agent)}",to="{_escape(to_agent)}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+metrics = Metrics()
+
+
+@contextmanager
+def timed(stage: str, name: str):
+    """Record the duration of the block as one observation of `stage`/`name`."""
+    if not METRICS_ENABLED or not metrics.sampled():
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.observe(stage, name, time.perf_counter() - start)
+
+
+def record_tokens(name: str, prompt: int, completion: int) -> None:
+    """Count tokens of a model call made outside the agents SDK (e.g. chunk summaries)."""
+    if METRICS_ENABLED and metrics.sampled():
+        metrics.add_tokens(name, prompt, completion)
+
+
+class RequestScope:
+    """Handle returned by `request_scope`; set `name` to say how the request was answered."""
+
+    def __init__(self, name: str):
+        self.name = name
+
+
+@contextmanager
+def request_scope(name: str = "agent"):
+    """
+    Decide once whether this request is sampled (agent runs and tool calls inside
+    inherit the decision) and record its total time under stage "request".
+    A request that raises or is cancelled is recorded as "error". A nested scope
+    returns the enclosing request's scope, so the request is recorded only once.
+    """
+    enclosing = _scope.get()
+    if enclosing is not None:
+        yield enclosing
+        return
+    sampled = _sampled.get()
+    if sampled is None:
+        sampled = METRICS_ENABLED and random.random() < metrics.sample_rate
+    sampled_token = _sampled.set(sampled)
+    scope = RequestScope(name)
+    scope_token = _scope.set(scope)
+    start = time.perf_counter()
+    failed = False
+    try:
+        yield scope
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        if sampled:
+            metrics.observe("request", ERROR_NAME if failed else scope.name or name, time.perf_counter() - start)
+        _scope.reset(scope_token)
+        _sampled.reset(sampled_token)
+
+
+class MetricsTraceProcessor(TracingProcessor):
+    """Turns the agents SDK's agent, generation, function and handoff spans into stage metrics."""
+
+    def __init__(self, registry: Metrics = metrics):
+        self.registry = registry
+        self._started: dict[str, float] = {}
+        self._agent_names: dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def on_trace_start(self, trace) -> None:
+        pass
+
+    def on_trace_end(self, trace) -> None:
+        pass
+
+    def on_span_start(self, span) -> None:
+        if not self.registry.sampled():
+            return
+        with self._lock:
+            self._started[span.span_id] = time.perf_counter()
+            if isinstance(span.span_data, AgentSpanData):
+                self._agent_names[span.span_id] = span.span_data.name
+
+    def on_span_end(self, span) -> None:
+        with self._lock:
+            start = self._started.pop(span.span_id, None)
+            agent = self._agent_names.pop(span.span_id, None) or self._agent_names.get(span.parent_id, "unknown")
+        if start is None:
+            return
+        seconds = time.perf_counter() - start
+        data = span.span_data
+        if isinstance(data, AgentSpanData):
+            self.registry.observe("agent", data.name, seconds)
+        elif isinstance(data, GenerationSpanData):
+            self.registry.observe("llm", agent, seconds)
+            usage = data.usage or {}
+            self.registry.add_tokens(agent, usage.get("input_tokens", 0), usage.get("output_tokens", 0))
+        elif isinstance(data, FunctionSpanData):
+            self.registry.observe("tool", data.name, seconds)
+        elif isinstance(data, HandoffSpanData):
+            self.registry.add_handoff(data.from_agent, data.to_agent)
+
+    def shutdown(self) -> None:
+        pass
+
+    def force_flush(self) -> None:
+        pass
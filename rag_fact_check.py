@@ -1,59 +1,92 @@
 import asyncio
-import os
-from agents import Agent, OpenAIChatCompletionsModel, Runner, function_tool, set_tracing_disabled
-import chromadb
+from agents import Agent, OpenAIChatCompletionsModel, Runner, function_tool
 import json
-from dotenv import load_dotenv
-from openai import AsyncOpenAI
 from pydantic import BaseModel
 import logfire
 
+from config import MODEL_NAME
+from fact_check_service import get_retriever
+from hybrid_retrieval import FACT_CHECK_HYBRID, get_hybrid_retriever
+from sharded_retrieval import get_sharded_retriever
+from runtime import configure_observability, get_openai_client
+from schemas import FactCheckOutput, VerificationResult
+from metrics import timed
+from tool_runtime import run_blocking, tool_limit
 
-# --- Configuration ---
 
-# Load environment variables
-load_dotenv()
+# Set up Logfire for observability (once per process, see runtime.py)
+configure_observability()
 
-BASE_URL = os.getenv("BASE_URL") 
-API_KEY = os.getenv("API_KEY") 
-MODEL_NAME = os.getenv("MODEL_NAME") 
-LOGFIRE_TOKEN = os.getenv("LOGFIRE_TOKEN") 
+client = get_openai_client()
 
-
-
-# Set up Logfire for observability
-# You can get a free Logfire account to view detailed logs.
-# For this example, we'll log to the console.
-logfire.configure(
-    send_to_logfire=True, # Set to True to send to the Logfire service
-    token=LOGFIRE_TOKEN,  # Your Logfire token
-)
-
-logfire.instrument_openai_agents()
-
-client = AsyncOpenAI(base_url=BASE_URL, api_key=API_KEY)
-#set_tracing_disabled(disabled=True)
+# The knowledge base is warmed up in the background at startup by runtime.warm_up_fact_check().
 
 
 # Define the input model for type hinting and validation
 class FactCheckInput(BaseModel):
     claim: str
 
-class VerificationResult(BaseModel):
-    verdict: str
-    summary: str
-    sources: list[str] = []  # List of source URLs or names
+class FactCheckBatchInput(BaseModel):
+    claims: list[str]
+
 
-class FactCheckOutput(BaseModel):
-    status: str
-    result: VerificationResult
+# For cosine similarity, distance = 1 - similarity. A smaller distance is better.
+# We set a threshold of 0.6 to avoid returning irrelevant results.
+MATCH_THRESHOLD = 0.6
 
 
+def _verdict_output(metadata) -> dict:
+    """Turn a matched knowledge base entry (or None) into a FactCheckOutput dict."""
+    if metadata is not None:
+        return FactCheckOutput(
+            status="success",
+            result=VerificationResult(
+                verdict=metadata["verdict"],
+                summary=metadata["summary"],
+                # De-serialize the sources string back into a list
+                sources=json.loads(metadata["sources"])
+            )
+        ).model_dump()
+    else:
+        return FactCheckOutput(
+            status="info",
+            result=VerificationResult(
+                verdict="Not found",
+                summary="Could not verify this claim with available data."
+            )
+        ).model_dump()
+
+
+def _to_fact_check_output(results: dict, index: int) -> dict:
+    """Turn the index-th query of a ChromaDB result into a FactCheckOutput dict."""
+    # Check if any results were found and if the distance is below the threshold
+    if results['ids'][index] and results['distances'][index][0] < MATCH_THRESHOLD:
+        return _verdict_output(results['metadatas'][index][0])
+    return _verdict_output(None)
+
+
+def _check_claims(claims: list[str]) -> list[dict]:
+    """Blocking fact-check of a batch of claims, one FactCheckOutput dict per claim."""
+    sharded = get_sharded_retriever()
+    if sharded is not None:
+        # Each claim is checked against the shards it is about, queried in parallel.
+        with timed("retrieval", "sharded"):
+            matches = sharded.best_matches(claims)
+        return [_verdict_output(match) for match in matches]
+    if FACT_CHECK_HYBRID:
+        # BM25 + vector candidates, fused and reranked, with per-collection thresholds.
+        with timed("retrieval", "hybrid"):
+            matches = get_hybrid_retriever().best_matches(claims)
+        return [_verdict_output(match) for match in matches]
+    # Vector only: the single most similar document per claim.
+    with timed("retrieval", "vector"):
+        results = get_retriever().query_batch(claims, n_results=1)
+    return [_to_fact_check_output(results, i) for i in range(len(claims))]
 
 
 @function_tool
 @logfire.instrument("fact_check_claim tool called")
-def fact_check_claim(params: FactCheckInput) -> dict:
+async def fact_check_claim(params: FactCheckInput) -> dict:
     """
     Verifies a claim against a knowledge base stored in a local ChromaDB
     instance using vector search.
@@ -61,89 +94,28 @@ def fact_check_claim(params: FactCheckInput) -> dict:
     claim = params.claim
     print(f"⚙️ Tool: Fact-checking claim with ChromaDB: '{claim}'")
 
-    # 1. Initialize ChromaDB client and embedding function
-    # Using a persistent client to store data on disk
-    client = chromadb.PersistentClient(path="./chroma_db")
-    
-    # Use the "all-MiniLM-L6-v2" model for embeddings
-    from chromadb.utils import embedding_functions
-    sentence_transformer_ef = embedding_functions.SentenceTransformerEmbeddingFunction(
-        model_name="all-MiniLM-L6-v2"
-    )
-
-    # 2. Get or create the collection
-    collection = client.get_or_create_collection(
-        name="knowledge_base",
-        embedding_function=sentence_transformer_ef,
-        metadata={"hnsw:space": "cosine"} # Use cosine similarity
-    )
-
-    # 3. Populate the knowledge base (only if it's empty)
-    if collection.count() == 0:
-        print("📚 Populating ChromaDB with knowledge base data for the first time...")
-        knowledge_base_data = {
-            "is openai partnering with apple?": {
-                "verdict": "Unconfirmed, but widely rumored.",
-                "summary": "Multiple tech news outlets have reported on ongoing discussions between Apple and OpenAI to integrate generative AI features into iOS. However, neither company has issued an official confirmation. Sources suggest a deal is plausible but not finalized.",
-                "sources": ["TechCrunch Report", "Bloomberg News"]
-            },
-            "did apple acquire openai?": {
-                "verdict": "False.",
-                "summary": "There is no credible evidence or official announcement that Apple has acquired OpenAI. This is a false claim.",
-                "sources": ["Internal Knowledge Base"]
-            }
-        }
-        
-        documents = []
-        metadatas = []
-        ids = []
-        
-        for i, (question, data) in enumerate(knowledge_base_data.items()):
-            documents.append(question)
-            # Metadata values must be strings, ints, floats, or bools.
-            # We serialize the list of sources into a JSON string.
-            metadatas.append({
-                "verdict": data["verdict"],
-                "summary": data["summary"],
-                "sources": json.dumps(data["sources"]) # Serialize list to JSON string
-            })
-            ids.append(f"id_{i+1}")
-
-        collection.add(
-            documents=documents,
-            metadatas=metadatas,
-            ids=ids
-        )
-        print("✅ Knowledge base populated successfully.")
-
-    # 4. Perform vector search (query)
-    # Find the single most similar document to the claim.
-    results = collection.query(
-        query_texts=[claim],
-        n_results=1
-    )
-
-    # 5. Process and return the result
-    # Check if any results were found and if the distance is below a threshold
-    # For cosine similarity, distance = 1 - similarity. A smaller distance is better.
-    # We set a threshold of 0.6 to avoid returning irrelevant results.
-    if results['ids'][0] and results['distances'][0][0] < 0.6:
-        retrieved_metadata = results['metadatas'][0][0]
-        
-        # De-serialize the sources string back into a list
-        retrieved_metadata["sources"] = json.loads(retrieved_metadata["sources"])
-        
-        return {"status": "success", "result": retrieved_metadata}
-    else:
-        return {
-            "status": "info",
-            "result": {
-                "verdict": "Not found",
-                "summary": "Could not verify this claim with available data."
-            }
-        }
+    # Search the shared, already-loaded collection. Embedding and ChromaDB
+    # are blocking, so they run on the tool executor to keep the event loop free.
+    async with tool_limit("fact_check"):
+        results = await run_blocking(_check_claims, [claim])
+    return results[0]
 
 
+@function_tool
+@logfire.instrument("fact_check_claims tool called")
+async def fact_check_claims(params: FactCheckBatchInput) -> list[dict]:
+    """
+    Verifies several claims at once, e.g. all the claims in a pasted article.
+    Returns one result per claim, in the same order as the claims.
+    """
+    claims = [claim for claim in params.claims if claim.strip()]
+    print(f"⚙️ Tool: Fact-checking {len(claims)} claims with ChromaDB")
+    if not claims:
+        return []
+
+    # One embedding pass and one ChromaDB query for the whole batch.
+    async with tool_limit("fact_check"):
+        return await run_blocking(_check_claims, claims)
 
 
 fact_check_agent = Agent(
@@ -163,12 +135,15 @@ fact_check_agent = Agent(
     A tools given to you. If the claim is found, return the verdict, summary, and sources.
 
     If the claim is not found, return a message indicating that the claim could not be verified.
+
+    If the user supplies several claims (for example a pasted article), check them all with a single
+    call to fact_check_claims instead of calling fact_check_claim once per claim.
     """,
     model=OpenAIChatCompletionsModel(
         openai_client=client,
         model=MODEL_NAME
     ),
-    tools=[fact_check_claim],
+    tools=[fact_check_claim, fact_check_claims],
     output_type=FactCheckOutput
 )
 
@@ -0,0 +1,369 @@
+"""
+Offline benchmark and regression suite for the fact-check retrieval path.
+
+Builds a synthetic claim corpus of each requested size in a temporary ChromaDB
+directory and measures:
+
+  * ingestion throughput (rows/sec)
+  * cold start (load, first query, BM25 index ready)
+  * query p50/p95/p99 and batch throughput
+  * recall@k, and hit rate at the match threshold on a labeled query set
+  * false matches on claims that are not in the corpus
+
+for both vector-only and hybrid (BM25 + vector) retrieval. Results can be
+written as JSON and compared against a previous run, so CI can fail on
+latency or accuracy regressions.
+
+By default a hashing "stub" embedding is used, so the benchmark needs no model
+download or network access; pass --embedding with an EMBEDDING_MODEL value
+(e.g. all-MiniLM-L6-v2 or onnx-int8:all-MiniLM-L6-v2) to measure a real model.
+
+Usage:
+    python retrieval_benchmark.py --sizes 10000 100000 --output bench.json
+    python retrieval_benchmark.py --sizes 10000 --baseline bench.json
+    python retrieval_benchmark.py --sizes 1000000 --queries 2000 --embedding onnx-int8:all-MiniLM-L6-v2
+"""
+import argparse
+import hashlib
+import json
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from embedding_backends import create_embedding_backend
+from fact_check_service import FactCheckRetriever
+from hybrid_retrieval import BM25Index, HybridRetriever, bm25_index_path
+from ingest_knowledge_base import IngestStats, prepare_record, upsert_chunk
+
+
+# Same cutoff as the vector-only fact_check_claim path (rag_fact_check.MATCH_THRESHOLD).
+MATCH_THRESHOLD = 0.6
+BENCHMARK_COLLECTION = "benchmark"
+
+
+# --- 1. Offline embedding ---
+
+class HashingEmbeddingFunction:
+    """
+    Deterministic bag-of-words embedding (signed feature hashing).
+
+    Not semantically meaningful, but fast, dependency-free and stable across
+    runs, which is what a latency/regression benchmark needs.
+    """
+
+    def __init__(self, dimensions: int = 384):
+        self.dimensions = dimensions
+
+    def name(self) -> str:
+        return "hashing"
+
+    def __call__(self, input: list[str]) -> list[np.ndarray]:
+        vectors = np.zeros((len(input), self.dimensions), dtype=np.float32)
+        for i, text in enumerate(input):
+            for token in text.lower().split():
+                digest = int(hashlib.md5(token.strip(".,?!()$").encode("utf-8")).hexdigest(), 16)
+                vectors[i, digest % self.dimensions] += 1 if digest & 1 << 64 else -1
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return list(vectors / np.where(norms == 0, 1, norms))
+
+
+def make_embedding_function(kind: str):
+    """The offline hashing embedding for "stub", otherwise the backend for an EMBEDDING_MODEL value."""
+    if kind == "stub":
+        return HashingEmbeddingFunction()
+    # Uncached, so repeated runs keep measuring the model.
+    return create_embedding_backend(kind, micro_batching=False, cache=False)
+
+
+# --- 2. Synthetic corpus ---
+
+SYLLABLES = ["ar", "ben", "cor", "dal", "el", "fen", "gar", "hol", "is", "jor", "kel", "lum",
+             "mar", "nor", "ost", "pra", "quin", "ros", "sel", "tor", "ul", "vex", "wyn", "zan"]
+CITIES = ["Lagos", "Lima", "Oslo", "Dhaka", "Quito", "Perth", "Accra", "Seoul", "Porto", "Austin",
+          "Nairobi", "Hanoi", "Leeds", "Turin", "Osaka", "Tbilisi"]
+MONTHS = ["January", "February", "March", "April", "May", "June", "July", "August",
+          "September", "October", "November", "December"]
+VERDICTS = ["True", "False", "Misleading", "Unconfirmed"]
+
+# (claim template, paraphrased query template) pairs sharing the same slots.
+TEMPLATES = [
+    ("{org} ({ticker}) reported revenue of {n} billion dollars in Q{q} {year}.",
+     "Did {ticker} really make {n} billion in revenue in Q{q} {year}?"),
+    ("{person} was appointed chief executive of {org} in {month} {year}.",
+     "Is it true {person} became CEO of {org} in {year}?"),
+    ("{org} plans to cut {n} jobs at its {city} offices by {year}.",
+     "I heard {org} is laying off {n} people in {city}, is that right?"),
+    ("{city} recorded {n} millimetres of rain on {month} {day}, {year}.",
+     "Did {city} get {n} mm of rain on {month} {day} {year}?"),
+    ("{person} won the {city} marathon in {year} with a time under {n} minutes.",
+     "Did {person} win the {year} {city} marathon?"),
+]
+
+
+def _name(rng: random.Random, parts: int) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(parts)).capitalize()
+
+
+def generate_corpus(size: int, seed: int = 7):
+    """Yield (record, paraphrased query) pairs; every claim is unique."""
+    rng = random.Random(seed)
+    for i in range(size):
+        claim_template, query_template = TEMPLATES[i % len(TEMPLATES)]
+        org = _name(rng, 3)
+        slots = {
+            "org": org,
+            "ticker": (org[:3] + rng.choice(SYLLABLES)[0]).upper(),
+            "person": f"{_name(rng, 2)} {_name(rng, 3)}",
+            "city": rng.choice(CITIES),
+            "month": rng.choice(MONTHS),
+            "day": rng.randint(1, 28),
+            "year": rng.randint(1990, 2025),
+            "q": rng.randint(1, 4),
+            "n": rng.randint(2, 9999),
+        }
+        record = {
+            "id": f"bench_{i}",
+            "claim": claim_template.format(**slots),
+            "verdict": rng.choice(VERDICTS),
+            "summary": "Synthetic benchmark claim.",
+            "sources": ["benchmark"],
+        }
+        yield record, query_template.format(**slots)
+
+
+def build_corpus(retriever: FactCheckRetriever, size: int, query_count: int,
+                 chunk_size: int = 2048, embed_batch: int = 512) -> tuple[list[tuple[str, str]], dict]:
+    """Ingest `size` synthetic claims; return (query, expected id) pairs and ingestion stats."""
+    collection = retriever.collection
+    keyword_index = BM25Index()
+    stats = IngestStats()
+    # Sample labeled queries evenly across the corpus.
+    query_every = max(1, size // max(1, query_count))
+    labeled = []
+    chunk = []
+    for i, (record, query) in enumerate(generate_corpus(size)):
+        stats.read += 1
+        chunk.append(prepare_record(record))
+        if i % query_every == 0 and len(labeled) < query_count:
+            labeled.append((query, record["id"]))
+        if len(chunk) >= chunk_size:
+            upsert_chunk(collection, retriever.embedding_function, chunk, embed_batch, stats, keyword_index)
+            chunk = []
+    if chunk:
+        upsert_chunk(collection, retriever.embedding_function, chunk, embed_batch, stats, keyword_index)
+    keyword_index.source_count = collection.count()
+    keyword_index.save(bm25_index_path(retriever))
+    return labeled, {"records": stats.upserted, "rows_per_second": round(stats.rows_per_second, 1)}
+
+
+# --- 3. Measurement ---
+
+def _percentile(samples: list[float], q: float) -> float:
+    return round(float(np.percentile(samples, q * 100)) * 1000, 3)
+
+
+def latency_summary(samples: list[float]) -> dict:
+    return {
+        "p50_ms": _percentile(samples, 0.50),
+        "p95_ms": _percentile(samples, 0.95),
+        "p99_ms": _percentile(samples, 0.99),
+    }
+
+
+def evaluate_vector(retriever: FactCheckRetriever, labeled: list[tuple[str, str]],
+                    negatives: list[str], k: int) -> dict:
+    """The vector-only path: nearest neighbours, matched with the fixed 0.6 cutoff."""
+    hits_at_1 = hits_at_k = threshold_hits = 0
+    latencies = []
+    for query, expected_id in labeled:
+        start = time.perf_counter()
+        result = retriever.query(query, n_results=k)
+        latencies.append(time.perf_counter() - start)
+        ranked = result["ids"][0]
+        hits_at_1 += bool(ranked) and ranked[0] == expected_id
+        hits_at_k += expected_id in ranked
+        threshold_hits += bool(ranked) and ranked[0] == expected_id and result["distances"][0][0] < MATCH_THRESHOLD
+    false_matches = sum(
+        1 for distances in retriever.query_batch(negatives, n_results=1)["distances"]
+        if distances and distances[0] < MATCH_THRESHOLD
+    )
+    return {
+        "recall@1": round(hits_at_1 / len(labeled), 4),
+        f"recall@{k}": round(hits_at_k / len(labeled), 4),
+        "hit_rate": round(threshold_hits / len(labeled), 4),
+        "false_match_rate": round(false_matches / len(negatives), 4),
+        **latency_summary(latencies),
+    }
+
+
+def evaluate_hybrid(hybrid: HybridRetriever, labeled: list[tuple[str, str]],
+                    negatives: list[str], k: int) -> dict:
+    """The hybrid path: fused candidates, matched with the collection's thresholds."""
+    hits_at_1 = hits_at_k = threshold_hits = 0
+    latencies = []
+    for query, expected_id in labeled:
+        start = time.perf_counter()
+        candidates = hybrid.candidates_batch([query])[0]
+        latencies.append(time.perf_counter() - start)
+        ranked = [candidate["id"] for candidate in candidates]
+        match = next((candidate for candidate in candidates if hybrid.is_match(candidate)), None)
+        hits_at_1 += bool(ranked) and ranked[0] == expected_id
+        hits_at_k += expected_id in ranked[:k]
+        threshold_hits += match is not None and match["id"] == expected_id
+    false_matches = sum(1 for match in hybrid.best_matches(negatives) if match is not None)
+    return {
+        "recall@1": round(hits_at_1 / len(labeled), 4),
+        f"recall@{k}": round(hits_at_k / len(labeled), 4),
+        "hit_rate": round(threshold_hits / len(labeled), 4),
+        "false_match_rate": round(false_matches / len(negatives), 4),
+        **latency_summary(latencies),
+    }
+
+
+def batch_throughput(search_batch, queries: list[str], batch_size: int) -> float:
+    """Claims per second when `search_batch` is called with batches of `batch_size`."""
+    start = time.perf_counter()
+    for i in range(0, len(queries), batch_size):
+        search_batch(queries[i:i + batch_size])
+    return round(len(queries) / (time.perf_counter() - start), 1)
+
+
+def cold_start_probe(path: str, embedding: str) -> dict:
+    """Load a retriever from scratch and answer a first query (run in a fresh process)."""
+    start = time.perf_counter()
+    retriever = FactCheckRetriever(path=path, collection_name=BENCHMARK_COLLECTION,
+                                   embedding_function=make_embedding_function(embedding))
+    retriever.load()
+    loaded = time.perf_counter()
+    retriever.query("cold start", n_results=1)
+    first_query = time.perf_counter()
+    HybridRetriever(retriever).warm_up()
+    hybrid_ready = time.perf_counter()
+    return {
+        "load_seconds": round(loaded - start, 3),
+        "first_query_seconds": round(first_query - start, 3),
+        "hybrid_ready_seconds": round(hybrid_ready - start, 3),
+    }
+
+
+def measure_cold_start(path: str, embedding: str) -> dict:
+    """
+    Cold start as a new process sees it: interpreter start and imports, then the
+    probe above. In-process numbers would be flattered by ChromaDB's client cache.
+    """
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, __file__, "--cold-start-probe", path, "--embedding", embedding],
+        capture_output=True, text=True, check=True,
+    )
+    total = time.perf_counter() - start
+    probe = json.loads(completed.stdout.strip().splitlines()[-1])
+    return {**probe, "process_seconds": round(total, 3)}
+
+
+def run_benchmark(size: int, query_count: int, k: int, embedding: str, batch_size: int = 32) -> dict:
+    workdir = tempfile.mkdtemp(prefix="newssense_bench_")
+    try:
+        retriever = FactCheckRetriever(path=workdir, collection_name=BENCHMARK_COLLECTION,
+                                       embedding_function=make_embedding_function(embedding))
+        print(f"📥 Building a {size:,}-claim corpus in {workdir}")
+        labeled, ingestion = build_corpus(retriever, size, query_count)
+        print(f"   {ingestion['records']:,} records at {ingestion['rows_per_second']:,.0f} rows/sec")
+        # Claims about entities that are not in the corpus; any match is a false positive.
+        negatives = [query for _, query in generate_corpus(max(1, query_count // 5), seed=size + 1)]
+
+        cold_start = measure_cold_start(workdir, embedding)
+        hybrid = HybridRetriever(retriever, top_k=k)
+        hybrid.warm_up()
+        queries = [query for query, _ in labeled]
+
+        print(f"🔎 Running {len(labeled)} labeled and {len(negatives)} negative queries")
+        return {
+            "size": size,
+            "queries": len(labeled),
+            "k": k,
+            "embedding": embedding,
+            "ingestion": ingestion,
+            "cold_start": cold_start,
+            "vector": {
+                **evaluate_vector(retriever, labeled, negatives, k),
+                "batch_claims_per_second": batch_throughput(
+                    lambda batch: retriever.query_batch(batch, n_results=1), queries, batch_size),
+            },
+            "hybrid": {
+                **evaluate_hybrid(hybrid, labeled, negatives, k),
+                "batch_claims_per_second": batch_throughput(hybrid.best_matches, queries, batch_size),
+            },
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+# --- 4. Regression check ---
+
+def compare(results: list[dict], baseline: list[dict], max_latency_regression: float,
+            max_hit_rate_drop: float) -> list[str]:
+    """Return a description of every regression against a baseline run of the same sizes."""
+    previous = {run["size"]: run for run in baseline}
+    regressions = []
+    for run in results:
+        before = previous.get(run["size"])
+        if before is None:
+            continue
+        for path in ("vector", "hybrid"):
+            old, new = before[path], run[path]
+            if new["p95_ms"] > old["p95_ms"] * (1 + max_latency_regression):
+                regressions.append(f"{path} p95 at {run['size']:,}: {old['p95_ms']}ms -> {new['p95_ms']}ms")
+            if new["hit_rate"] < old["hit_rate"] - max_hit_rate_drop:
+                regressions.append(f"{path} hit rate at {run['size']:,}: {old['hit_rate']} -> {new['hit_rate']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fact-check retrieval on a synthetic corpus.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000],
+                        help="Corpus sizes to benchmark, e.g. 10000 100000 1000000.")
+    parser.add_argument("--queries", type=int, default=500, help="Number of labeled queries.")
+    parser.add_argument("-k", type=int, default=5, help="Candidates per query (recall@k).")
+    parser.add_argument("--batch-size", type=int, default=32, help="Claims per call for batch throughput.")
+    parser.add_argument("--embedding", default="stub",
+                        help='"stub" (offline) or an EMBEDDING_MODEL value such as onnx-int8:all-MiniLM-L6-v2.')
+    parser.add_argument("--output", help="Write the results as JSON to this file.")
+    parser.add_argument("--baseline", help="A previous --output file; exit 1 on regressions against it.")
+    parser.add_argument("--max-latency-regression", type=float, default=0.25,
+                        help="Allowed relative p95 increase over the baseline.")
+    parser.add_argument("--max-hit-rate-drop", type=float, default=0.02,
+                        help="Allowed absolute hit-rate drop from the baseline.")
+    parser.add_argument("--cold-start-probe", metavar="PATH", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.cold_start_probe:
+        print(json.dumps(cold_start_probe(args.cold_start_probe, args.embedding)))
+        return
+
+    results = [run_benchmark(size, args.queries, args.k, args.embedding, args.batch_size) for size in args.sizes]
+    report = {"created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), "runs": results}
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["runs"]
+        regressions = compare(results, baseline, args.max_latency_regression, args.max_hit_rate_drop)
+        for regression in regressions:
+            print(f"❌ Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+        print("✅ No regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
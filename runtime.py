@@ -0,0 +1,189 @@
+import asyncio
+import atexit
+import queue
+import threading
+
+import logfire
+from openai import AsyncOpenAI
+
+from config import API_KEY, BASE_URL, LOGFIRE_TOKEN, get_bool
+
+
+# --- Configuration ---
+
+# Load the knowledge base and embedding model in the background at startup,
+# so the first fact-check doesn't pay for it.
+FACT_CHECK_WARMUP = get_bool("FACT_CHECK_WARMUP", True)
+# Agents SDK tracing feeds both Logfire and the local metrics (metrics.py); 0 turns both off.
+TRACING_ENABLED = get_bool("TRACING_ENABLED", True)
+# 0 keeps Logfire spans local (e.g. under load_test.py, with no token).
+LOGFIRE_SEND_TO_LOGFIRE = get_bool("LOGFIRE_SEND_TO_LOGFIRE", True)
+
+
+_lock = threading.Lock()
+_observability_configured = False
+_tracing_configured = False
+_openai_client = None
+_runtime = None
+
+
+def configure_tracing() -> None:
+    """
+    The one place agents SDK tracing is switched on or off. Spans go to the
+    local metrics processor (and to Logfire once configure_observability ran)
+    instead of the SDK's default exporter to the OpenAI platform.
+    """
+    global _tracing_configured
+    if _tracing_configured:
+        return
+    with _lock:
+        if _tracing_configured:
+            return
+        from agents import set_trace_processors, set_tracing_disabled
+
+        from metrics import METRICS_ENABLED, MetricsTraceProcessor
+
+        set_trace_processors([MetricsTraceProcessor()] if METRICS_ENABLED else [])
+        set_tracing_disabled(disabled=not TRACING_ENABLED)
+        _tracing_configured = True
+
+
+def configure_observability() -> None:
+    """Configure Logfire and instrument the agents SDK once per process, however often it is called."""
+    global _observability_configured
+    if _observability_configured:
+        return
+    with _lock:
+        if _observability_configured:
+            return
+        # Set up Logfire for observability
+        # You can get a free Logfire account to view detailed logs.
+        logfire.configure(
+            send_to_logfire=LOGFIRE_SEND_TO_LOGFIRE, # Set to True to send to the Logfire service
+            token=LOGFIRE_TOKEN,  # Your Logfire token
+        )
+        logfire.instrument_openai_agents()
+        _observability_configured = True
+    configure_tracing()
+
+
+def get_openai_client() -> AsyncOpenAI:
+    """The AsyncOpenAI client shared by every agent, so they share one HTTP connection pool."""
+    global _openai_client
+    if _openai_client is None:
+        with _lock:
+            if _openai_client is None:
+                _openai_client = AsyncOpenAI(base_url=BASE_URL, api_key=API_KEY)
+    return _openai_client
+
+
+def warm_up_fact_check() -> None:
+    """Start loading the fact-check knowledge base (and BM25 index) on a background thread."""
+    if not FACT_CHECK_WARMUP:
+        return
+    # Imported here so that importing runtime stays cheap.
+    from fact_check_service import get_retriever
+    from hybrid_retrieval import FACT_CHECK_HYBRID, get_hybrid_retriever
+    from sharded_retrieval import get_sharded_retriever
+
+    sharded = get_sharded_retriever()
+    if sharded is not None:
+        sharded.warm_up(background=True)
+    else:
+        (get_hybrid_retriever() if FACT_CHECK_HYBRID else get_retriever()).warm_up(background=True)
+
+
+class AgentRuntime:
+    """
+    A long-lived event loop on a background thread.
+
+    Callers from synchronous code (e.g. Streamlit reruns) submit coroutines here
+    instead of calling asyncio.run() per message, so the OpenAI client's
+    keep-alive connections and per-loop caches survive between requests.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="agent-runtime", daemon=True)
+        self._thread.start()
+
+    def _run_loop(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro):
+        """Schedule a coroutine on the runtime loop and return a concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout: float = None):
+        """Run a coroutine on the runtime loop and block until it finishes."""
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+    def iterate(self, async_iterable):
+        """
+        Consume an async iterator on the runtime loop and yield its items in the
+        calling thread, as they arrive.
+        """
+        items = queue.Queue()
+        done = object()
+
+        async def pump():
+            try:
+                async for item in async_iterable:
+                    items.put(item)
+            except BaseException as e:
+                items.put(e)
+                raise
+            finally:
+                items.put(done)
+
+        future = self.submit(pump())
+        try:
+            while True:
+                item = items.get()
+                if item is done:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            # Stops the producer if the consumer gave up early.
+            future.cancel()
+
+    async def _warm_up(self) -> None:
+        try:
+            # Opens a keep-alive connection to the model endpoint ahead of the first message.
+            await get_openai_client().models.list()
+        except Exception as e:
+            logfire.warn("OpenAI client warm-up failed: {error}", error=str(e))
+
+    def warm_up(self) -> None:
+        """Pre-warm the shared OpenAI connection and the fact-check knowledge base, and start the trending worker if enabled."""
+        self.submit(self._warm_up())
+        warm_up_fact_check()
+        # Imported here so that importing runtime stays cheap.
+        from trending_ingest import start_worker
+
+        start_worker()
+
+    def stop(self) -> None:
+        if self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join(timeout=5)
+
+
+def get_runtime() -> AgentRuntime:
+    """Return the process-wide runtime, starting and warming it up on first use."""
+    global _runtime
+    if _runtime is None:
+        with _lock:
+            if _runtime is None:
+                _runtime = AgentRuntime()
+                _runtime.warm_up()
+                atexit.register(_runtime.stop)
+    return _runtime
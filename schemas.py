@@ -0,0 +1,42 @@
+"""
+Output schemas of the specialist agents.
+
+Kept apart from the agent modules so the API server, the controller and the
+UI can use them without importing (and building) the agents themselves.
+"""
+from typing import List
+
+from pydantic import BaseModel, Field
+
+
+# --- Trending News Agent ---
+
+class NewsHeadline(BaseModel):
+    """A single, ranked news headline with its source."""
+    rank: int = Field(description="The rank of the headline based on its trend frequency (1 is the most trending).")
+    headline: str = Field(description="The concise news headline.")
+    source: str = Field(description="The source URL for the news article.")
+    
+class TrendingNews(BaseModel):
+    """A collection of trending news headlines for a specific topic."""
+    topic: str = Field(description="The central topic these headlines relate to.")
+    headlines: List[NewsHeadline] = Field(description="A list of ranked, trending headlines about the topic.")
+
+
+# --- Fact Check Specialist ---
+
+class VerificationResult(BaseModel):
+    verdict: str
+    summary: str
+    sources: list[str] = []  # List of source URLs or names
+
+class FactCheckOutput(BaseModel):
+    status: str
+    result: VerificationResult
+
+
+# --- Article Summarizer ---
+
+class SummarizeOutput(BaseModel):
+    """Output schema for the News Summarizer Agent."""
+    summary_text: str = Field(..., description="Summarized text from a given article.")
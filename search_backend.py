@@ -0,0 +1,244 @@
+import asyncio
+import re
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import httpx
+
+from config import get_float, get_int, get_str
+
+
+# --- Configuration ---
+
+TAVILY_API_KEY = get_str("TAVILY_API_KEY")
+# Point this at a local fake search server to run without network access.
+TAVILY_BASE_URL = get_str("TAVILY_BASE_URL", "https://api.tavily.com")
+SEARCH_TIMEOUT_SECONDS = get_float("SEARCH_TIMEOUT_SECONDS", 30)
+SEARCH_MAX_RESULTS = get_int("SEARCH_MAX_RESULTS", 20)
+SEARCH_CACHE_TTL_SECONDS = get_float("SEARCH_CACHE_TTL_SECONDS", 300)
+SEARCH_CACHE_MAX_ENTRIES = get_int("SEARCH_CACHE_MAX_ENTRIES", 512)
+
+
+def normalize_query(query: str) -> str:
+    """Lower-case and collapse whitespace/punctuation so trivially different queries share a cache entry."""
+    query = re.sub(r"[^\w\s]", " ", query.lower())
+    return " ".join(query.split())
+
+
+class SearchBackend:
+    """A web search provider. Returns a Tavily-style response: {"results": [{"title", "url", "content", "score"}, ...]}."""
+
+    def search(self, query: str, max_results: int) -> dict:
+        raise NotImplementedError
+
+    async def asearch(self, query: str, max_results: int) -> dict:
+        """Async search. Backends without native async support run `search` in a thread."""
+        return await asyncio.to_thread(self.search, query, max_results)
+
+
+class TavilySearchBackend(SearchBackend):
+    """
+    Tavily search over one long-lived, connection-pooled HTTP client.
+
+    TavilyClient opens a new connection (and TLS handshake) for every request;
+    this keeps connections alive between searches instead.
+    """
+
+    def __init__(self, api_key: str = TAVILY_API_KEY, base_url: str = TAVILY_BASE_URL,
+                 timeout: float = SEARCH_TIMEOUT_SECONDS, max_connections: int = 20):
+        if not api_key:
+            raise ValueError("TAVILY_API_KEY must be set in the .env file.")
+        self._client_options = {
+            "base_url": base_url,
+            "timeout": timeout,
+            "headers": {
+                "Content-Type": "application/json",
+                "Authorization": f"Bearer {api_key}",
+            },
+            "limits": httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        }
+        self._client = httpx.Client(**self._client_options)
+        # Async connections are tied to the event loop that opened them.
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def search(self, query: str, max_results: int) -> dict:
+        response = self._client.post("/search", json={"query": query, "max_results": max_results})
+        response.raise_for_status()
+        return response.json()
+
+    async def asearch(self, query: str, max_results: int) -> dict:
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = self._async_clients[loop] = httpx.AsyncClient(**self._client_options)
+        response = await client.post("/search", json={"query": query, "max_results": max_results})
+        response.raise_for_status()
+        return response.json()
+
+    def close(self) -> None:
+        self._client.close()
+
+
+class _LeaderCancelled(Exception):
+    """The shared call was cancelled by its own caller; the callers waiting on it retry."""
+
+
+class CachedSearch:
+    """
+    TTL cache and request coalescing in front of a SearchBackend.
+
+    Results are cached by normalized query for `ttl` seconds. While a query is
+    in flight, identical concurrent queries wait for that call instead of
+    issuing their own.
+    """
+
+    def __init__(self, backend: SearchBackend, ttl: float = SEARCH_CACHE_TTL_SECONDS,
+                 max_entries: int = SEARCH_CACHE_MAX_ENTRIES):
+        self.backend = backend
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._cache: "OrderedDict[tuple, tuple[float, dict]]" = OrderedDict()
+        self._in_flight: dict[tuple, Future] = {}
+        self._async_in_flight: dict[tuple, asyncio.Future] = {}
+        self._lock = threading.Lock()
+
+    def _cached(self, key: tuple):
+        """Return a fresh cached response and count the hit. Call with the lock held."""
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return cached[1]
+        return None
+
+    def search(self, query: str, max_results: int = SEARCH_MAX_RESULTS) -> dict:
+        key = (normalize_query(query), max_results)
+        with self._lock:
+            cached = self._cached(key)
+            if cached is not None:
+                return cached
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._in_flight[key] = future
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            response = self.backend.search(query, max_results)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+        self._store(key, response)
+        future.set_result(response)
+        return response
+
+    async def asearch(self, query: str, max_results: int = SEARCH_MAX_RESULTS) -> dict:
+        """Async variant of `search`; coalesces identical queries within the running event loop."""
+        key = (normalize_query(query), max_results)
+        loop = asyncio.get_running_loop()
+        flight_key = (id(loop), key)
+        with self._lock:
+            cached = self._cached(key)
+            if cached is not None:
+                return cached
+            future = self._async_in_flight.get(flight_key)
+            leader = future is None
+            if leader:
+                future = loop.create_future()
+                self._async_in_flight[flight_key] = future
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            # shield() so one waiter being cancelled doesn't cancel the shared call.
+            try:
+                return await asyncio.shield(future)
+            except _LeaderCancelled:
+                # The leader's caller gave up (e.g. a per-query timeout); that says nothing
+                # about this caller, which makes the call itself (or joins a new leader).
+                return await self.asearch(query, max_results)
+
+        try:
+            response = await self.backend.asearch(query, max_results)
+        except asyncio.CancelledError:
+            # Never cancel the shared future: waiters from other requests weren't cancelled.
+            future.set_exception(_LeaderCancelled())
+            future.exception()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting for it.
+            future.exception()
+            raise
+        finally:
+            with self._lock:
+                self._async_in_flight.pop(flight_key, None)
+
+        self._store(key, response)
+        future.set_result(response)
+        return response
+
+    def _store(self, key: tuple, response: dict) -> None:
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._cache[key] = (time.monotonic() + self.ttl, response)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "entries": len(self._cache),
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "hit_rate": round((self.hits + self.coalesced) / lookups, 4) if lookups else None,
+            }
+
+
+_search = None
+_search_lock = threading.Lock()
+
+
+def get_search() -> CachedSearch:
+    """Return the process-wide cached search, creating the Tavily backend on first use."""
+    global _search
+    if _search is None:
+        with _search_lock:
+            if _search is None:
+                _search = CachedSearch(TavilySearchBackend())
+    return _search
+
+
+def set_search_backend(backend: SearchBackend) -> CachedSearch:
+    """Swap in another backend (e.g. a fake for tests) with a fresh cache."""
+    global _search
+    with _search_lock:
+        _search = CachedSearch(backend)
+    return _search
@@ -0,0 +1,131 @@
+"""
+Fan-out news search.
+
+One topic is expanded locally into a few sub-queries (a synonym, a time
+qualifier, regional variants). They are searched concurrently, each under its
+own timeout and the shared search concurrency limit, and the results are
+merged and deduplicated by URL. A single tool call covers what the agent
+used to reach by calling search_tavily several times in a row.
+"""
+import asyncio
+
+import logfire
+
+from config import get_float, get_int, get_json
+from hybrid_retrieval import STOPWORDS, tokenize
+from metrics import timed
+from search_backend import SEARCH_MAX_RESULTS, get_search, normalize_query
+from tool_runtime import tool_limit
+from trending_ingest import FEED_QUERY_WORDS, normalize_url
+
+
+# --- Configuration ---
+
+# Sub-queries per topic, including the topic itself; 1 searches the topic alone.
+SEARCH_FANOUT_QUERIES = get_int("SEARCH_FANOUT_QUERIES", 4)
+# Results per sub-query (a lone query still gets SEARCH_MAX_RESULTS).
+SEARCH_FANOUT_RESULTS = get_int("SEARCH_FANOUT_RESULTS", 10)
+# A sub-query slower than this is dropped; the others are still returned.
+SEARCH_FANOUT_TIMEOUT_SECONDS = get_float("SEARCH_FANOUT_TIMEOUT_SECONDS", 8)
+SEARCH_FANOUT_REGIONS = get_json("SEARCH_FANOUT_REGIONS", ["US", "Europe", "Asia"])
+
+TIME_QUALIFIERS = ["today", "this week"]
+SYNONYMS = {
+    "ai": "artificial intelligence",
+    "artificial intelligence": "ai",
+    "tech": "technology",
+    "technology": "tech industry",
+    "economy": "markets",
+    "business": "markets",
+    "politics": "government",
+    "election": "polls",
+    "elections": "polls",
+    "climate": "climate change",
+    "crypto": "cryptocurrency",
+    "stocks": "stock market",
+    "sports": "sport results",
+    "health": "medicine",
+}
+
+
+def expand_query(query: str, limit: int = SEARCH_FANOUT_QUERIES) -> list[str]:
+    """
+    Sub-queries for a topic, most specific first: the topic itself, a synonym,
+    time qualifiers, then regional variants (skipped when the topic names a
+    place already). Near-identical variants are dropped.
+    """
+    words = [word for word in query.split() if word.lower().strip("?!.,:;\"'") not in FEED_QUERY_WORDS]
+    # "What's trending in AI today?" -> "AI"
+    while words and words[0].lower() in STOPWORDS:
+        words.pop(0)
+    topic = " ".join(words).strip("?!.,:;") or query
+    topic_terms = set(tokenize(topic))
+    candidates = [query]
+
+    lowered = normalize_query(topic)
+    for term, synonym in SYNONYMS.items():
+        if f" {term} " in f" {lowered} ":
+            candidates.append(f" {lowered} ".replace(f" {term} ", f" {synonym} ").strip() + " news")
+            break
+    candidates += [f"{topic} news {qualifier}" for qualifier in TIME_QUALIFIERS]
+    if not topic_terms & {region.lower() for region in SEARCH_FANOUT_REGIONS}:
+        candidates += [f"{topic} news {region}" for region in SEARCH_FANOUT_REGIONS]
+
+    queries, seen = [], set()
+    for candidate in candidates:
+        key = normalize_query(candidate)
+        if key not in seen:
+            seen.add(key)
+            queries.append(candidate)
+    return queries[:limit]
+
+
+def merge_results(responses: list[dict]) -> list[dict]:
+    """Deduplicate results by normalized URL, keeping the best score and counting the sub-queries that found each."""
+    merged = {}
+    for response in responses:
+        for result in response.get("results", []):
+            if not result.get("url"):
+                continue
+            key = normalize_url(result["url"])
+            if key in merged:
+                merged[key]["score"] = max(merged[key].get("score") or 0.0, result.get("score") or 0.0)
+                merged[key]["queries"] += 1
+            else:
+                merged[key] = {**result, "queries": 1}
+    return list(merged.values())
+
+
+async def _search_one(query: str, max_results: int, timeout: float) -> dict:
+    async with tool_limit("search"):
+        with timed("search", "sub_query"):
+            return await asyncio.wait_for(get_search().asearch(query, max_results=max_results), timeout=timeout)
+
+
+async def fan_out_search(query: str, max_queries: int = SEARCH_FANOUT_QUERIES,
+                         max_results: int = None,
+                         timeout: float = SEARCH_FANOUT_TIMEOUT_SECONDS) -> dict:
+    """
+    Search a topic's sub-queries concurrently and return one Tavily-style
+    response with the merged results. Fails only if every sub-query fails.
+    """
+    queries = expand_query(query, max_queries)
+    if max_results is None:
+        max_results = SEARCH_FANOUT_RESULTS if len(queries) > 1 else SEARCH_MAX_RESULTS
+    with logfire.span("fan_out_search {query}", query=query, sub_queries=queries):
+        outcomes = await asyncio.gather(*(_search_one(q, max_results, timeout) for q in queries),
+                                        return_exceptions=True)
+        responses, errors = [], []
+        for sub_query, outcome in zip(queries, outcomes):
+            if isinstance(outcome, BaseException):
+                errors.append(outcome)
+                logfire.warn("Sub-query {sub_query} failed: {error}", sub_query=sub_query,
+                             error=repr(outcome))
+            else:
+                responses.append(outcome)
+        if not responses:
+            raise errors[0]
+        results = merge_results(responses)
+        logfire.info("Fan-out search: {queries} sub-queries, {results} unique results",
+                     queries=len(responses), results=len(results))
+        return {"query": query, "sub_queries": queries, "results": results}
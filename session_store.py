@@ -0,0 +1,419 @@
+"""
+Conversation memory, one session per UserContext.user_id.
+
+Every answered turn is stored (in memory, or in SQLite with SESSION_STORE=sqlite
+so sessions survive restarts and are shared by API workers). The agent gets a
+bounded view of it: the latest turns verbatim within SESSION_HISTORY_TOKENS,
+each message clipped to SESSION_MESSAGE_TOKENS, preceded by a rolling summary
+of older turns (one line per turn, at most SESSION_SUMMARY_TOKENS). The summary
+is built from the stored text, so keeping it costs no LLM call.
+
+A session keeps at most SESSION_MAX_TURNS turns; older ones are folded into its
+summary and dropped. Sessions idle for SESSION_TTL_HOURS are deleted, and the
+in-memory store keeps at most SESSION_MAX_SESSIONS of them.
+
+    python session_store.py <session id>   # print a stored session and the history the agent would get
+"""
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+
+from chunked_summarizer import estimate_tokens
+from config import get_int, get_float, get_str
+from schemas import FactCheckOutput, SummarizeOutput, TrendingNews
+
+
+# --- Configuration ---
+
+SESSION_STORE = get_str("SESSION_STORE", "memory")
+SESSION_STORE_PATH = get_str("SESSION_STORE_PATH", os.path.join("data", "sessions.sqlite3"))
+# History given to the agent; 0 sends only the new message.
+SESSION_HISTORY_TOKENS = get_int("SESSION_HISTORY_TOKENS", 1500)
+SESSION_SUMMARY_TOKENS = get_int("SESSION_SUMMARY_TOKENS", 300)
+SESSION_MESSAGE_TOKENS = get_int("SESSION_MESSAGE_TOKENS", 400)
+SESSION_MAX_TURNS = get_int("SESSION_MAX_TURNS", 50)
+# Longer messages (pasted articles) are stored cut to this many characters.
+SESSION_MAX_MESSAGE_CHARS = get_int("SESSION_MAX_MESSAGE_CHARS", 20000)
+SESSION_MAX_SESSIONS = get_int("SESSION_MAX_SESSIONS", 1000)
+SESSION_TTL_HOURS = get_float("SESSION_TTL_HOURS", 24)
+
+# A short message matching one of these points back at an earlier answer
+# ("summarize the second one", "more on that"); anything else is a new question.
+_ORDINAL = (r"(first|second|third|fourth|fifth|sixth|seventh|eighth|ninth|tenth|last|previous|"
+            r"\d+(st|nd|rd|th))")
+_ITEM = r"(one|ones|story|stories|headline|headlines|article|articles|link|item|result|claim|source)"
+_PRONOUN = r"(it|that|this|these|those|them)"
+FOLLOW_UP_PATTERNS = [
+    re.compile(rf"\bthe {_ORDINAL} {_ITEM}\b"),
+    re.compile(rf"\b({_ORDINAL} {_ITEM}|number \d+|#\d+)( please)?\W*$"),
+    re.compile(rf"\b(more|details|expand|elaborate) (on|about) {_PRONOUN}\b"),
+    re.compile(rf"\b(summarize|summarise|explain|check|verify|fact[- ]check|expand on) {_PRONOUN}\W*$"),
+    re.compile(r"^(and )?(tell me )?more\W*$"),
+]
+FOLLOW_UP_MAX_WORDS = 25
+
+OUTPUT_TYPES = {"trending": TrendingNews, "fact_check": FactCheckOutput, "summary": SummarizeOutput}
+
+_PRUNE_INTERVAL_SECONDS = 600
+
+
+def is_follow_up(text: str) -> bool:
+    """True for a short message that refers to an earlier answer rather than asking something new."""
+    text = " ".join(text.lower().split())
+    if len(text.split(" ")) > FOLLOW_UP_MAX_WORDS:
+        return False
+    return any(pattern.search(text) for pattern in FOLLOW_UP_PATTERNS)
+
+
+# --- 1. Turns ---
+
+def answer_text(output) -> str:
+    """An agent's final output as plain text, numbered the way the UI shows it."""
+    if isinstance(output, TrendingNews):
+        lines = [f"{i}. {item.headline} ({item.source})" for i, item in enumerate(output.headlines, 1)]
+        return "\n".join([f"Trending news about {output.topic}:", *lines])
+    if isinstance(output, FactCheckOutput):
+        sources = f" Sources: {', '.join(output.result.sources)}" if output.result.sources else ""
+        return f"Fact check: {output.result.verdict}. {output.result.summary}{sources}"
+    if isinstance(output, SummarizeOutput):
+        return f"Summary: {output.summary_text}"
+    return str(output)
+
+
+def output_kind(output) -> str:
+    return next((kind for kind, model in OUTPUT_TYPES.items() if isinstance(output, model)), "text")
+
+
+@dataclass
+class Turn:
+    """One question and its answer."""
+    user_text: str
+    answer_text: str
+    output_kind: str = "text"
+    output_json: str = ""
+    asked_at: float = field(default_factory=time.time)
+    answered_at: float = field(default_factory=time.time)
+
+    @classmethod
+    def from_output(cls, user_text: str, output, asked_at: float = None) -> "Turn":
+        kind = output_kind(output)
+        return cls(
+            user_text=_cut(user_text, SESSION_MAX_MESSAGE_CHARS),
+            answer_text=_cut(answer_text(output), SESSION_MAX_MESSAGE_CHARS),
+            output_kind=kind,
+            output_json=output.model_dump_json() if kind != "text" else "",
+            asked_at=time.time() if asked_at is None else asked_at,
+        )
+
+    def output(self):
+        """The stored final output, as the agent's output model when it had one."""
+        model = OUTPUT_TYPES.get(self.output_kind)
+        return model.model_validate_json(self.output_json) if model and self.output_json else self.answer_text
+
+
+def _cut(text: str, max_chars: int) -> str:
+    return text if len(text) <= max_chars else text[:max_chars].rstrip() + " …"
+
+
+def clip_tokens(text: str, max_tokens: int) -> str:
+    """Keep roughly the first `max_tokens` tokens of a message."""
+    return _cut(text, max_tokens * 4)
+
+
+def _first_words(text: str, count: int) -> str:
+    words = " ".join(text.split()).split(" ")
+    return " ".join(words[:count]) + (" …" if len(words) > count else "")
+
+
+def digest(turn: Turn) -> str:
+    """One summary line for a turn: the question and the start of the answer."""
+    first_line = next((line for line in turn.answer_text.splitlines() if line.strip()), "")
+    return f"- {_first_words(turn.user_text, 20)} -> {_first_words(first_line, 30)}"
+
+
+def trim_summary(lines: list[str], max_tokens: int = SESSION_SUMMARY_TOKENS) -> list[str]:
+    """The newest summary lines that fit in `max_tokens`."""
+    kept, used = [], 0
+    for line in reversed(lines):
+        used += estimate_tokens(line)
+        if used > max_tokens:
+            break
+        kept.append(line)
+    return kept[::-1]
+
+
+def build_history(turns: list[Turn], summary: list[str], max_tokens: int = SESSION_HISTORY_TOKENS,
+                  summary_tokens: int = SESSION_SUMMARY_TOKENS,
+                  message_tokens: int = SESSION_MESSAGE_TOKENS) -> list[dict]:
+    """
+    Input items for the agent: a summary of older turns, then the newest turns
+    verbatim (clipped) for as long as they fit in `max_tokens`.
+    """
+    if max_tokens <= 0 or not (turns or summary):
+        return []
+    recent, used = [], 0
+    for turn in reversed(turns):
+        user, answer = clip_tokens(turn.user_text, message_tokens), clip_tokens(turn.answer_text, message_tokens)
+        used += estimate_tokens(user) + estimate_tokens(answer)
+        if used > max_tokens:
+            break
+        recent.append((user, answer))
+    older = turns[:len(turns) - len(recent)]
+    lines = trim_summary(summary + [digest(turn) for turn in older], summary_tokens)
+    items = []
+    if lines:
+        items.append({"role": "system", "content": "Earlier in this conversation:\n" + "\n".join(lines)})
+    for user, answer in reversed(recent):
+        items += [{"role": "user", "content": user}, {"role": "assistant", "content": answer}]
+    return items
+
+
+# --- 2. Stores ---
+
+class SessionStore:
+    """Per-session turns and rolling summary; subclasses keep them in memory or SQLite."""
+
+    def __init__(self, max_turns: int = SESSION_MAX_TURNS, ttl_hours: float = SESSION_TTL_HOURS):
+        self.max_turns = max_turns
+        self.ttl_seconds = ttl_hours * 3600
+
+    def add_turn(self, session_id: str, turn: Turn) -> None:
+        raise NotImplementedError
+
+    def turns(self, session_id: str, limit: int = None) -> list[Turn]:
+        """The session's stored turns, oldest first (only the newest `limit` when given)."""
+        raise NotImplementedError
+
+    def summary(self, session_id: str) -> list[str]:
+        raise NotImplementedError
+
+    def count(self, session_id: str) -> int:
+        raise NotImplementedError
+
+    def clear(self, session_id: str) -> None:
+        raise NotImplementedError
+
+    def history(self, session_id: str, max_tokens: int = SESSION_HISTORY_TOKENS) -> list[dict]:
+        """The token-budgeted history to put before the session's next message."""
+        if max_tokens <= 0:
+            return []
+        return build_history(self.turns(session_id), self.summary(session_id), max_tokens)
+
+
+class _MemorySession:
+    def __init__(self):
+        self.turns = deque()
+        self.summary = []
+        self.used_at = time.time()
+
+
+class MemorySessionStore(SessionStore):
+    """
+    Sessions in this process only. Reading or writing a session makes it the most
+    recently used; idle ones expire after the TTL and the least recently used go
+    first beyond `max_sessions`.
+    """
+
+    def __init__(self, max_sessions: int = SESSION_MAX_SESSIONS, **kwargs):
+        super().__init__(**kwargs)
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, _MemorySession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _drop_idle(self, now: float) -> None:
+        # Oldest first, since every use moves a session to the end.
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session.used_at > now - self.ttl_seconds and len(self._sessions) <= self.max_sessions:
+                break
+            del self._sessions[session_id]
+
+    def _use(self, session_id: str, create: bool = False):
+        """The live session (None if it doesn't exist or expired), marked as just used."""
+        now = time.time()
+        self._drop_idle(now)
+        session = self._sessions.get(session_id)
+        if session is None and create:
+            session = self._sessions[session_id] = _MemorySession()
+        if session is not None:
+            session.used_at = now
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def add_turn(self, session_id: str, turn: Turn) -> None:
+        with self._lock:
+            session = self._use(session_id, create=True)
+            session.turns.append(turn)
+            evicted = [session.turns.popleft() for _ in range(len(session.turns) - self.max_turns)]
+            if evicted:
+                session.summary = trim_summary(session.summary + [digest(old) for old in evicted])
+            self._drop_idle(session.used_at)
+
+    def turns(self, session_id: str, limit: int = None) -> list[Turn]:
+        with self._lock:
+            session = self._use(session_id)
+            turns = list(session.turns) if session else []
+        return turns[-limit:] if limit else turns
+
+    def summary(self, session_id: str) -> list[str]:
+        with self._lock:
+            session = self._use(session_id)
+            return list(session.summary) if session else []
+
+    def count(self, session_id: str) -> int:
+        with self._lock:
+            session = self._use(session_id)
+            return len(session.turns) if session else 0
+
+    def clear(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+
+class SQLiteSessionStore(SessionStore):
+    """Sessions in a SQLite file (WAL mode), shared by every process that opens it."""
+
+    def __init__(self, path: str = SESSION_STORE_PATH, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self._lock = threading.Lock()
+        self._pruned_at = 0.0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " session_id TEXT PRIMARY KEY, summary TEXT NOT NULL DEFAULT '', updated_at REAL NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS turns ("
+            " session_id TEXT NOT NULL, seq INTEGER NOT NULL, user_text TEXT NOT NULL, answer_text TEXT NOT NULL,"
+            " output_kind TEXT NOT NULL, output_json TEXT NOT NULL, asked_at REAL NOT NULL, answered_at REAL NOT NULL,"
+            " PRIMARY KEY (session_id, seq)"
+            ") WITHOUT ROWID"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at)")
+        self._db.commit()
+
+    def _live(self, session_id: str) -> bool:
+        """Whether the session exists and was used within the TTL (expired ones await _prune)."""
+        row = self._db.execute("SELECT updated_at FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return row is not None and row[0] >= time.time() - self.ttl_seconds
+
+    def _summary(self, session_id: str) -> list[str]:
+        row = self._db.execute("SELECT summary FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return row[0].splitlines() if row and row[0] else []
+
+    def _delete(self, session_id: str) -> None:
+        self._db.execute("DELETE FROM turns WHERE session_id = ?", (session_id,))
+        self._db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def _prune(self, now: float) -> None:
+        if now - self._pruned_at < _PRUNE_INTERVAL_SECONDS:
+            return
+        self._pruned_at = now
+        cutoff = now - self.ttl_seconds
+        self._db.execute(
+            "DELETE FROM turns WHERE session_id IN (SELECT session_id FROM sessions WHERE updated_at < ?)", (cutoff,)
+        )
+        self._db.execute("DELETE FROM sessions WHERE updated_at < ?", (cutoff,))
+
+    def add_turn(self, session_id: str, turn: Turn) -> None:
+        now = time.time()
+        with self._lock:
+            if not self._live(session_id):
+                # An expired session starts over instead of coming back to life.
+                self._delete(session_id)
+            seq = self._db.execute(
+                "SELECT COALESCE(MAX(seq), 0) + 1 FROM turns WHERE session_id = ?", (session_id,)
+            ).fetchone()[0]
+            self._db.execute(
+                "INSERT INTO turns VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (session_id, seq, turn.user_text, turn.answer_text, turn.output_kind, turn.output_json,
+                 turn.asked_at, turn.answered_at),
+            )
+            summary = self._summary(session_id)
+            cutoff = seq - self.max_turns
+            evicted = self._db.execute(
+                "SELECT user_text, answer_text FROM turns WHERE session_id = ? AND seq <= ? ORDER BY seq",
+                (session_id, cutoff),
+            ).fetchall()
+            if evicted:
+                summary = trim_summary(summary + [digest(Turn(user, answer)) for user, answer in evicted])
+                self._db.execute("DELETE FROM turns WHERE session_id = ? AND seq <= ?", (session_id, cutoff))
+            self._db.execute(
+                "INSERT INTO sessions (session_id, summary, updated_at) VALUES (?, ?, ?)"
+                " ON CONFLICT (session_id) DO UPDATE SET summary = excluded.summary, updated_at = excluded.updated_at",
+                (session_id, "\n".join(summary), now),
+            )
+            self._prune(now)
+            self._db.commit()
+
+    def turns(self, session_id: str, limit: int = None) -> list[Turn]:
+        with self._lock:
+            if not self._live(session_id):
+                return []
+            rows = self._db.execute(
+                "SELECT user_text, answer_text, output_kind, output_json, asked_at, answered_at FROM turns"
+                " WHERE session_id = ? ORDER BY seq DESC LIMIT ?",
+                (session_id, limit or -1),
+            ).fetchall()
+        return [Turn(*row) for row in reversed(rows)]
+
+    def summary(self, session_id: str) -> list[str]:
+        with self._lock:
+            return self._summary(session_id) if self._live(session_id) else []
+
+    def count(self, session_id: str) -> int:
+        with self._lock:
+            if not self._live(session_id):
+                return 0
+            return self._db.execute("SELECT COUNT(*) FROM turns WHERE session_id = ?", (session_id,)).fetchone()[0]
+
+    def clear(self, session_id: str) -> None:
+        with self._lock:
+            self._delete(session_id)
+            self._db.commit()
+
+
+# --- 3. Process-wide store ---
+
+_store = None
+_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    """The process-wide session store (SESSION_STORE=memory or sqlite)."""
+    global _store
+    if _store is None:
+        with _lock:
+            if _store is None:
+                if SESSION_STORE == "sqlite":
+                    _store = SQLiteSessionStore()
+                elif SESSION_STORE == "memory":
+                    _store = MemorySessionStore()
+                else:
+                    raise ValueError(f"Unknown SESSION_STORE {SESSION_STORE!r}; use 'memory' or 'sqlite'.")
+    return _store
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show a stored conversation and the history its next message gets.")
+    parser.add_argument("session_id", help="The UserContext.user_id of the session.")
+    parser.add_argument("--path", default=SESSION_STORE_PATH, help="SQLite session store to read.")
+    args = parser.parse_args()
+
+    store = SQLiteSessionStore(args.path)
+    turns = store.turns(args.session_id)
+    print(f"💬 {len(turns)} stored turns, {len(store.summary(args.session_id))} summary lines")
+    history = store.history(args.session_id)
+    print(f"🧠 History for the next message (~{sum(estimate_tokens(item['content']) for item in history)} tokens):")
+    print(json.dumps(history, indent=2, ensure_ascii=False))
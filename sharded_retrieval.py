@@ -0,0 +1,325 @@
+"""
+Sharded fact-check index with metadata pre-filtering.
+
+With FACT_CHECK_SHARD_BY set (e.g. "topic" or "topic,year"),
+ingest_knowledge_base.py writes each claim to one collection per shard key
+(knowledge_base__ai, knowledge_base__climate__2024, ...), each with its own
+HNSW and BM25 index, and lists the shards in a manifest next to the ChromaDB
+files. For every claim the fact checker then:
+
+  1. embeds the claim once and infers metadata from it: the shard values it
+     names (a topic, a region, a year) and the years it mentions ("in 2023",
+     "last year");
+  2. picks the shards it names plus the FACT_CHECK_SHARD_FANOUT nearest others
+     by centroid similarity, leaving out shards without records of those years
+     (unless no shard has any);
+  3. queries them in parallel, filtered to those years where every record is
+     dated, and
+  4. merges their candidates into one top-k.
+
+Per-claim cost then grows with the shard size and the fan-out rather than
+the corpus size. Without a manifest the single collection is used as before.
+"""
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import logfire
+import numpy as np
+
+from config import get_int, get_str
+from fact_check_service import CHROMA_PATH, COLLECTION_NAME, FactCheckRetriever, LatencyTracker, get_retriever
+from hybrid_retrieval import FACT_CHECK_HYBRID, FACT_CHECK_TOP_K, HybridRetriever, passes_thresholds, thresholds_for, tokenize
+
+
+# --- Configuration ---
+
+# Metadata fields to shard by at ingestion, comma-separated ("year" is read from "date" when missing).
+FACT_CHECK_SHARD_BY = [field.strip() for field in get_str("FACT_CHECK_SHARD_BY", "").split(",") if field.strip()]
+# Shards a claim is checked against besides the ones it names, nearest first.
+FACT_CHECK_SHARD_FANOUT = get_int("FACT_CHECK_SHARD_FANOUT", 3)
+FACT_CHECK_SHARD_WORKERS = get_int("FACT_CHECK_SHARD_WORKERS", 4)
+
+# Shard value of records that lack the field; such shards match any claim.
+OTHER = "other"
+_YEAR = re.compile(r"\b(19\d{2}|20\d{2})\b")
+
+
+# --- 1. Shard keys and the manifest ---
+
+def record_year(metadata: dict):
+    """A record's year: its `year` field, or the year of its `date`, or None."""
+    year = metadata.get("year")
+    if isinstance(year, (int, float)) and not isinstance(year, bool):
+        return int(year)
+    match = _YEAR.match(str(year if year is not None else metadata.get("date") or ""))
+    return int(match.group()) if match else None
+
+
+def shard_values(metadata: dict, shard_by: list[str]) -> dict[str, str]:
+    values = {}
+    for field in shard_by:
+        value = record_year(metadata) if field == "year" else metadata.get(field)
+        values[field] = OTHER if value is None or str(value).strip() == "" else str(value).strip()
+    return values
+
+
+def shard_name(collection_name: str, values: dict[str, str]) -> str:
+    """A valid ChromaDB collection name (3-63 characters) for a shard."""
+    slugs = [re.sub(r"[^a-z0-9]+", "-", value.lower()).strip("-") or "x" for value in values.values()]
+    name = "__".join([collection_name, *slugs])
+    if len(name) > 63:
+        name = f"{name[:54].rstrip('-_')}-{zlib.crc32(name.encode('utf-8')):08x}"
+    return name
+
+
+def manifest_path(path: str = CHROMA_PATH, collection_name: str = COLLECTION_NAME) -> str:
+    return os.path.join(path, f"shards_{collection_name}.json")
+
+
+def load_manifest(path: str = CHROMA_PATH, collection_name: str = COLLECTION_NAME):
+    """The shard manifest of a collection, or None when it isn't sharded."""
+    manifest_file = manifest_path(path, collection_name)
+    if not os.path.exists(manifest_file):
+        return None
+    with open(manifest_file, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(manifest: dict, path: str = CHROMA_PATH, collection_name: str = COLLECTION_NAME) -> None:
+    manifest_file = manifest_path(path, collection_name)
+    tmp_path = manifest_file + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, manifest_file)
+
+
+def describe_shard(collection, page_size: int = 5000) -> dict:
+    """Record count, dated record count, years present and normalized centroid of one shard collection."""
+    total = None
+    count = dated = 0
+    years = set()
+    while True:
+        page = collection.get(limit=page_size, offset=count, include=["embeddings", "metadatas"])
+        if not page["ids"]:
+            break
+        vectors = np.asarray(page["embeddings"], dtype=np.float32)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        total = vectors.sum(axis=0) if total is None else total + vectors.sum(axis=0)
+        count += len(page["ids"])
+        # Only a stored integer `year` can be filtered on in ChromaDB.
+        page_years = [(metadata or {}).get("year") for metadata in page["metadatas"]]
+        page_years = [year for year in page_years if isinstance(year, int)]
+        dated += len(page_years)
+        years.update(page_years)
+    centroid = [] if total is None else (total / max(float(np.linalg.norm(total)), 1e-12)).round(6).tolist()
+    return {"count": count, "dated": dated, "years": sorted(years), "centroid": centroid}
+
+
+# --- 2. Metadata inferred from the claim ---
+
+def claim_years(claim: str, today: date = None) -> set[int]:
+    """Years a claim is about: explicit years plus "this year" / "last year"."""
+    years = {int(year) for year in _YEAR.findall(claim)}
+    lowered = claim.lower()
+    current = (today or date.today()).year
+    if "this year" in lowered:
+        years.add(current)
+    if "last year" in lowered:
+        years.add(current - 1)
+    return years
+
+
+# --- 3. Sharded retrieval ---
+
+class ShardedRetriever:
+    """
+    Fact-check retrieval over the shards listed in a manifest.
+
+    Each shard is plain vector search (or a HybridRetriever with
+    FACT_CHECK_HYBRID=1) created on first use, sharing the base retriever's
+    embedding function. Candidates from all queried shards are merged by score
+    and judged with the base collection's thresholds.
+    """
+
+    def __init__(self, manifest: dict, base: FactCheckRetriever, top_k: int = FACT_CHECK_TOP_K,
+                 fanout: int = FACT_CHECK_SHARD_FANOUT, hybrid: bool = FACT_CHECK_HYBRID,
+                 workers: int = FACT_CHECK_SHARD_WORKERS):
+        self.base = base
+        self.shard_by = manifest["shard_by"]
+        self.shards = {name: shard for name, shard in sorted(manifest["shards"].items()) if shard["count"]}
+        self.names = list(self.shards)
+        self.top_k = top_k
+        self.fanout = fanout
+        self.hybrid = hybrid
+        self.thresholds = thresholds_for(base.collection_name)
+        self.query_latency = LatencyTracker()
+        self.claims_checked = 0
+        self.shard_queries = 0
+        self._centroids = np.asarray([self.shards[name]["centroid"] for name in self.names], dtype=np.float32)
+        self._years = {year for shard in self.shards.values() for year in shard.get("years", ())}
+        # Words of the shard values a claim has to contain to name the shard ("AI" -> {"ai"}).
+        self._terms = {
+            name: {term for field, value in self.shards[name]["values"].items()
+                   if field != "year" and value != OTHER for term in tokenize(value)}
+            for name in self.names
+        }
+        self._retrievers: dict[str, HybridRetriever] = {}
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fact-check-shard")
+        self._lock = threading.Lock()
+
+    def _retriever(self, name: str) -> HybridRetriever:
+        retriever = self._retrievers.get(name)
+        if retriever is None:
+            with self._lock:
+                retriever = self._retrievers.get(name)
+                if retriever is None:
+                    shard = FactCheckRetriever(path=self.base.path, collection_name=name,
+                                               model_name=self.base.model_name,
+                                               embedding_function=self.base.embedding_function)
+                    retriever = self._retrievers[name] = HybridRetriever(shard, self.top_k,
+                                                                         thresholds=self.thresholds)
+        return retriever
+
+    def route(self, claim: str, similarity: np.ndarray) -> list[tuple[str, tuple]]:
+        """(shard, years to filter on) pairs for a claim, the shards it names first."""
+        terms = set(tokenize(claim))
+        # Years nothing in the index is dated with (or numbers that only look like years) don't filter.
+        years = claim_years(claim) & self._years
+        eligible = [i for i, name in enumerate(self.names) if not years or self._has_years(name, years)]
+        named = [i for i in eligible if self._terms[self.names[i]] and self._terms[self.names[i]] <= terms]
+        nearest = sorted((i for i in eligible if i not in named), key=lambda i: -similarity[i])
+        chosen = named + nearest[:self.fanout]
+
+        routes = []
+        for i in chosen:
+            shard = self.shards[self.names[i]]
+            # Filter inside a shard only when every record in it carries a year.
+            filter_years = tuple(sorted(years)) if years and shard["dated"] == shard["count"] else ()
+            routes.append((self.names[i], filter_years))
+        return routes
+
+    def _has_years(self, name: str, years: set[int]) -> bool:
+        """Whether a shard may hold records of these years (undated records may be of any year)."""
+        shard = self.shards[name]
+        return shard["dated"] < shard["count"] or bool(years & set(shard.get("years", ())))
+
+    def _query_shard(self, name: str, claims: list[str], embeddings: np.ndarray, years: tuple) -> list[list[dict]]:
+        where = {"year": {"$in": list(years)}} if years else None
+        retriever = self._retriever(name)
+        if self.hybrid:
+            return retriever.candidates_batch(claims, embeddings=embeddings, where=where)
+        results = retriever.retriever.collection.query(query_embeddings=embeddings.tolist(), n_results=self.top_k,
+                                                       where=where)
+        return [
+            [{"id": record_id, "document": document, "metadata": metadata, "distance": distance,
+              "coverage": 0.0, "score": 1 - distance}
+             for record_id, document, metadata, distance in zip(
+                 results["ids"][i], results["documents"][i], results["metadatas"][i], results["distances"][i])]
+            for i in range(len(claims))
+        ]
+
+    def candidates_batch(self, claims: list[str]) -> list[list[dict]]:
+        """Merged top-k candidates per claim across the shards each claim is routed to."""
+        start = time.perf_counter()
+        try:
+            embeddings = np.asarray(self.base.embedding_function(claims), dtype=np.float32)
+            queries = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+            similarity = queries @ self._centroids.T if len(self.names) else np.zeros((len(claims), 0))
+
+            # Claims routed to the same shard with the same filter share one query.
+            groups: dict[tuple[str, tuple], list[int]] = {}
+            for i, claim in enumerate(claims):
+                for route in self.route(claim, similarity[i]):
+                    groups.setdefault(route, []).append(i)
+            futures = {
+                route: self._executor.submit(self._query_shard, route[0], [claims[i] for i in members],
+                                             embeddings[members], route[1])
+                for route, members in groups.items()
+            }
+
+            merged = [[] for _ in claims]
+            for route, future in futures.items():
+                for i, candidates in zip(groups[route], future.result()):
+                    merged[i] += [{**candidate, "shard": route[0]} for candidate in candidates]
+            for candidates in merged:
+                candidates.sort(key=lambda candidate: candidate["score"], reverse=True)
+                del candidates[self.top_k:]
+            self.claims_checked += len(claims)
+            self.shard_queries += sum(len(members) for members in groups.values())
+            return merged
+        finally:
+            self.query_latency.record(time.perf_counter() - start)
+
+    def is_match(self, candidate: dict) -> bool:
+        if self.hybrid:
+            return passes_thresholds(candidate, self.thresholds)
+        return candidate["distance"] < self.thresholds["max_distance"]
+
+    def best_matches(self, claims: list[str]) -> list:
+        """The metadata of the best matching knowledge base entry per claim, or None."""
+        matches = []
+        for candidates in self.candidates_batch(claims):
+            match = next((candidate for candidate in candidates if self.is_match(candidate)), None)
+            matches.append(None if match is None else match["metadata"])
+        return matches
+
+    def warm_up(self, background: bool = False):
+        """Load the embedding model and run one routed query, so the nearest shards are open."""
+        if background:
+            thread = threading.Thread(target=self.warm_up, name="sharded-warmup", daemon=True)
+            thread.start()
+            return thread
+        self.base.warm_up()
+        try:
+            self.candidates_batch(["warm up"])
+        except Exception as e:
+            logfire.warn("Sharded fact-check warm-up failed: {error}", error=str(e))
+        return None
+
+    def stats(self) -> dict:
+        return {
+            "shards": len(self.names),
+            "shards_open": len(self._retrievers),
+            "shard_by": self.shard_by,
+            "shards_per_claim": round(self.shard_queries / self.claims_checked, 2) if self.claims_checked else None,
+            "query_latency": self.query_latency.snapshot(),
+        }
+
+
+_sharded_retriever = None
+_sharded_checked = False
+_sharded_lock = threading.Lock()
+
+
+def get_sharded_retriever():
+    """The process-wide ShardedRetriever, or None when the knowledge base has no shard manifest."""
+    global _sharded_retriever, _sharded_checked
+    if not _sharded_checked:
+        with _sharded_lock:
+            if not _sharded_checked:
+                manifest = load_manifest()
+                if manifest is not None:
+                    _sharded_retriever = ShardedRetriever(manifest, get_retriever())
+                _sharded_checked = True
+    return _sharded_retriever
+
+
+if __name__ == "__main__":
+    import sys
+
+    retriever = get_sharded_retriever()
+    if retriever is None:
+        print(f"ℹ️  No shard manifest at {manifest_path()}; run ingest_knowledge_base.py with --shard-by")
+        sys.exit(1)
+    for name in retriever.names:
+        print(f"🗂️  {name}: {retriever.shards[name]['count']} claims {retriever.shards[name]['values']}")
+    for claim in sys.argv[1:] or ["Is OpenAI partnering with Apple?"]:
+        for candidate in retriever.candidates_batch([claim])[0][:3]:
+            print(f"{claim} -> [{candidate['shard']}] {candidate['document']} ({candidate['distance']:.3f})")
+    print(json.dumps(retriever.stats(), indent=2))
@@ -0,0 +1,108 @@
+"""
+Startup import profile.
+
+Imports each entry point in a fresh interpreter with `python -X importtime`
+and reports where the time goes: this project's modules versus the
+third-party packages they pull in.
+
+    python startup_profile.py                       # controller, API server, fact checker
+    python startup_profile.py api_server --top 15
+    python startup_profile.py controller_run --json > startup.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+
+# --- Configuration ---
+
+DEFAULT_MODULES = ["controller_run", "api_server", "rag_fact_check"]
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def project_modules() -> set[str]:
+    return {name[:-3] for name in os.listdir(PROJECT_DIR) if name.endswith(".py")}
+
+
+def parse_importtime(stderr: str) -> list[tuple[str, int, int]]:
+    """(module, self µs, cumulative µs) for each line of -X importtime output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+            rows.append((name.strip(), int(self_us), int(cumulative_us)))
+        except ValueError:
+            continue
+    return rows
+
+
+def profile_module(module: str, top: int = 10) -> dict:
+    """Import `module` in a fresh interpreter and summarise its import cost."""
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_DIR, capture_output=True, text=True,
+    )
+    wall_seconds = time.perf_counter() - start
+    if completed.returncode != 0:
+        error = completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "unknown error"
+        return {"module": module, "error": error}
+
+    rows = parse_importtime(completed.stderr)
+    local = project_modules()
+    project = {}
+    packages = defaultdict(int)
+    for name, self_us, cumulative_us in rows:
+        top_level = name.split(".")[0]
+        if top_level in local:
+            project[name] = cumulative_us
+        else:
+            # Self time, so nested imports aren't counted twice.
+            packages[top_level] += self_us
+
+    return {
+        "module": module,
+        "wall_seconds": round(wall_seconds, 3),
+        "import_seconds": round(sum(self_us for _, self_us, _ in rows) / 1e6, 3),
+        "modules_imported": len(rows),
+        "project_modules_ms": {name: round(us / 1000, 1)
+                               for name, us in sorted(project.items(), key=lambda item: -item[1])},
+        "top_packages_ms": {name: round(us / 1000, 1)
+                            for name, us in sorted(packages.items(), key=lambda item: -item[1])[:top]},
+    }
+
+
+def print_report(report: dict) -> None:
+    print("\n" + "=" * 50)
+    if "error" in report:
+        print(f"❌ {report['module']}: {report['error']}")
+        return
+    print(f"⏱️  import {report['module']}: {report['import_seconds']:.3f}s in imports, "
+          f"{report['wall_seconds']:.3f}s wall ({report['modules_imported']} modules)")
+    print("  Project modules (cumulative):")
+    for name, ms in report["project_modules_ms"].items():
+        print(f"    {name:<28} {ms:>8.1f} ms")
+    print("  Heaviest third-party packages (self):")
+    for name, ms in report["top_packages_ms"].items():
+        print(f"    {name:<28} {ms:>8.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Profile the import cost of NewsSense entry points.")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--top", type=int, default=10, help="Third-party packages to list per module.")
+    parser.add_argument("--json", action="store_true", help="Print the reports as JSON.")
+    args = parser.parse_args()
+
+    reports = [profile_module(module, args.top) for module in args.modules]
+    if args.json:
+        print(json.dumps(reports, indent=2))
+    else:
+        for report in reports:
+            print_report(report)
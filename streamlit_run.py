@@ -1,30 +1,22 @@
-from agents import Runner, set_tracing_disabled
-from dotenv import load_dotenv
-import logfire
 import streamlit as st
-import asyncio
 import uuid
 import json
 from datetime import datetime
 from typing import List, Dict, Any
-import os
-from controller_run import conversation_agent, UserContext
+from config import get_bool, get_int
+from controller_run import preview_text, run_conversation, stream_conversation, UserContext
+from runtime import configure_observability, get_runtime
+from session_store import get_session_store
 
-# Load environment variables
-load_dotenv()
+STREAMING_ENABLED = get_bool("STREAMING_ENABLED", True)
+# Turns drawn on each rerun; older ones appear with "Show earlier messages".
+SESSION_VISIBLE_TURNS = get_int("SESSION_VISIBLE_TURNS", 10)
 
-BASE_URL = os.getenv("BASE_URL") 
-API_KEY = os.getenv("API_KEY") 
-MODEL_NAME = os.getenv("MODEL_NAME") 
-LOGFIRE_TOKEN = os.getenv("LOGFIRE_TOKEN") 
+# Streamlit re-executes this script on every interaction; these only run once per process.
+configure_observability()
 
-logfire.configure(
-    send_to_logfire=True, # Set to True to send to the Logfire service
-    token=LOGFIRE_TOKEN,  # Your Logfire token
-)
-
-logfire.instrument_openai_agents()
-set_tracing_disabled(disabled=False)
+# One long-lived event loop and pre-warmed clients shared by all sessions.
+runtime = get_runtime()
 
 # Page configuration
 st.set_page_config(
@@ -78,9 +70,15 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Initialize session state
-if "chat_history" not in st.session_state:
-    st.session_state.chat_history = []
+# The conversation itself lives in the session store (bounded, keyed by user_id);
+# session state only keeps how much of it is shown.
+sessions = get_session_store()
+
+if "visible_turns" not in st.session_state:
+    st.session_state.visible_turns = SESSION_VISIBLE_TURNS
+
+if "last_error" not in st.session_state:
+    st.session_state.last_error = None
 
 if "thread_id" not in st.session_state:
     st.session_state.thread_id = str(uuid.uuid4())
@@ -90,17 +88,44 @@ if "user_context" not in st.session_state:
         user_id=str(uuid.uuid4())
     )
 
-# Display chat messages
-for message in st.session_state.chat_history:
+with st.sidebar:
+    stream_responses = st.toggle("Stream responses", value=STREAMING_ENABLED,
+                                 help="Show routing, tool progress and output as it is generated.")
+    if st.button("New conversation"):
+        sessions.clear(st.session_state.user_context.user_id)
+        st.session_state.visible_turns = SESSION_VISIBLE_TURNS
+        st.session_state.last_error = None
+        st.rerun()
+
+def format_agent_response(output):
+    """Format the agent's response for display"""
+    if isinstance(output, str):
+        return output
+    elif hasattr(output, "headlines"):  # For TrendingNews
+        response = ""
+        i=0
+        for item in output.headlines:
+            i += 1
+            response += f"<p><b>{i}:</b> {item.headline}</p>"
+            response += f"<p><i>Source:</i> <a href='{item.source}' target='_blank'>{item.source}</a></p><br>"
+        return response
+    elif hasattr(output, "result"):  # For fact check
+        return output.result.summary
+    elif hasattr(output, "summary_text"):  # For article summary
+        return output.summary_text
+    return "Sorry, I can't assist with that."
+
+def render_message(role: str, content: str, timestamp: str):
+    """Draw one chat message"""
     with st.container():
-        if message["role"] == "user":
+        if role == "user":
             st.markdown(f"""
             <div class="chat-message user">
                 <div class="content">
                     <img src="https://api.dicebear.com/7.x/avataaars/svg?seed={st.session_state.user_context.user_id}" class="avatar" />
                     <div class="message">
-                        {message["content"]}
-                        <div class="timestamp">{message["timestamp"]}</div>
+                        {content}
+                        <div class="timestamp">{timestamp}</div>
                     </div>
                 </div>
             </div>
@@ -111,69 +136,91 @@ for message in st.session_state.chat_history:
                 <div class="content">
                     <img src="https://api.dicebear.com/7.x/bottts/svg?seed=travel-agent" class="avatar" />
                     <div class="message">
-                        {message["content"]}
-                        <div class="timestamp">{message["timestamp"]}</div>
+                        {content}
+                        <div class="timestamp">{timestamp}</div>
                     </div>
                 </div>
             </div>
             """, unsafe_allow_html=True)
 
-def format_agent_response(output):
-    """Format the agent's response for display"""
-    if isinstance(output, str):
-        return output
-    elif hasattr(output, "headlines"):  # For TrendingNews
-        response = ""
-        i=0
-        for item in output.headlines:
-            i += 1
-            response += f"<p><b>{i}:</b> {item.headline}</p>"
-            response += f"<p><i>Source:</i> <a href='{item.source}' target='_blank'>{item.source}</a></p><br>"
-        return response
-    elif hasattr(output, "result"):  # For fact check
-        return output.result.summary
-    elif hasattr(output, "summary_text"):  # For article summary
-        return output.summary_text
-    return "Sorry, I can't assist with that."
+def format_time(seconds: float) -> str:
+    return datetime.fromtimestamp(seconds).strftime("%I:%M %p")
+
+# Display chat messages: only the newest turns are drawn on each rerun
+user_id = st.session_state.user_context.user_id
+total_turns = sessions.count(user_id)
+if total_turns > st.session_state.visible_turns:
+    if st.button(f"Show earlier messages ({total_turns - st.session_state.visible_turns} more)"):
+        st.session_state.visible_turns += SESSION_VISIBLE_TURNS
+        st.rerun()
+for turn in sessions.turns(user_id, limit=st.session_state.visible_turns):
+    render_message("user", turn.user_text, format_time(turn.asked_at))
+    render_message("assistant", format_agent_response(turn.output()), format_time(turn.answered_at))
+if st.session_state.last_error:
+    failed_input, error = st.session_state.last_error
+    render_message("user", failed_input, "")
+    st.error(error)
 
-async def process_message(user_input: str):
-    """Process user input with the agent"""
+async def process_message(user_input: str, user_context: UserContext):
+    """Process user input with the agent; the turn is saved to the session store. Returns an error message or None"""
     try:
-        # Run the agent with the input
-        result = await Runner.run(
-            conversation_agent, 
+        # Run the agent with the input and the conversation so far
+        # (answered from the semantic cache when enabled)
+        await run_conversation(
             user_input, 
-            context=st.session_state.user_context
+            context=user_context
         )
-        
-        # Format the response
-        return format_agent_response(result.final_output)
+        return None
+    except Exception as e:
+        return f"Sorry, I encountered an error: {str(e)}"
+
+def stream_message(user_input: str, status, output_area):
+    """Process user input with the agent, showing progress while it runs. Returns an error message or None"""
+    try:
+        partial_output = ""
+        # The run happens on the shared runtime loop; events are handed back to this thread.
+        for event in runtime.iterate(stream_conversation(
+            user_input, 
+            context=st.session_state.user_context
+        )):
+            if event.kind == "status":
+                status.update(label=event.text)
+            elif event.kind == "token":
+                # Structured outputs arrive as JSON; preview only their text fields so far.
+                partial_output += event.text
+                preview = preview_text(partial_output)
+                if preview:
+                    output_area.caption(preview[-600:])
+            elif event.kind == "final":
+                status.update(label="Done", state="complete")
+                output_area.empty()
+                return None
+        return "Sorry, I can't assist with that."
     except Exception as e:
+        status.update(label="Error", state="error")
         return f"Sorry, I encountered an error: {str(e)}"
 
 # User input
 user_input = st.chat_input("Ask me anything about news...")
 if user_input:
-    # Add user message to chat history immediately
-    timestamp = datetime.now().strftime("%I:%M %p")
-    st.session_state.chat_history.append({
-        "role": "user",
-        "content": user_input,
-        "timestamp": timestamp
-    })
-    
-    # Display a temporary "Thinking..." message
-    with st.spinner("Thinking..."):
-        # Process the message asynchronously
-        response_content = asyncio.run(process_message(user_input))
-        
-        # Add assistant response to chat history
-        st.session_state.chat_history.append({
-            "role": "assistant",
-            "content": response_content,
-            "timestamp": datetime.now().strftime("%I:%M %p")
-        })
-    
+    # Show the new message while the agent works
+    st.session_state.last_error = None
+    render_message("user", user_input, datetime.now().strftime("%I:%M %p"))
+
+    if stream_responses:
+        # Show routing, tool calls and output as they happen
+        status = st.status("Thinking...")
+        output_area = st.empty()
+        error = stream_message(user_input, status, output_area)
+    else:
+        # Display a temporary "Thinking..." message
+        with st.spinner("Thinking..."):
+            # Process the message on the shared runtime loop
+            error = runtime.run(process_message(user_input, st.session_state.user_context))
+
+    # Failed turns aren't stored; show the error until the next message
+    st.session_state.last_error = (user_input, error) if error else None
+
     # Force a rerun to display the new messages
     st.rerun()
 
@@ -0,0 +1,299 @@
+"""
+Local stand-ins for the OpenAI chat completions API and the Tavily search API.
+
+They let NewsSense run end to end without keys or network access (see
+load_test.py). The LLM stub plays each agent's part well enough to exercise
+the real code paths: the controller hands off to the specialist that matches
+the query, a specialist calls its first tool once, and the final answer
+follows the requested JSON schema (or is plain filler text). Latency, output
+tokens and error rates are configurable; token usage is reported like the
+real API, so metrics.py sees it.
+
+Usage:
+    python stub_servers.py --llm-port 8901 --search-port 8902 --ttft-ms 300 --ms-per-token 10
+    BASE_URL=http://127.0.0.1:8901/v1 TAVILY_BASE_URL=http://127.0.0.1:8902 python api_server.py
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+
+FILLER = ("the report says officials expect further updates as analysts review new data from markets "
+          "researchers companies and regulators across several regions this week").split()
+OUTLETS = ["reuters.com", "apnews.com", "bbc.co.uk", "theverge.com", "ft.com", "bloomberg.com",
+           "techcrunch.com", "nytimes.com", "theguardian.com", "wsj.com"]
+STORY_ANGLES = ["announces major update", "faces new scrutiny", "reaches record high", "unveils new plan",
+                "sparks debate", "signs landmark deal", "reports strong results", "delays launch"]
+
+
+@dataclass
+class StubSettings:
+    ttft_ms: float = 300          # time to first token of every completion
+    ms_per_token: float = 10      # added per output token
+    output_tokens: int = 150      # tokens in a final answer
+    search_ms: float = 400        # latency of one search
+    jitter: float = 0.2           # latencies vary uniformly by +/- this fraction
+    llm_error_rate: float = 0.0   # fraction of completions answered with HTTP 500
+    search_error_rate: float = 0.0
+
+
+def _jittered(seconds: float, jitter: float) -> float:
+    return max(0.0, seconds * random.uniform(1 - jitter, 1 + jitter))
+
+
+def filler(words: int) -> str:
+    return " ".join(FILLER[i % len(FILLER)] for i in range(max(1, words)))
+
+
+# --- 1. Stub LLM ---
+
+def sample_from_schema(schema: dict, defs: dict = None, index: int = 0, words: int = 8):
+    """A minimal instance of a JSON schema, enough to satisfy a structured output type."""
+    defs = schema.get("$defs", {}) if defs is None else defs
+    if "$ref" in schema:
+        return sample_from_schema(defs[schema["$ref"].split("/")[-1]], defs, index, words)
+    if "anyOf" in schema:
+        options = [option for option in schema["anyOf"] if option.get("type") != "null"]
+        return sample_from_schema(options[0] if options else {"type": "null"}, defs, index, words)
+    if "enum" in schema:
+        return schema["enum"][0]
+    kind = schema.get("type")
+    if isinstance(kind, list):
+        kind = next((k for k in kind if k != "null"), "null")
+    if kind == "object":
+        return {name: sample_from_schema(prop, defs, index, words)
+                for name, prop in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [sample_from_schema(schema.get("items", {}), defs, i, words) for i in range(3)]
+    if kind == "integer":
+        return index + 1
+    if kind == "number":
+        return 0.5
+    if kind == "boolean":
+        return True
+    if kind == "null":
+        return None
+    return filler(words)
+
+
+def _last_user_text(messages: list[dict]) -> str:
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            content = message.get("content") or ""
+            if isinstance(content, list):
+                content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+            return content
+    return ""
+
+
+def _handoff_for(text: str, names: list[str]) -> str:
+    """The transfer_to_* tool matching the query, like the controller would pick it."""
+    lowered = text.lower()
+    if "summar" in lowered or len(text.split()) > 150:
+        wanted = "summar"
+    elif "trend" in lowered or "latest" in lowered or "headlines" in lowered:
+        wanted = "trend"
+    else:
+        wanted = "fact"
+    return next((name for name in names if wanted in name), names[0])
+
+
+def plan_reply(body: dict, settings: StubSettings) -> dict:
+    """
+    Decide the stub's move: {"tool": name, "arguments": json} or {"content": text}.
+    Function tools are called once; handoffs are taken when there are no function tools.
+    """
+    messages = body.get("messages") or []
+    tools = [tool["function"] for tool in body.get("tools") or [] if tool.get("type") == "function"]
+    text = _last_user_text(messages)
+    called = {call["function"]["name"]
+              for message in messages if message.get("role") == "assistant"
+              for call in message.get("tool_calls") or []}
+    function_tools = [tool for tool in tools if not tool["name"].startswith("transfer_to_")]
+    handoffs = [tool["name"] for tool in tools if tool["name"].startswith("transfer_to_")]
+
+    if function_tools and not called & {tool["name"] for tool in function_tools}:
+        tool = function_tools[0]
+        parameters = tool.get("parameters") or {}
+        arguments = {name: text if prop.get("type") == "string" else sample_from_schema(prop, parameters.get("$defs"))
+                     for name, prop in parameters.get("properties", {}).items()}
+        return {"tool": tool["name"], "arguments": json.dumps(arguments)}
+    if handoffs and not function_tools:
+        return {"tool": _handoff_for(text, handoffs), "arguments": "{}"}
+
+    response_format = body.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        schema = response_format["json_schema"]["schema"]
+        return {"content": json.dumps(sample_from_schema(schema, words=max(3, settings.output_tokens // 8)))}
+    return {"content": filler(settings.output_tokens)}
+
+
+def _usage(body: dict, completion_tokens: int) -> dict:
+    prompt_tokens = len(json.dumps(body.get("messages") or [])) // 4
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens}
+
+
+def create_llm_app(settings: StubSettings) -> FastAPI:
+    app = FastAPI(title="Stub OpenAI")
+
+    @app.get("/v1/models")
+    async def models():
+        return {"object": "list", "data": [{"id": "stub-model", "object": "model", "owned_by": "stub"}]}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        if random.random() < settings.llm_error_rate:
+            raise HTTPException(status_code=500, detail="Stub LLM error")
+        reply = plan_reply(body, settings)
+        completion_tokens = (settings.output_tokens if "content" in reply
+                             else 10 + len(reply["arguments"]) // 4)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        model = body.get("model", "stub-model")
+        tool_calls = ([{"index": 0, "id": f"call_{uuid.uuid4().hex[:12]}", "type": "function",
+                        "function": {"name": reply["tool"], "arguments": reply["arguments"]}}]
+                      if "tool" in reply else None)
+        finish_reason = "tool_calls" if tool_calls else "stop"
+        ttft = _jittered(settings.ttft_ms / 1000, settings.jitter)
+        per_token = _jittered(settings.ms_per_token / 1000, settings.jitter)
+
+        if not body.get("stream"):
+            await asyncio.sleep(ttft + per_token * completion_tokens)
+            message = {"role": "assistant", "content": reply.get("content")}
+            if tool_calls:
+                message["tool_calls"] = [{k: v for k, v in call.items() if k != "index"} for call in tool_calls]
+            return {"id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                    "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+                    "usage": _usage(body, completion_tokens)}
+
+        def chunk(delta: dict, finish=None, usage=None) -> str:
+            data = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [] if usage else [{"index": 0, "delta": delta, "finish_reason": finish}]}
+            if usage:
+                data["usage"] = usage
+            return f"data: {json.dumps(data)}\n\n"
+
+        async def events():
+            await asyncio.sleep(ttft)
+            if tool_calls:
+                yield chunk({"role": "assistant", "tool_calls": tool_calls})
+            else:
+                # Roughly one token per word; the JSON of structured answers is split the same way.
+                pieces = reply["content"].split(" ")
+                step = max(1, len(pieces) // 40)
+                for i in range(0, len(pieces), step):
+                    text = " ".join(pieces[i:i + step]) + (" " if i + step < len(pieces) else "")
+                    yield chunk({"role": "assistant", "content": text} if i == 0 else {"content": text})
+                    await asyncio.sleep(per_token * completion_tokens * step / len(pieces))
+            yield chunk({}, finish_reason)
+            if (body.get("stream_options") or {}).get("include_usage"):
+                yield chunk({}, usage=_usage(body, completion_tokens))
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+# --- 2. Stub search ---
+
+def search_results(query: str, max_results: int) -> list[dict]:
+    """
+    Deterministic Tavily-style results for a query: a few stories, each carried
+    by several outlets under slightly different titles, so clustering has work to do.
+    """
+    rng = random.Random(zlib.crc32(query.lower().encode("utf-8")))
+    topic = " ".join(word for word in query.split() if word[:1].isupper()) or query.split()[-1]
+    now = datetime.now(timezone.utc)
+    results = []
+    for i in range(max_results):
+        angle = STORY_ANGLES[rng.randrange(max(2, max_results // 3)) % len(STORY_ANGLES)]
+        outlet = rng.choice(OUTLETS)
+        results.append({
+            "title": f"{topic} {angle}" + rng.choice(["", " - live updates", ", sources say", " amid questions"]),
+            "url": f"https://www.{outlet}/news/{zlib.crc32(f'{query}{i}'.encode()):x}",
+            "content": f"{topic} {angle}. {filler(rng.randint(30, 60))}",
+            "score": round(rng.uniform(0.3, 0.95), 3),
+            "published_date": (now - timedelta(hours=rng.uniform(0, 30))).isoformat(),
+        })
+    return results
+
+
+def create_search_app(settings: StubSettings) -> FastAPI:
+    app = FastAPI(title="Stub Tavily")
+
+    @app.post("/search")
+    async def search(request: Request):
+        body = await request.json()
+        await asyncio.sleep(_jittered(settings.search_ms / 1000, settings.jitter))
+        if random.random() < settings.search_error_rate:
+            raise HTTPException(status_code=500, detail="Stub search error")
+        query = body.get("query", "")
+        return {"query": query, "results": search_results(query, int(body.get("max_results") or 5))}
+
+    return app
+
+
+# --- 3. Serving ---
+
+async def serve(llm_port: int, search_port: int, settings: StubSettings, host: str = "127.0.0.1") -> None:
+    servers = [
+        uvicorn.Server(uvicorn.Config(create_llm_app(settings), host=host, port=llm_port, log_level="warning")),
+        uvicorn.Server(uvicorn.Config(create_search_app(settings), host=host, port=search_port, log_level="warning")),
+    ]
+    await asyncio.gather(*(server.serve() for server in servers))
+
+
+def add_settings_arguments(parser: argparse.ArgumentParser) -> None:
+    defaults = StubSettings()
+    parser.add_argument("--ttft-ms", type=float, default=defaults.ttft_ms, help="Stub LLM time to first token.")
+    parser.add_argument("--ms-per-token", type=float, default=defaults.ms_per_token,
+                        help="Stub LLM time per output token.")
+    parser.add_argument("--output-tokens", type=int, default=defaults.output_tokens,
+                        help="Output tokens of a final stub answer.")
+    parser.add_argument("--search-ms", type=float, default=defaults.search_ms, help="Stub search latency.")
+    parser.add_argument("--jitter", type=float, default=defaults.jitter, help="Relative latency jitter (+/-).")
+    parser.add_argument("--llm-error-rate", type=float, default=defaults.llm_error_rate)
+    parser.add_argument("--search-error-rate", type=float, default=defaults.search_error_rate)
+
+
+def settings_from_args(args: argparse.Namespace) -> StubSettings:
+    return StubSettings(ttft_ms=args.ttft_ms, ms_per_token=args.ms_per_token, output_tokens=args.output_tokens,
+                        search_ms=args.search_ms, jitter=args.jitter, llm_error_rate=args.llm_error_rate,
+                        search_error_rate=args.search_error_rate)
+
+
+def settings_to_argv(settings: StubSettings) -> list[str]:
+    return ["--ttft-ms", str(settings.ttft_ms), "--ms-per-token", str(settings.ms_per_token),
+            "--output-tokens", str(settings.output_tokens), "--search-ms", str(settings.search_ms),
+            "--jitter", str(settings.jitter), "--llm-error-rate", str(settings.llm_error_rate),
+            "--search-error-rate", str(settings.search_error_rate)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run stub OpenAI and Tavily servers.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--llm-port", type=int, default=8901)
+    parser.add_argument("--search-port", type=int, default=8902)
+    add_settings_arguments(parser)
+    args = parser.parse_args()
+
+    print(f"🤖 Stub LLM:    BASE_URL=http://{args.host}:{args.llm_port}/v1")
+    print(f"🔎 Stub search: TAVILY_BASE_URL=http://{args.host}:{args.search_port}", flush=True)
+    asyncio.run(serve(args.llm_port, args.search_port, settings_from_args(args), args.host))
+
+
+if __name__ == "__main__":
+    main()
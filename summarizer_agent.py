@@ -1,54 +1,50 @@
 import asyncio
-import os
 import json
 from typing import List
-from dotenv import load_dotenv
 import logfire
-from openai import AsyncOpenAI
-from agents import Agent, OpenAIChatCompletionsModel, Runner, function_tool, set_tracing_disabled,Runner
+from agents import Agent, OpenAIChatCompletionsModel, Runner, function_tool
 from pydantic import BaseModel, Field
 
-# --- 1. Load Environment Variables ---
-# Load keys from the .env file
-load_dotenv()
+from chunked_summarizer import SUMMARY_CHUNK_TOKENS, estimate_tokens
+from config import API_KEY, MODEL_NAME
+from extractive_summarizer import condense_article, extractive_only, extractive_summary
+from runtime import configure_tracing, get_openai_client
+from schemas import SummarizeOutput
+from tool_runtime import run_blocking, tool_limit
 
-BASE_URL = os.getenv("BASE_URL") 
-API_KEY = os.getenv("API_KEY") 
-MODEL_NAME = os.getenv("MODEL_NAME") 
-LOGFIRE_TOKEN = os.getenv("LOGFIRE_TOKEN") 
+# --- 1. Environment Variables (loaded once in config.py) ---
 
+# Check if keys are available (summarizing needs no search, so no Tavily key)
+if not API_KEY:
+    raise ValueError("The OpenAI API key must be set in the .env file.")
 
-# Check if keys are available
-if not os.getenv("API_KEY") or not os.getenv("TAVILY_API_KEY"):
-    raise ValueError("OpenAI and Tavily API keys must be set in the .env file.")
-
-client = AsyncOpenAI(base_url=BASE_URL, api_key=API_KEY)
-set_tracing_disabled(disabled=True)
+client = get_openai_client()
 
 class SummarizeInput(BaseModel):
     """Input schema for the News Summarizer Agent."""
     article_text: str = Field(..., description="The full text of the news article to be summarized.")
 
-class SummarizeOutput(BaseModel):
-    """Output schema for the News Summarizer Agent."""
-    summary_text: str = Field(..., description="Summarized text from a given article.")
-
 @function_tool
 @logfire.instrument("summarize_news tool called")
-def summarize_news(article_text: str) -> dict:
+async def summarize_news(article_text: str) -> str:
     """
-    Take the user article and validate it. Later this will be replaced with a tool to read article from db or webpage.
+    Prepare the user's article for summarization. Long articles are normally
+    condensed before the agent runs (see condense_article); this covers callers
+    that pass one straight to the agent. Later this will be replaced with a tool to read article from db or webpage.
     """
     #article_text = params.article_text
     print(f"⚙️ Tool: Summarizing article...")
-    # A simple extractive summarization simulation
-    # summary_points = [
-    #     "The article discusses the rapid advancements in Large Language Models (LLMs).",
-    #     "It highlights the competitive landscape between major tech companies.",
-    #     "Key challenges include managing computational costs and addressing ethical concerns.",
-    #     "The future outlook points towards more personalized and multi-modal AI assistants."
-    # ]
-    return article_text 
+    if extractive_only():
+        # Over the summarization token budget: answer from the article's own key sentences.
+        async with tool_limit("summarize"):
+            return await run_blocking(extractive_summary, article_text)
+
+    if estimate_tokens(article_text) <= SUMMARY_CHUNK_TOKENS:
+        # The article is already in the conversation; echoing it back would
+        # send it through the model a second time.
+        return "The article is short enough to summarize directly from the user's message."
+
+    return await condense_article(article_text)
 
 
 article_summarizer_agent = Agent(
@@ -62,6 +58,11 @@ article_summarizer_agent = Agent(
     Avoid unnecessary details or filler content.
     Use clear, concise language.
 
+    If the message starts with "Key sentences extracted from a long article" or "Bullet points summarizing
+    a long article", the article was long and has already been condensed: rewrite that text into the final
+    summary directly, without calling any tool.
+    Otherwise call summarize_news with the article text. If it returns bullet points or extracted key sentences,
+    those already cover the article: rewrite them into the final summary instead of re-reading the article.
     """,
     model=OpenAIChatCompletionsModel(
         openai_client=client,
@@ -73,6 +74,7 @@ article_summarizer_agent = Agent(
 
 
 if __name__ == "__main__":
+    configure_tracing()
     # Run the agent in a simple test loop
     async def main():
         long_article = """
@@ -0,0 +1,16 @@
+import os
+import sys
+
+# The modules live at the repository root.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Placeholder settings so the agent modules import; no test talks to a real service.
+for name, value in {
+    "API_KEY": "test-key",
+    "BASE_URL": "http://127.0.0.1:9/v1",
+    "MODEL_NAME": "test-model",
+    "TAVILY_API_KEY": "test-key",
+    "LOGFIRE_SEND_TO_LOGFIRE": "0",
+    "FACT_CHECK_WARMUP": "0",
+}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,56 @@
+import numpy as np
+
+import answer_cache
+from answer_cache import SemanticAnswerCache
+
+
+def two_topic_embedding(texts):
+    # "apple"/"openai" queries point one way, everything else the other way.
+    return [np.array([1.0, 0.1]) if "apple" in text.lower() else np.array([0.1, 1.0]) for text in texts]
+
+
+def test_similar_query_hits_and_dissimilar_query_misses():
+    cache = SemanticAnswerCache(embedding_function=two_topic_embedding, similarity=0.92)
+    cache.put("Did Apple buy OpenAI?", "no", "Fact Check Specialist")
+    assert cache.get("apple acquired openai?") == ("no", "Fact Check Specialist")
+    assert cache.get("What's the weather in Oslo?") is None
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 1)
+
+
+def test_hit_needs_the_configured_similarity():
+    # The two queries' embeddings have a cosine similarity of about 0.9.
+    def embedding(texts):
+        return [np.array([1.0, 0.0]) if text == "stored" else np.array([0.9, 0.43]) for text in texts]
+
+    for similarity, hit in ((0.85, True), (0.95, False)):
+        cache = SemanticAnswerCache(embedding_function=embedding, similarity=similarity)
+        cache.put("stored", "answer", "Fact Check Specialist")
+        assert (cache.get("similar") is not None) == hit
+
+
+def test_entries_expire_after_their_agents_ttl(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(answer_cache.time, "monotonic", lambda: clock[0])
+    cache = SemanticAnswerCache(embedding_function=two_topic_embedding,
+                                agent_ttls={"Trending News Agent": 300, "Article Summarizer": 0})
+    cache.put("latest apple news", "headlines", "Trending News Agent")
+    cache.put("summarize apple article", "summary", "Article Summarizer")
+    assert cache.stats()["entries"] == 1
+
+    clock[0] += 299
+    assert cache.get("latest apple news") == ("headlines", "Trending News Agent")
+    clock[0] += 2
+    assert cache.get("latest apple news") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SemanticAnswerCache(embedding_function=lambda texts: [np.eye(3)[int(text)] for text in texts],
+                                max_entries=2)
+    cache.put("0", "zero", "Fact Check Specialist")
+    cache.put("1", "one", "Fact Check Specialist")
+    assert cache.get("0") is not None
+    cache.put("2", "two", "Fact Check Specialist")
+    assert cache.get("1") is None
+    assert cache.get("0") == ("zero", "Fact Check Specialist")
+    assert cache.stats()["evictions"] == 1
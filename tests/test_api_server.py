@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import api_server
+from api_server import AdmissionControl
+
+
+def _run(monkeypatch, main, max_in_flight=1, queue_timeout=0.05):
+    async def runner():
+        admission = AdmissionControl(max_in_flight)
+        admission.start()
+        monkeypatch.setattr(api_server, "admission", admission)
+        return await main(admission)
+
+    monkeypatch.setattr(api_server, "API_QUEUE_TIMEOUT_SECONDS", queue_timeout)
+    return asyncio.run(runner())
+
+
+def test_request_over_capacity_is_shed_with_503_without_creating_the_call(monkeypatch):
+    created = []
+
+    def slow():
+        created.append(True)
+        return asyncio.sleep(0.2, "done")
+
+    async def main(admission):
+        first = asyncio.create_task(api_server._run_limited("route", slow))
+        await asyncio.sleep(0.01)
+        with pytest.raises(HTTPException) as error:
+            await api_server._run_limited("route", slow)
+        assert await first == "done"
+        return error.value.status_code
+
+    assert _run(monkeypatch, main) == 503
+    # The shed request never built its coroutine, so nothing is left un-awaited.
+    assert len(created) == 1
+
+
+def test_slow_call_times_out_with_504_and_frees_its_slot(monkeypatch):
+    monkeypatch.setitem(api_server.ENDPOINT_TIMEOUT_SECONDS, "trending", 0.05)
+
+    async def main(admission):
+        with pytest.raises(HTTPException) as error:
+            await api_server._run_limited("trending", lambda: asyncio.sleep(1))
+        assert admission.in_flight == 0
+        return error.value.status_code
+
+    assert _run(monkeypatch, main) == 504
+
+
+def test_draining_rejects_new_requests_and_waits_for_running_ones(monkeypatch):
+    async def main(admission):
+        running = asyncio.create_task(api_server._run_limited("route", lambda: asyncio.sleep(0.05, "done")))
+        await asyncio.sleep(0.01)
+        await admission.drain(timeout=1)
+        assert running.done() and running.result() == "done"
+        with pytest.raises(HTTPException) as error:
+            await api_server._run_limited("route", lambda: asyncio.sleep(0))
+        return error.value.status_code
+
+    assert _run(monkeypatch, main) == 503
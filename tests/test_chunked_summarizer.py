@@ -0,0 +1,58 @@
+import asyncio
+from types import SimpleNamespace
+
+import chunked_summarizer
+from chunked_summarizer import chunk_text, estimate_tokens, map_reduce_summarize
+
+
+def test_short_text_is_a_single_chunk():
+    assert chunk_text("One sentence. Another one.", max_tokens=100) == ["One sentence. Another one."]
+
+
+def test_chunks_stay_within_budget_and_keep_every_word():
+    paragraphs = [" ".join(f"Sentence {p}-{s} has a few words." for s in range(12)) for p in range(6)]
+    text = "\n\n".join(paragraphs)
+    chunks = chunk_text(text, max_tokens=60)
+    assert len(chunks) > 1
+    assert all(estimate_tokens(chunk) <= 60 for chunk in chunks)
+    assert " ".join(" ".join(chunks).split()) == " ".join(text.split())
+
+
+def test_oversized_sentence_is_split_on_words():
+    sentence = " ".join(f"word{i}" for i in range(200))
+    chunks = chunk_text(sentence, max_tokens=20)
+    assert len(chunks) > 1
+    assert all(estimate_tokens(chunk) <= 20 for chunk in chunks)
+    assert " ".join(chunks).split() == sentence.split()
+
+
+class FakeCompletions:
+    def __init__(self, reply):
+        self.reply = reply
+        self.calls = []
+
+    async def create(self, model, messages, temperature):
+        self.calls.append(messages[-1]["content"])
+        message = SimpleNamespace(content=self.reply(messages[-1]["content"]))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+def _fake_client(monkeypatch, reply):
+    completions = FakeCompletions(reply)
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    monkeypatch.setattr(chunked_summarizer, "get_openai_client", lambda: client)
+    return completions
+
+
+def test_single_chunk_is_not_reduced(monkeypatch):
+    completions = _fake_client(monkeypatch, lambda text: "- one\n- two")
+    summary = asyncio.run(map_reduce_summarize("A short article. It has two sentences.", max_tokens=100))
+    assert summary == "- one\n- two"
+    assert len(completions.calls) == 1
+
+
+def test_empty_map_output_skips_the_reduce_levels(monkeypatch):
+    completions = _fake_client(monkeypatch, lambda text: "")
+    article = "\n\n".join(f"Paragraph {i} says something new about the story." for i in range(6))
+    assert asyncio.run(map_reduce_summarize(article, max_tokens=20)) == ""
+    assert len(completions.calls) == len(chunk_text(article, 20))
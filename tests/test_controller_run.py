@@ -0,0 +1,52 @@
+import asyncio
+
+import agent_registry
+import controller_run
+from intent_router import FACT_CHECK, SUMMARIZE
+
+
+def _condensed(monkeypatch):
+    calls = []
+
+    async def condense_article(text):
+        calls.append(text)
+        return "condensed"
+
+    monkeypatch.setattr(controller_run, "condense_article", condense_article)
+    return calls
+
+
+def test_only_the_summarizer_gets_a_condensed_article(monkeypatch):
+    calls = _condensed(monkeypatch)
+    summarizer, fact_checker = object(), object()
+    monkeypatch.setitem(agent_registry._agents, SUMMARIZE, summarizer)
+    monkeypatch.setitem(agent_registry._agents, FACT_CHECK, fact_checker)
+    article = "Apple acquired OpenAI. " * 400
+
+    assert asyncio.run(controller_run._agent_input(fact_checker, article, [])) == article
+    assert calls == []
+    assert asyncio.run(controller_run._agent_input(summarizer, article, [])) == "condensed"
+    assert calls == [article]
+
+
+def test_history_is_prepended_to_the_input(monkeypatch):
+    _condensed(monkeypatch)
+    history = [{"role": "user", "content": "earlier"}]
+    assert asyncio.run(controller_run._agent_input(object(), "now", history)) == history + [
+        {"role": "user", "content": "now"}]
+
+
+def test_conversation_agent_is_still_importable(monkeypatch):
+    agent = object()
+    monkeypatch.setattr(controller_run, "_conversation_agent", agent)
+    from controller_run import conversation_agent
+    assert conversation_agent is agent
+
+
+def test_preview_shows_only_the_text_fields_of_partial_json():
+    partial = '{"status": "ok", "result": {"verdict": "False", "summary": "Apple did not \\u00e9 buy Open'
+    assert controller_run.preview_text(partial) == "False\nApple did not é buy Open"
+    assert controller_run.preview_text('{"summary_text": "Line one\\nLine t') == "Line one\nLine t"
+    assert controller_run.preview_text('{"summary_text": "Cut \\u00') == "Cut "
+    assert controller_run.preview_text('{"status": "o') == ""
+    assert controller_run.preview_text("Plain answer") == "Plain answer"
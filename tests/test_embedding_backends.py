@@ -0,0 +1,74 @@
+import os
+import threading
+
+import huggingface_hub
+import numpy as np
+import pytest
+
+import embedding_backends
+from embedding_backends import EmbeddingBackend, MicroBatcher, _onnx_model_dir
+
+
+class CountingBackend(EmbeddingBackend):
+    model_name = "counting"
+
+    def __init__(self):
+        self.batches = []
+
+    def embed(self, texts):
+        self.batches.append(list(texts))
+        return np.array([[len(text), 1.0] for text in texts], dtype=np.float32)
+
+
+def test_micro_batcher_merges_concurrent_requests_and_returns_each_callers_rows():
+    backend = CountingBackend()
+    batcher = MicroBatcher(backend, max_batch=64, wait_ms=50)
+    results = {}
+
+    def call(text):
+        results[text] = batcher([text, text * 2])
+
+    threads = [threading.Thread(target=call, args=(text,)) for text in ("a", "bb", "ccc")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(backend.batches) < 3
+    for text, vectors in results.items():
+        assert [vector[0] for vector in vectors] == [len(text), 2 * len(text)]
+
+
+def test_local_model_dir_is_used_as_is(tmp_path):
+    assert _onnx_model_dir(str(tmp_path)) == str(tmp_path)
+    with pytest.raises(ValueError):
+        _onnx_model_dir("some-unknown-model")
+
+
+def test_known_export_is_downloaded_once_into_the_model_cache(tmp_path, monkeypatch):
+    downloads = []
+
+    def hf_hub_download(repo_id, filename, local_dir):
+        downloads.append((repo_id, filename))
+        path = os.path.join(local_dir, filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(filename)
+        return path
+
+    monkeypatch.setattr(embedding_backends, "EMBEDDING_MODEL_CACHE", str(tmp_path))
+    monkeypatch.setattr(huggingface_hub, "hf_hub_download", hf_hub_download)
+    model_dir = _onnx_model_dir("all-MiniLM-L6-v2")
+    assert {"model.onnx", "tokenizer.json"} <= set(os.listdir(model_dir))
+    assert _onnx_model_dir("all-MiniLM-L6-v2") == model_dir
+    assert len(downloads) == 2
+
+
+def test_failed_download_says_how_to_use_a_local_copy(tmp_path, monkeypatch):
+    def hf_hub_download(repo_id, filename, local_dir):
+        raise OSError("offline")
+
+    monkeypatch.setattr(embedding_backends, "EMBEDDING_MODEL_CACHE", str(tmp_path))
+    monkeypatch.setattr(huggingface_hub, "hf_hub_download", hf_hub_download)
+    with pytest.raises(RuntimeError, match="offline.*onnx:/path/to/model_dir"):
+        _onnx_model_dir("all-MiniLM-L6-v2")
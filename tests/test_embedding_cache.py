@@ -0,0 +1,51 @@
+import numpy as np
+
+from embedding_cache import EmbeddingCache, cache_key
+
+
+def last_used(cache, key):
+    return cache._db.execute("SELECT last_used FROM embeddings WHERE key = ?", (key,)).fetchone()[0]
+
+
+def test_hits_do_not_write_on_every_lookup(tmp_path, monkeypatch):
+    import embedding_cache
+
+    clock = [1_000_000.0]
+    monkeypatch.setattr(embedding_cache.time, "time", lambda: clock[0])
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"), touch_seconds=600)
+    keys = [cache_key("model", f"text {i}") for i in range(3)]
+    cache.put_many("model", [(key, np.ones(4)) for key in keys])
+    writes = cache._db.total_changes
+
+    for _ in range(100):
+        clock[0] += 1
+        assert len(cache.get_many(keys)) == 3
+    assert cache._db.total_changes == writes
+
+    # Once entries are stale and the interval has passed, one batched write refreshes them.
+    clock[0] += 600
+    cache.get_many(keys[:2])
+    assert cache._db.total_changes == writes + 2
+    assert last_used(cache, keys[0]) == clock[0]
+    assert last_used(cache, keys[2]) == 1_000_000.0
+
+
+def test_recent_hits_are_not_queued(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"), touch_seconds=600)
+    key = cache_key("model", "hello")
+    cache.put_many("model", [(key, np.ones(4))])
+    cache.get_many([key, cache_key("model", "missing")])
+    assert cache._touched == {}
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_entries_count_only_new_keys(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = EmbeddingCache(path)
+    keys = [cache_key("model", f"text {i}") for i in range(3)]
+    cache.put_many("model", [(key, np.ones(4)) for key in keys[:2]])
+    # Another process (or a racing thread) stored the same keys again.
+    cache.put_many("model", [(key, np.full(4, 2.0)) for key in keys])
+    assert cache.stats()["entries"] == 3
+    assert EmbeddingCache(path).stats()["entries"] == 3
+    assert cache.get_many(keys[:1])[keys[0]].tolist() == [2.0] * 4
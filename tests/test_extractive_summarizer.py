@@ -0,0 +1,31 @@
+import numpy as np
+
+import extractive_summarizer
+from chunked_summarizer import estimate_tokens
+from extractive_summarizer import extract_key_sentences
+
+
+def _fake_embedding(monkeypatch):
+    def embed(sentences):
+        # Sentences about Apple are similar to each other and central to the text.
+        return [np.array([1.0, 0.1]) if "Apple" in sentence else np.array([0.1, 1.0]) for sentence in sentences]
+
+    monkeypatch.setattr(extractive_summarizer, "_embedding_function", embed)
+
+
+def test_key_sentences_keep_their_order_and_budget(monkeypatch):
+    _fake_embedding(monkeypatch)
+    text = ("Apple bought a startup. It rained in Oslo. Apple shares rose. "
+            "Apple plans more deals. A cat slept all day.")
+    sentences = extract_key_sentences(text, max_tokens=100, max_sentences=3)
+    assert sentences == ["Apple bought a startup.", "Apple shares rose.", "Apple plans more deals."]
+
+
+def test_unpunctuated_text_is_cut_to_the_budget(monkeypatch):
+    _fake_embedding(monkeypatch)
+    text = " ".join(f"word{i}" for i in range(2000))
+    sentences = extract_key_sentences(text, max_tokens=50)
+    assert len(sentences) == 1
+    assert estimate_tokens(sentences[0]) <= 50
+    assert text.startswith(sentences[0])
+    assert extract_key_sentences("", max_tokens=50) == []
@@ -0,0 +1,46 @@
+import fact_check_service
+from fact_check_service import FactCheckRetriever, apply_hnsw_configuration, hnsw_configuration, hnsw_settings
+from index_admin import open_client, rebuild
+
+
+def stub_embedding(texts):
+    return [[1.0, 0.0] for _ in texts]
+
+
+def open_collection(monkeypatch, path, **overrides):
+    configuration = hnsw_configuration(**overrides)
+    monkeypatch.setattr(fact_check_service, "hnsw_configuration", lambda: configuration)
+    return FactCheckRetriever(path=path, collection_name="claims", embedding_function=stub_embedding).collection
+
+
+def test_overrides_replace_defaults_and_none_is_ignored():
+    configuration = hnsw_configuration(ef_search=50, max_neighbors=None)
+    assert configuration["ef_search"] == 50
+    assert configuration["max_neighbors"] == hnsw_configuration()["max_neighbors"]
+    assert configuration["space"] == "cosine"
+
+
+def test_new_collection_is_created_with_the_configuration(tmp_path, monkeypatch):
+    collection = open_collection(monkeypatch, str(tmp_path), ef_search=40, max_neighbors=24)
+    settings = hnsw_settings(collection)
+    assert (settings["ef_search"], settings["max_neighbors"], settings["space"]) == (40, 24, "cosine")
+
+
+def test_tunable_settings_are_applied_to_an_existing_collection(tmp_path, monkeypatch):
+    open_collection(monkeypatch, str(tmp_path), ef_search=40)
+    collection = open_client(str(tmp_path)).get_collection("claims")
+    apply_hnsw_configuration(collection, hnsw_configuration(ef_search=80, max_neighbors=64))
+    settings = hnsw_settings(open_client(str(tmp_path)).get_collection("claims"))
+    # ef_search can change in place; M only takes effect after a rebuild.
+    assert settings["ef_search"] == 80
+    assert settings["max_neighbors"] == hnsw_configuration()["max_neighbors"]
+
+
+def test_rebuild_keeps_records_and_applies_construction_settings(tmp_path, monkeypatch):
+    collection = open_collection(monkeypatch, str(tmp_path))
+    collection.add(ids=["a", "b"], documents=["one", "two"], embeddings=[[1.0, 0.0], [0.0, 1.0]])
+    client = open_client(str(tmp_path))
+    result = rebuild(client, str(tmp_path), "claims", hnsw_configuration(max_neighbors=32))
+    rebuilt = client.get_collection("claims")
+    assert result["records"] == 2 and rebuilt.count() == 2
+    assert hnsw_settings(rebuilt)["max_neighbors"] == 32
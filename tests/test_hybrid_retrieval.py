@@ -0,0 +1,57 @@
+from fact_check_service import FactCheckRetriever
+from hybrid_retrieval import (INGEST_CHECKPOINT_FILE, BM25Index, DEFAULT_THRESHOLDS, load_or_build_index,
+                              passes_thresholds, tokenize)
+
+
+def test_tokenize_drops_stopwords_and_keeps_numbers():
+    assert tokenize("Did Apple really buy OpenAI for $6.5 billion?") == ["apple", "buy", "openai", "6.5", "billion"]
+
+
+def test_search_ranks_by_keywords_and_reports_coverage():
+    index = BM25Index()
+    index.add(["a", "b", "c"], [
+        "Apple acquired OpenAI in 2024",
+        "Microsoft invested in OpenAI",
+        "Rain fell in Oslo on Monday",
+    ])
+    results = index.search("apple openai 2024", k=3)
+    assert [record_id for record_id, _, _ in results] == ["a", "b"]
+    assert results[0][2] == 1.0
+    assert index.search("the of", k=3) == []
+
+
+def test_readding_an_id_replaces_its_document(tmp_path):
+    index = BM25Index()
+    index.add(["a"], ["Apple acquired OpenAI"])
+    index.add(["a"], ["Rain fell in Oslo"])
+    assert len(index) == 1
+    assert index.search("openai", k=5) == []
+
+    path = str(tmp_path / "bm25.pkl")
+    index.save(path)
+    loaded = BM25Index.load(path)
+    assert [record_id for record_id, _, _ in loaded.search("oslo rain", k=5)] == ["a"]
+
+
+def test_default_thresholds_keep_the_vector_cutoff():
+    close = {"distance": 0.59, "coverage": 0.0}
+    keyword_heavy = {"distance": 0.7, "coverage": 1.0}
+    assert passes_thresholds(close, DEFAULT_THRESHOLDS)
+    assert not passes_thresholds(keyword_heavy, DEFAULT_THRESHOLDS)
+    assert passes_thresholds(keyword_heavy, {**DEFAULT_THRESHOLDS, "relaxed_max_distance": 0.75})
+
+
+def test_saved_index_is_rebuilt_after_an_ingest_that_keeps_the_count(tmp_path):
+    retriever = FactCheckRetriever(path=str(tmp_path), collection_name="claims",
+                                   embedding_function=lambda texts: [[1.0, 0.0] for _ in texts])
+    retriever.collection.upsert(ids=["a", "b"], documents=["Apple acquired OpenAI", "Rain in Oslo"],
+                                embeddings=[[1.0, 0.0], [0.0, 1.0]])
+    assert [hit[0] for hit in load_or_build_index(retriever).search("openai", k=5)] == ["a"]
+
+    # A re-ingest updates a document in place and saves its checkpoint.
+    retriever.collection.upsert(ids=["a"], documents=["Microsoft bought GitHub"], embeddings=[[1.0, 0.0]])
+    (tmp_path / INGEST_CHECKPOINT_FILE).write_text('{"claims.jsonl": {"rows_done": 2}}')
+
+    index = load_or_build_index(retriever)
+    assert index.search("openai", k=5) == []
+    assert [hit[0] for hit in index.search("github", k=5)] == ["a"]
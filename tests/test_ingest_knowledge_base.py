@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+from fact_check_service import FactCheckRetriever
+from hybrid_retrieval import BM25Index
+from ingest_knowledge_base import IngestStats, ingest_file, load_checkpoint, prepare_record
+
+
+class FlakyEmbedding:
+    """Fails on the `fail_on`-th call, like an ingestion run killed part-way."""
+
+    def __init__(self, fail_on: int = None):
+        self.fail_on = fail_on
+        self.calls = 0
+
+    def __call__(self, texts):
+        self.calls += 1
+        if self.calls == self.fail_on:
+            raise RuntimeError("interrupted")
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+def write_claims(path, count):
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(count):
+            f.write(json.dumps({"claim": f"Claim number {i} about topic {i % 2}", "verdict": "False",
+                                "summary": f"Summary {i}", "sources": [f"https://example.com/{i}"],
+                                "date": "2024-05-01"}) + "\n")
+
+
+def ingest(tmp_path, claims_path, embedding, resume=True, keyword_index=None):
+    retriever = FactCheckRetriever(path=str(tmp_path / "db"), collection_name="claims", embedding_function=embedding)
+    stats = IngestStats()
+    ingest_file(str(claims_path), retriever.collection, embedding, str(tmp_path / "checkpoint.json"),
+                chunk_size=2, embed_batch=2, resume=resume, stats=stats, keyword_index=keyword_index)
+    return retriever.collection, stats
+
+
+def test_interrupted_ingestion_resumes_after_the_last_checkpoint(tmp_path):
+    claims_path = tmp_path / "claims.jsonl"
+    write_claims(claims_path, 5)
+
+    with pytest.raises(RuntimeError):
+        ingest(tmp_path, claims_path, FlakyEmbedding(fail_on=2))
+    (entry,) = load_checkpoint(str(tmp_path / "checkpoint.json")).values()
+    assert entry["rows_done"] == 2
+
+    keyword_index = BM25Index()
+    collection, stats = ingest(tmp_path, claims_path, FlakyEmbedding(), keyword_index=keyword_index)
+    assert stats.read == 3 and stats.upserted == 3
+    assert collection.count() == 5
+    assert len(keyword_index) == 3
+
+    # Starting over skips every record whose content is unchanged.
+    collection, stats = ingest(tmp_path, claims_path, FlakyEmbedding(), resume=False)
+    assert (stats.read, stats.upserted, stats.unchanged) == (5, 0, 5)
+
+
+def test_prepare_record_keeps_metadata_and_derives_year():
+    record_id, document, metadata = prepare_record(
+        {"claim": " Apple bought OpenAI ", "verdict": "False", "sources": "a.com; b.com", "date": "2023-01-02",
+         "topic": "AI", "tags": ["ignored"]})
+    assert record_id.startswith("claim_") and document == "Apple bought OpenAI"
+    assert json.loads(metadata["sources"]) == ["a.com", "b.com"]
+    assert (metadata["topic"], metadata["year"]) == ("AI", 2023)
+    assert "tags" not in metadata
+    with pytest.raises(ValueError):
+        prepare_record({"verdict": "True"})
@@ -0,0 +1,50 @@
+import numpy as np
+
+from intent_router import FACT_CHECK, LONG_TEXT_WORDS, SUMMARIZE, TRENDING, IntentRouter
+
+
+def axis_embedding(texts):
+    """One axis per intent, picked by a word typical of it, so the centroids are easy to reason about."""
+    vectors = []
+    for text in texts:
+        text = text.lower()
+        vector = np.zeros(4)
+        if any(word in text for word in ("summar", "tl;dr", "key points", "bullet", "condense")):
+            vector[2] = 1
+        elif any(word in text for word in ("true", "acquire", "bought", "partner", "rumor", "real", "claim")):
+            vector[1] = 1
+        elif any(word in text for word in ("trend", "latest", "news", "headlines", "happening")):
+            vector[0] = 1
+        else:
+            vector[3] = 1
+        vectors.append(vector)
+    return vectors
+
+
+def test_keyword_rules():
+    router = IntentRouter(embedding_function=axis_embedding)
+    assert router.classify_keywords("Can you summarize this?") == (SUMMARIZE, 0.9)
+    assert router.classify_keywords("Is it true that Apple acquired OpenAI?")[0] == FACT_CHECK
+    assert router.classify_keywords("What's trending in tech?")[0] == TRENDING
+    assert router.classify_keywords("Hello there") == (None, 0.0)
+
+
+def test_keyword_and_embedding_agreement_is_confident():
+    router = IntentRouter(embedding_function=axis_embedding)
+    decision = router.route("Is it true that Apple acquired OpenAI?")
+    assert (decision.intent, decision.method) == (FACT_CHECK, "keyword+embedding")
+    assert router.is_confident(decision)
+
+
+def test_off_topic_query_falls_back_to_the_controller():
+    router = IntentRouter(embedding_function=axis_embedding)
+    decision = router.route("I want to become a data scientist")
+    assert not router.is_confident(decision)
+    assert router.stats()["fallback"] == 1 and router.stats()["bypassed"] == 0
+
+
+def test_long_pasted_text_goes_to_the_summarizer():
+    router = IntentRouter(embedding_function=axis_embedding)
+    decision = router.route("word " * (LONG_TEXT_WORDS + 1))
+    assert (decision.intent, decision.method) == (SUMMARIZE, "length")
+    assert router.stats()["bypassed_by_intent"][SUMMARIZE] == 1
@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+from metrics import ERROR_NAME, Histogram, metrics, request_scope
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    metrics.reset()
+    metrics.sample_rate = 1.0
+    yield
+    metrics.reset()
+
+
+def request_counts():
+    return {name: stage["count"] for name, stage in metrics.snapshot()["stages"].get("request", {}).items()}
+
+
+def test_quantiles_stay_within_observed_range():
+    histogram = Histogram()
+    for seconds in (0.2, 0.3, 0.4):
+        histogram.observe(seconds)
+    assert histogram.quantile(0.0) >= 0.2
+    assert histogram.quantile(0.99) <= 0.4
+    assert Histogram().quantile(0.5) is None
+
+
+def test_failed_request_is_recorded_as_error():
+    with pytest.raises(RuntimeError):
+        with request_scope() as scope:
+            scope.name = None
+            raise RuntimeError("boom")
+    assert request_counts() == {ERROR_NAME: 1}
+    # Both exports keep working.
+    assert "newssense_stage_seconds_count" in metrics.prometheus_text()
+
+
+def test_cancelled_request_is_recorded_as_error():
+    async def run():
+        with request_scope() as scope:
+            scope.name = None
+            await asyncio.sleep(10)
+
+    async def main():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(run(), timeout=0.01)
+
+    asyncio.run(main())
+    assert request_counts() == {ERROR_NAME: 1}
+    metrics.prometheus_text()
+
+
+def test_unnamed_request_keeps_default_name():
+    with request_scope("agent") as scope:
+        scope.name = None
+    assert request_counts() == {"agent": 1}
+
+
+def test_nested_scope_records_once_under_inner_name():
+    with request_scope("api route"):
+        with request_scope() as inner:
+            inner.name = "Fact Check Specialist"
+    assert request_counts() == {"Fact Check Specialist": 1}
@@ -0,0 +1,43 @@
+import asyncio
+import threading
+
+import pytest
+
+from runtime import AgentRuntime
+
+
+@pytest.fixture
+def runtime():
+    runtime = AgentRuntime()
+    yield runtime
+    runtime.stop()
+
+
+def test_coroutines_share_one_long_lived_loop(runtime):
+    async def current_loop():
+        return asyncio.get_running_loop()
+
+    assert runtime.run(current_loop()) is runtime.run(current_loop()) is runtime.loop
+
+
+def test_iterate_yields_items_in_the_calling_thread_as_they_arrive(runtime):
+    async def numbers():
+        for i in range(3):
+            await asyncio.sleep(0)
+            yield i, threading.current_thread().name
+
+    items = list(runtime.iterate(numbers()))
+    assert [i for i, _ in items] == [0, 1, 2]
+    assert {name for _, name in items} == {"agent-runtime"}
+
+
+def test_iterate_reraises_the_producers_error(runtime):
+    async def failing():
+        yield 1
+        raise ValueError("boom")
+
+    received = []
+    with pytest.raises(ValueError, match="boom"):
+        for item in runtime.iterate(failing()):
+            received.append(item)
+    assert received == [1]
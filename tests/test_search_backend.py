@@ -0,0 +1,65 @@
+import asyncio
+
+from search_backend import CachedSearch, SearchBackend
+
+
+class SlowBackend(SearchBackend):
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.calls = 0
+
+    def search(self, query: str, max_results: int) -> dict:
+        self.calls += 1
+        return {"results": [{"title": query}]}
+
+    async def asearch(self, query: str, max_results: int) -> dict:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return {"results": [{"title": query}]}
+
+
+def test_identical_queries_are_coalesced():
+    backend = SlowBackend()
+    search = CachedSearch(backend, ttl=0)
+
+    async def main():
+        return await asyncio.gather(*(search.asearch("AI news", 5) for _ in range(5)))
+
+    responses = asyncio.run(main())
+    assert backend.calls == 1
+    assert search.coalesced == 4
+    assert all(response == responses[0] for response in responses)
+
+
+def test_cancelled_leader_does_not_cancel_waiters():
+    backend = SlowBackend()
+    search = CachedSearch(backend, ttl=0)
+
+    async def main():
+        leader = asyncio.create_task(search.asearch("AI news", 5))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(search.asearch("ai   NEWS!", 5))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await waiter
+
+    assert asyncio.run(main()) == {"results": [{"title": "ai   NEWS!"}]}
+    assert backend.calls == 2
+
+
+def test_cancelled_waiter_does_not_cancel_leader():
+    backend = SlowBackend()
+    search = CachedSearch(backend, ttl=60)
+
+    async def main():
+        leader = asyncio.create_task(search.asearch("AI news", 5))
+        await asyncio.sleep(0)
+        try:
+            await asyncio.wait_for(search.asearch("AI news", 5), timeout=0.01)
+        except asyncio.TimeoutError:
+            pass
+        return await leader
+
+    assert asyncio.run(main()) == {"results": [{"title": "AI news"}]}
+    assert search.search("ai news", 5) == {"results": [{"title": "AI news"}]}
+    assert backend.calls == 1
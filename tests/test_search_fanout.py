@@ -0,0 +1,33 @@
+from search_fanout import expand_query, merge_results
+
+
+def test_topic_is_expanded_with_a_synonym_time_and_regions():
+    queries = expand_query("What's trending in AI today?", limit=8)
+    assert queries[0] == "What's trending in AI today?"
+    assert queries[1] == "artificial intelligence news"
+    assert "AI news today" in queries and "AI news Europe" in queries
+
+
+def test_regions_are_skipped_when_the_topic_names_one():
+    queries = expand_query("Europe elections", limit=8)
+    assert not any(query.endswith(("US", "Asia")) for query in queries)
+
+
+def test_expansion_respects_the_limit_and_drops_duplicates():
+    assert len(expand_query("climate", limit=3)) == 3
+    assert expand_query("climate", limit=1) == ["climate"]
+    queries = expand_query("tech news", limit=10)
+    assert len({query.lower() for query in queries}) == len(queries)
+
+
+def test_results_are_merged_by_normalized_url():
+    responses = [
+        {"results": [{"url": "https://www.a.com/story/?utm_source=x", "title": "A", "score": 0.4},
+                     {"url": "https://b.com/other", "title": "B", "score": 0.9}]},
+        {"results": [{"url": "http://a.com/story", "title": "A again", "score": 0.7}, {"title": "no url"}]},
+    ]
+    merged = {result["title"]: result for result in merge_results(responses)}
+    assert set(merged) == {"A", "B"}
+    assert merged["A"]["score"] == 0.7
+    assert merged["A"]["queries"] == 2
+    assert merged["B"]["queries"] == 1
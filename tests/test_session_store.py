@@ -0,0 +1,81 @@
+import pytest
+
+from session_store import MemorySessionStore, SQLiteSessionStore, Turn, build_history, is_follow_up
+
+
+@pytest.mark.parametrize("text", [
+    "summarize the second one",
+    "and the first one?",
+    "What about the 3rd story",
+    "fact-check the last headline",
+    "tell me more about that",
+    "more on it",
+    "summarize that",
+    "number 2 please",
+    "tell me more",
+])
+def test_follow_ups(text):
+    assert is_follow_up(text)
+
+
+@pytest.mark.parametrize("text", [
+    "Is this true that Apple bought OpenAI?",
+    "Is it true that Apple bought OpenAI?",
+    "What's the latest on AI?",
+    "latest climate news",
+    "What happened in the last election?",
+    "Tell me more about Tesla's earnings",
+    "They say one more company joined the other partners this year",
+    "summarize the second one " + "word " * 30,
+])
+def test_new_questions(text):
+    assert not is_follow_up(text)
+
+
+def stores(tmp_path, **kwargs):
+    return [MemorySessionStore(**kwargs), SQLiteSessionStore(str(tmp_path / "sessions.sqlite3"), **kwargs)]
+
+
+def test_old_turns_fold_into_summary(tmp_path):
+    for store in stores(tmp_path, max_turns=2):
+        for i in range(5):
+            store.add_turn("s", Turn(f"question {i}", f"answer {i}"))
+        assert [turn.user_text for turn in store.turns("s")] == ["question 3", "question 4"]
+        assert len(store.summary("s")) == 3
+        assert store.turns("s", limit=1)[0].user_text == "question 4"
+
+
+def test_idle_sessions_expire_on_read(tmp_path, monkeypatch):
+    import session_store
+
+    for store in stores(tmp_path, ttl_hours=1):
+        now = 1_000_000.0
+        monkeypatch.setattr(session_store.time, "time", lambda: now)
+        store.add_turn("s", Turn("q", "a"))
+        assert store.count("s") == 1
+        now += 2 * 3600
+        assert store.count("s") == 0
+        assert store.turns("s") == []
+        assert store.summary("s") == []
+        # A new turn starts a fresh session.
+        store.add_turn("s", Turn("q2", "a2"))
+        assert [turn.user_text for turn in store.turns("s")] == ["q2"]
+
+
+def test_memory_store_reads_refresh_recency():
+    store = MemorySessionStore(max_sessions=2)
+    store.add_turn("a", Turn("q", "a"))
+    store.add_turn("b", Turn("q", "a"))
+    store.turns("a")
+    store.add_turn("c", Turn("q", "a"))
+    assert store.count("a") == 1
+    assert store.count("b") == 0
+
+
+def test_history_respects_token_budget():
+    turns = [Turn(f"question {i} " + "word " * 100, f"answer {i}") for i in range(20)]
+    items = build_history(turns, [], max_tokens=300, summary_tokens=100, message_tokens=50)
+    assert items[0]["role"] == "system"
+    assert sum(len(item["content"]) for item in items[1:]) // 4 <= 300
+    assert items[-1] == {"role": "assistant", "content": "answer 19"}
+    assert build_history(turns, [], max_tokens=0) == []
@@ -0,0 +1,70 @@
+from datetime import date
+
+import numpy as np
+
+from fact_check_service import FactCheckRetriever
+from sharded_retrieval import ShardedRetriever, claim_years, shard_name, shard_values
+
+MANIFEST = {
+    "collection": "kb",
+    "shard_by": ["topic"],
+    "shards": {
+        "kb__ai": {"values": {"topic": "AI"}, "count": 10, "dated": 10, "years": [2023, 2024],
+                   "centroid": [1.0, 0.0, 0.0]},
+        "kb__climate": {"values": {"topic": "climate"}, "count": 5, "dated": 5, "years": [2024],
+                        "centroid": [0.0, 1.0, 0.0]},
+        "kb__sports": {"values": {"topic": "sports"}, "count": 5, "dated": 0, "years": [],
+                       "centroid": [0.0, 0.0, 1.0]},
+        "kb__empty": {"values": {"topic": "empty"}, "count": 0, "dated": 0, "years": [], "centroid": []},
+    },
+}
+
+
+def axis_embedding(texts):
+    return [[1.0, 0.0, 0.0] if "startup" in text else [0.0, 1.0, 0.0] for text in texts]
+
+
+def sharded(tmp_path, **kwargs):
+    base = FactCheckRetriever(path=str(tmp_path), collection_name="kb", embedding_function=axis_embedding)
+    return ShardedRetriever(MANIFEST, base, hybrid=False, **kwargs)
+
+
+def test_shard_keys():
+    assert shard_values({"topic": " AI ", "date": "2024-03-01"}, ["topic", "year"]) == {"topic": "AI", "year": "2024"}
+    assert shard_values({}, ["topic"]) == {"topic": "other"}
+    assert shard_name("kb", {"topic": "Climate & Energy"}) == "kb__climate-energy"
+    assert len(shard_name("kb", {"topic": "x" * 100})) <= 63
+
+
+def test_claim_names_its_shard_and_years_filter_the_rest(tmp_path):
+    retriever = sharded(tmp_path, fanout=1)
+    routes = retriever.route("AI startups raised record funding in 2023", np.array([0.1, 0.9, 0.2]))
+    # climate is nearer but has no 2023 records; sports has undated records, so it stays eligible.
+    assert routes == [("kb__ai", (2023,)), ("kb__sports", ())]
+    assert "kb__empty" not in retriever.names
+
+
+def test_claims_without_a_named_shard_go_to_the_nearest_ones(tmp_path):
+    retriever = sharded(tmp_path, fanout=2)
+    routes = retriever.route("Glaciers melted faster than expected", np.array([0.2, 0.9, 0.1]))
+    assert routes == [("kb__climate", ()), ("kb__ai", ())]
+    assert claim_years("It happened last year, not in 2019", today=date(2025, 1, 1)) == {2019, 2024}
+
+
+def test_candidates_from_all_shards_are_merged_by_score(tmp_path, monkeypatch):
+    retriever = sharded(tmp_path, fanout=3, top_k=2)
+    calls = []
+
+    def query_shard(name, claims, embeddings, years):
+        calls.append((name, tuple(claims)))
+        score = {"kb__ai": 0.9, "kb__climate": 0.6, "kb__sports": 0.7}[name]
+        return [[{"id": f"{name}-{claim}", "score": score, "distance": 1 - score}] for claim in claims]
+
+    monkeypatch.setattr(retriever, "_query_shard", query_shard)
+    merged = retriever.candidates_batch(["startup news", "startup funding"])
+
+    # Both claims route to the same shards, so each shard is queried once for both.
+    assert len(calls) == len({name for name, _ in calls})
+    assert [[candidate["shard"] for candidate in candidates] for candidates in merged] == [
+        ["kb__ai", "kb__sports"], ["kb__ai", "kb__sports"]]
+    assert retriever.stats()["shards_per_claim"] == 3
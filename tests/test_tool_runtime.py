@@ -0,0 +1,58 @@
+import asyncio
+import contextvars
+import threading
+import time
+
+import tool_runtime
+from tool_runtime import run_blocking, tool_limit
+
+request_id = contextvars.ContextVar("request_id", default=None)
+
+
+def test_blocking_work_runs_off_the_loop_with_the_callers_context():
+    def work(x):
+        return threading.current_thread().name, request_id.get(), x * 2
+
+    async def main():
+        request_id.set("abc")
+        return await run_blocking(work, 21)
+
+    thread_name, seen_id, result = asyncio.run(main())
+    assert thread_name.startswith("tool-worker") and seen_id == "abc" and result == 42
+
+
+def test_loop_keeps_running_while_blocking_work_waits():
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        task = asyncio.create_task(ticker())
+        await run_blocking(time.sleep, 0.1)
+        task.cancel()
+        return ticks
+
+    assert asyncio.run(main()) >= 5
+
+
+def test_tool_limit_bounds_concurrent_calls(monkeypatch):
+    monkeypatch.setitem(tool_runtime.TOOL_CONCURRENCY, "fact_check", 2)
+    running = peak = 0
+
+    async def call():
+        nonlocal running, peak
+        async with tool_limit("fact_check"):
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    async def main():
+        await asyncio.gather(*(call() for _ in range(6)))
+
+    asyncio.run(main())
+    assert peak == 2
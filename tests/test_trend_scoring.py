@@ -0,0 +1,48 @@
+import json
+import os
+import subprocess
+import sys
+
+from trend_scoring import cluster, rank_stories
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+RESULTS = [
+    {"title": "Apple acquires AI startup for $2 billion", "url": "https://a.com/1",
+     "content": "Apple has agreed to acquire an AI startup in a deal worth two billion dollars.", "score": 0.9},
+    {"title": "Apple acquires AI startup in $2 billion deal", "url": "https://b.com/2",
+     "content": "Apple has agreed to acquire an AI startup, a deal worth two billion dollars.", "score": 0.7},
+    {"title": "Heavy rain floods Oslo streets", "url": "https://c.com/3",
+     "content": "Streets in Oslo flooded on Monday after heavy rain.", "score": 0.8},
+    {"title": "Apple acquires AI startup for $2 billion", "url": "https://d.com/4",
+     "content": "Apple has agreed to acquire an AI startup in a deal worth two billion dollars.", "score": 0.5},
+]
+
+
+def test_near_duplicates_form_one_story():
+    groups = sorted(sorted(group) for group in cluster(RESULTS))
+    assert groups == [[0, 1, 3], [2]]
+
+
+def test_story_with_more_outlets_ranks_first():
+    stories = rank_stories(RESULTS, now=0)
+    assert [story.articles for story in stories] == [3, 1]
+    assert stories[0].source == "https://a.com/1"
+    assert stories[0].outlets == 3
+
+
+def test_shared_story_key_keeps_results_together():
+    results = [dict(RESULTS[0], story=7), dict(RESULTS[2], story=7)]
+    assert cluster(results) == [[0, 1]]
+
+
+def test_clustering_is_the_same_in_every_process():
+    script = ("import json, sys; sys.path.insert(0, %r); from trend_scoring import cluster; "
+              "print(json.dumps(cluster(json.loads(sys.stdin.read()))))" % ROOT)
+    outputs = set()
+    for seed in ("1", "2", "3"):
+        env = {**os.environ, "PYTHONHASHSEED": seed}
+        completed = subprocess.run([sys.executable, "-c", script], input=json.dumps(RESULTS), env=env,
+                                   capture_output=True, text=True, check=True)
+        outputs.add(completed.stdout.strip())
+    assert outputs == {json.dumps(cluster(RESULTS))}
@@ -0,0 +1,40 @@
+import time
+
+from schemas import NewsHeadline, TrendingNews
+from trending_ingest import TrendingFeeds, TrendingStore, build_feed, match_topic, normalize_url
+
+
+def test_urls_and_feed_queries_are_normalized():
+    assert normalize_url("https://www.a.com/story/?utm_source=x&id=1#top") == "a.com/story?id=1"
+    assert match_topic("What's the latest AI news?", ["AI", "climate"]) == "AI"
+    assert match_topic("Latest news on AI chips", ["AI", "climate"]) is None
+
+
+def test_near_duplicate_titles_share_a_story_and_refetches_only_refresh(tmp_path):
+    store = TrendingStore(str(tmp_path / "trending.sqlite3"))
+    results = [
+        {"url": "https://a.com/1", "title": "Apple buys AI startup for 2 billion dollars", "score": 0.5},
+        {"url": "https://b.com/2", "title": "Apple buys AI startup for 2 billion dollars - B News", "score": 0.6},
+        {"url": "https://c.com/3", "title": "Heavy rain floods Oslo", "score": 0.4},
+    ]
+    assert store.add_results("AI", results, now=1000) == {"new": 2, "duplicates": 1, "refreshed": 0}
+    assert store.add_results("AI", results[:1], now=2000) == {"new": 0, "duplicates": 0, "refreshed": 1}
+
+    feed = build_feed(store, "AI", now=2000)
+    assert [headline.headline for headline in feed.headlines][0].startswith("Apple buys AI startup")
+    assert len(feed.headlines) == 2
+
+
+def test_feeds_serve_fresh_topics_only(tmp_path):
+    store = TrendingStore(str(tmp_path / "trending.sqlite3"))
+    feed = TrendingNews(topic="AI", headlines=[NewsHeadline(rank=1, headline="Apple buys", source="https://a.com")])
+    store.save_feed("AI", feed, time.time())
+    store.save_feed("climate", TrendingNews(topic="climate", headlines=[]), time.time())
+    feeds = TrendingFeeds(store, topics=["AI", "climate", "sports"], max_age=60)
+
+    assert feeds.lookup("latest AI news") == feed
+    assert feeds.lookup("trending climate") is None
+    assert feeds.lookup("sports") is None
+    store.save_feed("AI", feed, time.time() - 120)
+    assert feeds.lookup("AI headlines") is None
+    assert feeds.stats() == {"topics": 3, "hits": 1, "misses": 1, "stale": 2}
@@ -0,0 +1,52 @@
+import asyncio
+import contextvars
+import functools
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from config import get_int
+
+
+
+# --- Configuration ---
+
+# Threads shared by all blocking tool work (embedding, ChromaDB queries, ...).
+TOOL_EXECUTOR_WORKERS = get_int("TOOL_EXECUTOR_WORKERS", 8)
+
+# Maximum concurrent calls per tool. Callers beyond the limit wait their turn
+# instead of piling onto the executor and starving the other tools.
+TOOL_CONCURRENCY = {
+    "fact_check": get_int("FACT_CHECK_CONCURRENCY", 4),
+    "search": get_int("SEARCH_CONCURRENCY", 8),
+    "summarize": get_int("SUMMARIZE_CONCURRENCY", 4),
+}
+
+
+_executor = ThreadPoolExecutor(max_workers=TOOL_EXECUTOR_WORKERS, thread_name_prefix="tool-worker")
+
+# asyncio primitives belong to one event loop, so keep a set of semaphores per loop.
+_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict]" = weakref.WeakKeyDictionary()
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking function on the bounded tool executor without stalling the event loop."""
+    loop = asyncio.get_running_loop()
+    # Carry context variables (the Logfire span, the metrics sampling decision) into the worker thread.
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_executor, functools.partial(context.run, func, *args, **kwargs))
+
+
+def _semaphore(tool: str) -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    semaphores = _semaphores.setdefault(loop, {})
+    if tool not in semaphores:
+        semaphores[tool] = asyncio.Semaphore(TOOL_CONCURRENCY.get(tool, TOOL_EXECUTOR_WORKERS))
+    return semaphores[tool]
+
+
+@asynccontextmanager
+async def tool_limit(tool: str):
+    """Hold one of the tool's concurrency slots for the duration of the block."""
+    async with _semaphore(tool):
+        yield
@@ -0,0 +1,172 @@
+"""
+Deterministic clustering and trend scoring of news search results.
+
+Search results are grouped into stories with MinHash/LSH over the words of
+each title and snippet, then each story is scored by how many articles and
+how many different outlets carry it, how recent it is and how relevant the
+search engine found it. The output is ranked NewsHeadline entries, so the LLM
+no longer has to compare every result with every other one itself.
+"""
+import math
+import time
+import zlib
+from dataclasses import dataclass, field
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from config import get_float, get_int, get_json
+from hybrid_retrieval import tokenize
+from schemas import NewsHeadline
+
+
+# --- Configuration ---
+
+# Estimated word overlap (Jaccard) above which two results are the same story.
+TREND_CLUSTER_SIMILARITY = get_float("TREND_CLUSTER_SIMILARITY", 0.4)
+# A story loses half its recency score every this many hours.
+TREND_HALF_LIFE_HOURS = get_float("TREND_HALF_LIFE_HOURS", 6)
+TREND_SNIPPET_WORDS = get_int("TREND_SNIPPET_WORDS", 40)
+TREND_WEIGHTS = {
+    "frequency": 1.0,   # log(1 + articles in the story)
+    "diversity": 1.5,   # log(1 + distinct outlets)
+    "recency": 1.0,     # 0..1, halves every TREND_HALF_LIFE_HOURS; 0.5 when no date is known
+    "relevance": 1.0,   # best search score in the story, 0..1
+}
+TREND_WEIGHTS.update(get_json("TREND_WEIGHTS", {}))
+
+# 64 hash functions in 16 bands of 4: pairs above ~0.5 Jaccard almost always share a band.
+NUM_PERM = 64
+LSH_BANDS = 16
+_PRIME = (1 << 32) - 5
+# Fixed seed, so the same results always cluster the same way.
+_rng = np.random.default_rng(20240601)
+_A = _rng.integers(1, 1 << 31, size=NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, 1 << 31, size=NUM_PERM, dtype=np.uint64)
+
+
+# --- 1. MinHash signatures ---
+
+def result_terms(result: dict) -> set[str]:
+    """Title words plus the opening words of the snippet."""
+    snippet = " ".join((result.get("content") or "").split()[:TREND_SNIPPET_WORDS])
+    return set(tokenize(f"{result.get('title') or ''} {snippet}"))
+
+
+def minhash(terms: set[str]) -> np.ndarray:
+    if not terms:
+        return np.full(NUM_PERM, _PRIME, dtype=np.uint64)
+    # crc32 rather than hash(): stable across processes and PYTHONHASHSEED.
+    hashes = np.fromiter((zlib.crc32(term.encode("utf-8")) for term in terms), dtype=np.uint64, count=len(terms))
+    return ((np.outer(hashes, _A) + _B) % _PRIME).min(axis=0)
+
+
+def _find(parent: list[int], i: int) -> int:
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def cluster(results: list[dict], similarity: float = TREND_CLUSTER_SIMILARITY) -> list[list[int]]:
+    """
+    Group result indexes into stories. LSH finds candidate pairs; their signatures
+    confirm them. Results that already share a `story` key (the trending store's
+    near-duplicate titles) stay together.
+    """
+    if not results:
+        return []
+    signatures = np.stack([minhash(result_terms(result)) for result in results])
+    parent = list(range(len(results)))
+    first_of_story = {}
+    for i, result in enumerate(results):
+        if result.get("story") is not None:
+            parent[i] = first_of_story.setdefault(result["story"], i)
+    rows = NUM_PERM // LSH_BANDS
+    for band in range(LSH_BANDS):
+        buckets = {}
+        for i, signature in enumerate(signatures[:, band * rows:(band + 1) * rows]):
+            buckets.setdefault(signature.tobytes(), []).append(i)
+        for members in buckets.values():
+            if len(members) < 2:
+                continue
+            # Compare each member with the first member of every story seen so far in this
+            # bucket, in one vectorised step, rather than with every other member.
+            leaders = [members[0]]
+            for j in members[1:]:
+                matches = np.mean(signatures[leaders] == signatures[j], axis=1) >= similarity
+                if not matches.any():
+                    leaders.append(j)
+                for leader in np.asarray(leaders)[np.flatnonzero(matches)]:
+                    parent[_find(parent, j)] = _find(parent, int(leader))
+
+    groups = {}
+    for i in range(len(results)):
+        groups.setdefault(_find(parent, i), []).append(i)
+    return list(groups.values())
+
+
+# --- 2. Story scoring ---
+
+def outlet(url: str) -> str:
+    return urlsplit(url).netloc.lower().removeprefix("www.")
+
+
+def result_timestamp(result: dict):
+    """Unix time of a result: its `timestamp`, or a parsed `published_date`, or None."""
+    if result.get("timestamp") is not None:
+        return float(result["timestamp"])
+    published = result.get("published_date")
+    if not published:
+        return None
+    try:
+        return datetime.fromisoformat(published.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        pass
+    try:
+        return parsedate_to_datetime(published).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class Story:
+    headline: str
+    source: str
+    articles: int
+    outlets: int
+    score: float
+    latest: float = None
+    urls: list[str] = field(default_factory=list)
+
+
+def score_story(members: list[dict], now: float) -> Story:
+    # The most relevant article (ties: shortest URL) speaks for the story.
+    lead = max(members, key=lambda r: (r.get("score") or 0.0, -len(r["url"]), r["url"]))
+    timestamps = [t for t in (result_timestamp(r) for r in members) if t is not None]
+    latest = max(timestamps) if timestamps else None
+    recency = 0.5 if latest is None else 0.5 ** (max(0.0, now - latest) / 3600 / TREND_HALF_LIFE_HOURS)
+    outlets = len({outlet(r["url"]) for r in members})
+    score = (
+        TREND_WEIGHTS["frequency"] * math.log1p(len(members))
+        + TREND_WEIGHTS["diversity"] * math.log1p(outlets)
+        + TREND_WEIGHTS["recency"] * recency
+        + TREND_WEIGHTS["relevance"] * max(r.get("score") or 0.0 for r in members)
+    )
+    return Story(headline=lead["title"].strip(), source=lead["url"], articles=len(members), outlets=outlets,
+                 score=round(score, 4), latest=latest, urls=[r["url"] for r in members])
+
+
+def rank_stories(results: list[dict], now: float = None) -> list[Story]:
+    """Cluster Tavily-style results ({"title", "url", "content", "score", ...}) into ranked stories."""
+    now = time.time() if now is None else now
+    results = [r for r in results if r.get("url") and (r.get("title") or "").strip()]
+    stories = [score_story([results[i] for i in members], now) for members in cluster(results)]
+    return sorted(stories, key=lambda s: (-s.score, s.source))
+
+
+def to_headlines(stories: list[Story], size: int = None) -> list[NewsHeadline]:
+    return [NewsHeadline(rank=i + 1, headline=s.headline, source=s.source)
+            for i, s in enumerate(stories[:size])]
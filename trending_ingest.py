@@ -0,0 +1,353 @@
+"""
+Continuous trending-news ingestion with precomputed topic feeds.
+
+A worker searches each configured topic every TRENDING_REFRESH_SECONDS. It
+folds the results into a local SQLite store, deduplicated by URL and by
+near-identical title, and precomputes a ranked TrendingNews feed per topic.
+Queries about those topics are answered from the feed without a search or an
+LLM call; everything else still goes to live search.
+
+    python trending_ingest.py             # run the worker
+    python trending_ingest.py --once      # refresh every topic once and exit
+    python trending_ingest.py --show AI   # print the stored feed for a topic
+"""
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import logfire
+
+from config import get_bool, get_float, get_int, get_json, get_str
+from hybrid_retrieval import tokenize
+from schemas import TrendingNews
+from search_backend import SEARCH_MAX_RESULTS, get_search
+from trend_scoring import rank_stories, to_headlines
+
+
+# --- Configuration ---
+
+TRENDING_TOPICS = get_json("TRENDING_TOPICS", ["AI", "technology", "business", "politics", "climate", "sports"])
+TRENDING_REFRESH_SECONDS = get_float("TRENDING_REFRESH_SECONDS", 600)
+# Feeds older than this are ignored and the query goes to live search instead.
+TRENDING_FEED_MAX_AGE_SECONDS = get_float("TRENDING_FEED_MAX_AGE_SECONDS", 1800)
+TRENDING_FEED_SIZE = get_int("TRENDING_FEED_SIZE", 10)
+# Only articles seen within this window are ranked; older ones are deleted after the retention period.
+TRENDING_WINDOW_HOURS = get_float("TRENDING_WINDOW_HOURS", 24)
+TRENDING_RETENTION_HOURS = get_float("TRENDING_RETENTION_HOURS", 72)
+# Two titles with at least this share of words in common are the same story.
+TRENDING_TITLE_SIMILARITY = get_float("TRENDING_TITLE_SIMILARITY", 0.7)
+TRENDING_STORE_PATH = get_str("TRENDING_STORE_PATH", os.path.join("data", "trending_news.sqlite3"))
+TRENDING_FEEDS_ENABLED = get_bool("TRENDING_FEEDS_ENABLED", True)
+# Run the worker inside the API server / Streamlit process instead of as `python trending_ingest.py`.
+TRENDING_WORKER_IN_PROCESS = get_bool("TRENDING_WORKER_IN_PROCESS", False)
+
+# Words that say "give me the feed" rather than narrowing the topic.
+FEED_QUERY_WORDS = {
+    "about", "breaking", "current", "find", "get", "give", "happening", "headline", "headlines", "latest",
+    "me", "new", "news", "now", "recent", "show", "stories", "story", "today", "top", "trend", "trending",
+    "trends", "whats", "what's",
+}
+
+_TRACKING_PARAM = re.compile(r"^(utm_\w+|fbclid|gclid|cmpid|ocid|ref|src)$")
+_TITLE_SUFFIX = re.compile(r"\s+[-|–—]\s+[^-|–—]{1,40}$")
+
+
+# --- 1. Deduplication keys ---
+
+def normalize_url(url: str) -> str:
+    """Scheme, "www.", tracking parameters, fragments and trailing slashes don't make a new article."""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower().removeprefix("www.")
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parts.query) if not _TRACKING_PARAM.match(k.lower())))
+    key = host + (parts.path.rstrip("/") or "/")
+    return f"{key}?{query}" if query else key
+
+
+def title_terms(title: str) -> frozenset:
+    """Content words of a headline, without a trailing " - Outlet" suffix."""
+    return frozenset(tokenize(_TITLE_SUFFIX.sub("", title)))
+
+
+def title_similarity(a: frozenset, b: frozenset) -> float:
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+def topic_query(topic: str) -> str:
+    return f"latest {topic} news"
+
+
+def match_topic(query: str, topics: list[str] = TRENDING_TOPICS):
+    """The configured topic a query asks about, or None if it is narrower than any feed."""
+    terms = set(tokenize(query)) - FEED_QUERY_WORDS
+    if not terms:
+        return None
+    for topic in topics:
+        if terms == set(tokenize(topic)):
+            return topic
+    return None
+
+
+# --- 2. Time-indexed article store ---
+
+class TrendingStore:
+    """
+    SQLite store of ingested articles and precomputed feeds.
+
+    Every distinct URL is one row. Rows whose titles are near-duplicates share
+    a `story` (the url_key of the first article seen), so a story reported by
+    five outlets counts five mentions; re-fetching the same URL only refreshes
+    its `last_seen`. WAL mode lets the worker write while API workers read.
+    """
+
+    def __init__(self, path: str = TRENDING_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS articles ("
+            " topic TEXT NOT NULL, url_key TEXT NOT NULL, story TEXT NOT NULL, url TEXT NOT NULL,"
+            " title TEXT NOT NULL, content TEXT, score REAL, first_seen REAL NOT NULL, last_seen REAL NOT NULL,"
+            " PRIMARY KEY (topic, url_key)"
+            ") WITHOUT ROWID"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS articles_topic_last_seen ON articles (topic, last_seen)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS feeds (topic TEXT PRIMARY KEY, generated_at REAL NOT NULL, feed TEXT NOT NULL)"
+        )
+        self._db.commit()
+
+    def articles(self, topic: str, since: float) -> list[dict]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT * FROM articles WHERE topic = ? AND last_seen >= ? ORDER BY first_seen", (topic, since)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def add_results(self, topic: str, results: list[dict], now: float = None) -> dict:
+        """Fold one search response into the store; returns counts of new, duplicate and refreshed articles."""
+        now = time.time() if now is None else now
+        known = self.articles(topic, now - TRENDING_RETENTION_HOURS * 3600)
+        by_url = {article["url_key"]: article for article in known}
+        stories = [(title_terms(article["title"]), article["story"]) for article in known
+                   if article["url_key"] == article["story"]]
+        counts = {"new": 0, "duplicates": 0, "refreshed": 0}
+        updates, inserts = [], []
+        for result in results:
+            url, title = result.get("url"), (result.get("title") or "").strip()
+            if not url or not title:
+                continue
+            url_key = normalize_url(url)
+            score = result.get("score") or 0.0
+            if url_key in by_url:
+                updates.append((now, score, topic, url_key))
+                counts["refreshed"] += 1
+                continue
+            terms = title_terms(title)
+            story = next((story for story_terms, story in stories
+                          if title_similarity(terms, story_terms) >= TRENDING_TITLE_SIMILARITY), None)
+            if story is None:
+                story = url_key
+                stories.append((terms, story))
+                counts["new"] += 1
+            else:
+                counts["duplicates"] += 1
+            article = {"url_key": url_key, "story": story}
+            by_url[url_key] = article
+            inserts.append((topic, url_key, story, url, title, result.get("content"), score, now, now))
+
+        with self._lock:
+            self._db.executemany(
+                "UPDATE articles SET last_seen = ?, score = MAX(COALESCE(score, 0), ?) WHERE topic = ? AND url_key = ?",
+                updates,
+            )
+            self._db.executemany("INSERT OR IGNORE INTO articles VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", inserts)
+            self._db.commit()
+        return counts
+
+    def prune(self, before: float) -> int:
+        with self._lock:
+            deleted = self._db.execute("DELETE FROM articles WHERE last_seen < ?", (before,)).rowcount
+            self._db.commit()
+        return deleted
+
+    def save_feed(self, topic: str, feed: TrendingNews, generated_at: float) -> None:
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO feeds VALUES (?, ?, ?)",
+                             (topic, generated_at, feed.model_dump_json()))
+            self._db.commit()
+
+    def get_feed(self, topic: str):
+        """(generated_at, TrendingNews) for a topic, or None if it was never built."""
+        with self._lock:
+            row = self._db.execute("SELECT generated_at, feed FROM feeds WHERE topic = ?", (topic,)).fetchone()
+        if row is None:
+            return None
+        return row["generated_at"], TrendingNews.model_validate_json(row["feed"])
+
+
+# --- 3. Ranking ---
+
+def build_feed(store: TrendingStore, topic: str, now: float = None, size: int = TRENDING_FEED_SIZE) -> TrendingNews:
+    """Cluster and score a topic's recent articles (see trend_scoring.py) into a ranked feed."""
+    now = time.time() if now is None else now
+    # An article's recency is when the worker first saw it.
+    articles = [{**article, "timestamp": article["first_seen"]}
+                for article in store.articles(topic, now - TRENDING_WINDOW_HOURS * 3600)]
+    return TrendingNews(topic=topic, headlines=to_headlines(rank_stories(articles, now), size))
+
+
+# --- 4. Ingestion worker ---
+
+class TrendingIngestor:
+    """Periodically searches every topic, stores the results and rebuilds the topic feeds."""
+
+    def __init__(self, store: TrendingStore = None, topics: list[str] = TRENDING_TOPICS,
+                 interval: float = TRENDING_REFRESH_SECONDS):
+        self.store = store or get_trending_store()
+        self.topics = list(topics)
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def refresh_topic(self, topic: str) -> TrendingNews:
+        with logfire.span("refresh trending topic {topic}", topic=topic):
+            now = time.time()
+            response = get_search().search(topic_query(topic), SEARCH_MAX_RESULTS)
+            counts = self.store.add_results(topic, response.get("results", []), now)
+            feed = build_feed(self.store, topic, now)
+            self.store.save_feed(topic, feed, now)
+            logfire.info("Trending feed {topic}: {headlines} headlines ({new} new, {duplicates} duplicates)",
+                         topic=topic, headlines=len(feed.headlines), **counts)
+            return feed
+
+    def refresh_all(self) -> None:
+        for topic in self.topics:
+            try:
+                self.refresh_topic(topic)
+            except Exception as e:
+                # Keep serving the previous feed; it is dropped once older than TRENDING_FEED_MAX_AGE_SECONDS.
+                logfire.warn("Trending refresh failed for {topic}: {error}", topic=topic, error=str(e))
+        self.store.prune(time.time() - TRENDING_RETENTION_HOURS * 3600)
+
+    def run_forever(self) -> None:
+        while not self._stop.is_set():
+            start = time.monotonic()
+            self.refresh_all()
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - start)))
+
+    def start(self) -> threading.Thread:
+        self._thread = threading.Thread(target=self.run_forever, name="trending-ingest", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+# --- 5. Serving precomputed feeds ---
+
+class TrendingFeeds:
+    """Answers queries about a configured topic from its precomputed feed."""
+
+    def __init__(self, store: TrendingStore = None, topics: list[str] = TRENDING_TOPICS,
+                 max_age: float = TRENDING_FEED_MAX_AGE_SECONDS):
+        self.store = store or get_trending_store()
+        self.topics = list(topics)
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def lookup(self, query: str):
+        """The fresh feed for the topic the query asks about, or None (long tail, stale or empty)."""
+        topic = match_topic(query, self.topics)
+        stored = self.store.get_feed(topic) if topic else None
+        if stored is None:
+            self.misses += 1
+            return None
+        generated_at, feed = stored
+        if time.time() - generated_at > self.max_age or not feed.headlines:
+            self.stale += 1
+            return None
+        self.hits += 1
+        return feed
+
+    def stats(self) -> dict:
+        return {"topics": len(self.topics), "hits": self.hits, "misses": self.misses, "stale": self.stale}
+
+
+_store = None
+_feeds = None
+_worker = None
+_lock = threading.Lock()
+
+
+def get_trending_store() -> TrendingStore:
+    global _store
+    if _store is None:
+        with _lock:
+            if _store is None:
+                _store = TrendingStore()
+    return _store
+
+
+def get_trending_feeds():
+    """Return the process-wide feed reader, or None when TRENDING_FEEDS_ENABLED is off."""
+    global _feeds
+    if not TRENDING_FEEDS_ENABLED:
+        return None
+    if _feeds is None:
+        store = get_trending_store()
+        with _lock:
+            if _feeds is None:
+                _feeds = TrendingFeeds(store)
+    return _feeds
+
+
+def start_worker():
+    """Start the in-process worker when TRENDING_WORKER_IN_PROCESS=1 (once per process)."""
+    global _worker
+    if not TRENDING_WORKER_IN_PROCESS:
+        return None
+    store = get_trending_store()
+    with _lock:
+        if _worker is None:
+            _worker = TrendingIngestor(store)
+            _worker.start()
+    return _worker
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest trending news and precompute topic feeds.")
+    parser.add_argument("--once", action="store_true", help="Refresh every topic once and exit.")
+    parser.add_argument("--show", metavar="TOPIC", help="Print the stored feed for a topic and exit.")
+    parser.add_argument("--interval", type=float, default=TRENDING_REFRESH_SECONDS)
+    args = parser.parse_args()
+
+    if args.show:
+        stored = get_trending_store().get_feed(args.show)
+        if stored is None:
+            print(f"❌ No feed for '{args.show}' yet")
+        else:
+            generated_at, feed = stored
+            print(f"📰 {feed.topic} (built {time.time() - generated_at:.0f}s ago)")
+            print(json.dumps(feed.model_dump(), indent=2))
+    else:
+        ingestor = TrendingIngestor(interval=args.interval)
+        print(f"📡 Ingesting {len(ingestor.topics)} topics into {ingestor.store.path}")
+        if args.once:
+            ingestor.refresh_all()
+        else:
+            try:
+                ingestor.run_forever()
+            except KeyboardInterrupt:
+                print("👋 Stopped")
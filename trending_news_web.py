@@ -1,44 +1,28 @@
 import asyncio
-import os
 import json
 from typing import List
-from dotenv import load_dotenv
 import logfire
-from openai import AsyncOpenAI
-from agents import Agent, OpenAIChatCompletionsModel, Runner, function_tool, set_tracing_disabled,Runner
-from pydantic import BaseModel, Field
+from agents import Agent, OpenAIChatCompletionsModel, Runner, function_tool
 #from langchain_community.tools.tavily_search import TavilySearchResults
-from tavily import TavilyClient
 
+from config import API_KEY, MODEL_NAME, TAVILY_API_KEY
+from runtime import configure_tracing, get_openai_client
+from schemas import NewsHeadline, TrendingNews
+from search_fanout import fan_out_search
+from tool_runtime import run_blocking
+from trend_scoring import rank_stories
+from trending_ingest import TRENDING_FEED_SIZE, get_trending_feeds
 
-# --- 1. Load Environment Variables ---
-# Load keys from the .env file
-load_dotenv()
 
-BASE_URL = os.getenv("BASE_URL") 
-API_KEY = os.getenv("API_KEY") 
-MODEL_NAME = os.getenv("MODEL_NAME") 
-LOGFIRE_TOKEN = os.getenv("LOGFIRE_TOKEN") 
-TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
+# --- 1. Environment Variables (loaded once in config.py) ---
 
 # Check if keys are available
-if not os.getenv("API_KEY") or not os.getenv("TAVILY_API_KEY"):
+if not API_KEY or not TAVILY_API_KEY:
     raise ValueError("OpenAI and Tavily API keys must be set in the .env file.")
 
 
-# --- 2. Define Pydantic Output Schema ---
-# This defines the structure of the final output.
-
-class NewsHeadline(BaseModel):
-    """A single, ranked news headline with its source."""
-    rank: int = Field(description="The rank of the headline based on its trend frequency (1 is the most trending).")
-    headline: str = Field(description="The concise news headline.")
-    source: str = Field(description="The source URL for the news article.")
-    
-class TrendingNews(BaseModel):
-    """A collection of trending news headlines for a specific topic."""
-    topic: str = Field(description="The central topic these headlines relate to.")
-    headlines: List[NewsHeadline] = Field(description="A list of ranked, trending headlines about the topic.")
+# --- 2. Pydantic Output Schema ---
+# NewsHeadline and TrendingNews live in schemas.py so they can be used without building this agent.
 
 # --- 3. Set Up Tools and LLM ---
 
@@ -57,21 +41,34 @@ class TrendingNews(BaseModel):
 # To install: pip install tavily-python
 @function_tool
 @logfire.instrument("search_tavily tool called")
-def search_tavily(query: str) -> List[dict]:
-    """Search Tavily for the given query and return results."""
-    client = TavilyClient(TAVILY_API_KEY)
-    response = client.search(query=query, max_results=20)
+async def search_tavily(query: str) -> List[dict]:
+    """
+    Search Tavily for the given topic and return the stories found, already ranked.
+    Several variants of the topic are searched in parallel, so one call is enough.
+    """
+    # Common topics are served from the feed precomputed by trending_ingest.py.
+    feeds = get_trending_feeds()
+    feed = await run_blocking(feeds.lookup, query) if feeds is not None else None
+    if feed is not None:
+        return [{"rank": item.rank, "source": item.source, "headline": item.headline} for item in feed.headlines]
+
+    # Sub-queries run concurrently on the shared, connection-pooled client (see search_fanout.py).
+    response = await fan_out_search(query)
     
-    # Extract relevant fields from the response
+    # Cluster near-duplicate results into stories and rank them locally
+    # (frequency, outlet diversity, recency, relevance) instead of leaving it to the LLM.
+    stories = rank_stories(response["results"])
     results = [
         {
-            "rank": item["score"],
-            "source": item["url"],
-            "headline": item["title"]
+            "rank": rank,
+            "source": story.source,
+            "headline": story.headline,
+            "articles": story.articles,
+            "outlets": story.outlets,
         }
-        for item in response["results"]
+        for rank, story in enumerate(stories[:TRENDING_FEED_SIZE], start=1)
     ]
-    
+
     return results
 
 # client = TavilyClient(TAVILY_API_KEY)
@@ -82,8 +79,7 @@ def search_tavily(query: str) -> List[dict]:
 # print(response)
 
 
-client = AsyncOpenAI(base_url=BASE_URL, api_key=API_KEY)
-set_tracing_disabled(disabled=True)
+client = get_openai_client()
 
 trending_news_agent = Agent(
     name="Trending News Agent",
@@ -92,8 +88,9 @@ trending_news_agent = Agent(
     This agent helps users find trending news articles on any topic.
 
     Use the following guidelines:
-    1. Identify the most frequently mentioned stories
-    2. Rank them by importance and recency
+    1. search_tavily returns stories already ranked by how often and how widely they are reported
+       and how recent they are; keep its ranks and order
+    2. Call search_tavily once per request: it already searches several variants of the topic in parallel
     3. Include only verified sources
     4. Provide concise headlines with direct links
     
@@ -118,6 +115,7 @@ trending_news_agent = Agent(
 )
 
 if __name__ == "__main__":
+    configure_tracing()
     # Example usage
     topic = "Trending news on politics in bangladesh"
     print(f"🔍 Searching for: {topic}")